@@ -0,0 +1,55 @@
+# contextflow/benchmarks/bench_chunker.py
+"""
+Benchmark + conferência do chunk_text em transcrições sem índice de segmentos (cortes em fins
+de frase): mede o tempo de uma tokenização + divisão e confere que, sem sobreposição, cada
+chunk termina na pontuação da frase e o seguinte começa no início de uma frase, que nenhum
+passa de max_tokens e que os chunks reconstituem o texto.
+
+Uso: python benchmarks/bench_chunker.py [transcrições] [max_tokens]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.token_engine import chunk_text, count_tokens, get_encoder
+
+WORDS = ("então a gente vai ver como o pipeline usa cache e tokens para cada vídeo "
+         "da playlist com transcrição compacta e segmentos".split())
+
+def make_transcript(rng: random.Random, sentences: int) -> str:
+    out = []
+    for _ in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 25))]
+        out.append(" ".join(words).capitalize() + rng.choice(".!?"))
+    return " ".join(out)
+
+def check(text: str, max_tokens: int):
+    chunks = chunk_text(text, max_tokens)
+    assert "".join(text[a:b] for a, b, _ in chunks) == text, "chunks não reconstituem o texto"
+    assert all(n <= max_tokens for _, _, n in chunks), "chunk acima do orçamento"
+    for (_, end, _), (start, _, _) in zip(chunks, chunks[1:]):
+        assert text[end - 1] in ".!?", f"chunk não termina em fim de frase: {text[end - 20:end]!r}"
+        nxt = text[start:start + 2].lstrip()
+        assert nxt[:1].isupper(), f"chunk não começa numa frase: {text[start:start + 20]!r}"
+    return chunks
+
+def main():
+    transcripts = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    max_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    rng = random.Random(42)
+    get_encoder()  # carga do BPE fora da medição
+    texts = [make_transcript(rng, rng.randint(400, 1200)) for _ in range(transcripts)]
+
+    started = time.perf_counter()
+    total_chunks = sum(len(check(t, max_tokens)) for t in texts)
+    elapsed = time.perf_counter() - started
+
+    tokens = sum(count_tokens(t)[0] for t in texts)
+    print(f"{transcripts} transcrições, {tokens} tokens, {total_chunks} chunks de até {max_tokens} tokens")
+    print(f"  chunk_text: {elapsed:.3f}s ({elapsed / transcripts * 1000:.1f} ms/transcrição) | cortes em fim de frase: ok")
+
+if __name__ == "__main__":
+    main()
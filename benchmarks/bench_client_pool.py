@@ -0,0 +1,78 @@
+# contextflow/benchmarks/bench_client_pool.py
+"""
+Micro-benchmark: custo por chamada com e sem pool.
+- YoutubeDL novo a cada chamada vs. emprestado do YoutubeDLPool
+- requests.get avulso vs. Session keep-alive (servidor HTTP local, sem internet)
+
+Uso: python benchmarks/bench_client_pool.py [iteracoes]
+"""
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import yt_dlp
+from services.client_pool import YoutubeDLPool, create_http_session
+
+YDL_OPTS = {'quiet': True, 'no_warnings': True, 'skip_download': True}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # permite keep-alive
+    disable_nagle_algorithm = True  # sem isso o delayed ACK distorce a medição
+
+    def do_GET(self):
+        body = b"x" * 2048
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _timeit(label, fn, n):
+    fn()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    per_call = (time.perf_counter() - start) / n * 1000
+    print(f"  {label:<32} {per_call:8.3f} ms/chamada")
+    return per_call
+
+def bench_ytdl(n):
+    print("YoutubeDL (instanciação + lookup do extractor do YouTube):")
+    def fresh():
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            ydl.get_info_extractor('Youtube')
+
+    pool = YoutubeDLPool()
+    def pooled():
+        with pool.borrow(YDL_OPTS) as ydl:
+            ydl.get_info_extractor('Youtube')
+
+    a = _timeit("novo por chamada", fresh, n)
+    b = _timeit("pool", pooled, n)
+    print(f"  economia: {a - b:.3f} ms/chamada ({a / b:.1f}x)\n")
+
+def bench_http(n):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/thumb.jpg"
+
+    print("HTTP GET local (2 KB):")
+    a = _timeit("requests.get avulso", lambda: requests.get(url, timeout=5).content, n)
+    session = create_http_session()
+    b = _timeit("Session keep-alive", lambda: session.get(url, timeout=5).content, n)
+    print(f"  economia: {a - b:.3f} ms/chamada ({a / b:.1f}x)")
+    print("  (em HTTPS real a economia inclui o handshake TLS, tipicamente dezenas de ms)\n")
+    server.shutdown()
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bench_ytdl(iterations)
+    bench_http(iterations)
@@ -0,0 +1,99 @@
+# contextflow/benchmarks/bench_subtitle_parser.py
+"""
+Benchmark: parser incremental (services/subtitle_parser.py) vs. a limpeza anterior
+(json.loads do corpo inteiro + várias passadas de re.sub), em legendas longas geradas
+a partir do trecho JSON3 de debug_transcript.py.
+
+Uso: python benchmarks/bench_subtitle_parser.py [horas]
+"""
+import os
+import sys
+import re
+import json
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.subtitle_parser import clean_subtitles
+
+# Mesmo evento de debug_transcript.py (raw_snippet), replicado ao longo do vídeo
+RAW_SNIPPET = """{ "wireMagic": "pb3", "pens": [ { } ], "wsWinStyles": [ { }, { "mhModeHint": 2, "juJustifCode": 0, "sdScrollDir": 3 } ], "wpWinPositions": [ { }, { "apPoint": 6, "ahHorPos": 20, "avVerPos": 100, "rcRows": 2, "ccCols": 40 } ], "events": [ { "tStartMs": 0, "dDurationMs": 942360, "id": 1, "wpWinPosId": 1, "wsWinStyleId": 1 }, { "tStartMs": 80, "dDurationMs": 4440, "wWinId": 1, "segs": [ { "utf8": "Quando", "acAsrConf": 0 }, { "utf8": " afirmo", "tOffsetMs": 160, "acAsrConf": 0 }, { "utf8": " neste", "tOffsetMs": 480, "acAsrConf": 0 }, { "utf8": " canal", "tOffsetMs": 800, "acAsrConf": 0 }, { "utf8": " que", "tOffsetMs": 1160, "acAsrConf": 0 }, { "utf8": " o", "tOffsetMs": 1480, "acAsrConf": 0 } ] } ] }"""
+
+def _clean_text(text):
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def legacy_clean(raw_content):
+    """Cópia de YouTubeManager._clean_downloaded_subs antes do parser incremental."""
+    try:
+        possible_json = json.loads(raw_content)
+        if possible_json and 'events' in possible_json:
+            segs = []
+            for event in possible_json['events']:
+                if 'segs' in event:
+                    for s in event['segs']:
+                        if 'utf8' in s and s['utf8'].strip():
+                            segs.append(s['utf8'].strip())
+            return _clean_text(" ".join(segs))
+    except Exception:
+        pass
+
+    text = re.sub(r'<[^>]+>', '', raw_content)
+    text = re.sub(r'WEBVTT', '', text)
+    text = re.sub(r'\d{1,2}:\d{1,2}:\d{1,2}[\.,]\d{3}.*', '', text)
+    if '{' in text and '}' in text:
+        text = re.sub(r'[{:"},]', ' ', text)
+        text = re.sub(r'wireMagic|pens|wsWinStyles|wpWinPositions|events|tStartMs|dDurationMs|utf8|acAsrConf', '', text)
+    lines = [l.strip() for l in text.split('\n') if l.strip()]
+    clean_lines = [l for l in lines if not re.match(r'^\d+$', l) and '-->' not in l]
+    return _clean_text(" ".join(clean_lines))
+
+def build_json3(hours):
+    base = json.loads(RAW_SNIPPET)
+    header, cue = base['events'][0], base['events'][1]
+    events = [header]
+    step = cue['dDurationMs'] // 2  # legendas automáticas sobrepõem as cues
+    for i in range(int(hours * 3600 * 1000 / step)):
+        events.append(dict(cue, tStartMs=80 + i * step))
+    base['events'] = events
+    return json.dumps(base)
+
+def _ts(ms):
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+def build_vtt(hours):
+    lines = ["WEBVTT", "Kind: captions", "Language: pt", ""]
+    step = 2220
+    for i in range(int(hours * 3600 * 1000 / step)):
+        start = i * step
+        lines.append(f"{_ts(start)} --> {_ts(start + step)} align:start position:0%")
+        lines.append("Quando<00:00:00.160><c> afirmo</c><00:00:00.480><c> neste</c> canal que o")
+        lines.append("")
+    return "\n".join(lines)
+
+def measure(label, fn, raw, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(raw)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<12} {best * 1000:9.1f} ms | pico {peak / 1048576:7.1f} MB | {len(out):,} chars")
+    return out
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for name, raw in (("JSON3", build_json3(hours)), ("VTT", build_vtt(hours))):
+        print(f"{name} ({hours:g}h, {len(raw) / 1048576:.1f} MB):")
+        old = measure("anterior", legacy_clean, raw)
+        new = measure("incremental", clean_subtitles, raw)
+        if name == "JSON3":
+            print(f"  saída idêntica: {old == new}")
+        print()
@@ -0,0 +1,71 @@
+# contextflow/benchmarks/bench_token_batch.py
+"""
+Benchmark: count_tokens serial (um texto por vez, na thread chamadora) vs. count_tokens_batch
+(lotes no pool compartilhado), em dois cenários: muitos arquivos pequenos (scan_directory)
+e poucas transcrições longas (backlog do Processor). Confere que as contagens são idênticas.
+Depois mede o cache de contagens: primeira passada (preenche) e re-scan inalterado (só hash).
+O cache usa um arquivo temporário, não o de data/.
+
+Uso: python benchmarks/bench_token_batch.py [arquivos] [transcrições]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.token_engine as token_engine
+from core.token_engine import count_tokens, count_tokens_batch, get_encoder, get_token_cache_stats
+from constants import TOKENIZE_WORKERS
+
+WORDS = ("def return self import class para que não uma com os transcrição vídeo token "
+         "pipeline cache index segment offset encoder batch worker lease".split())
+
+def make_text(rng: random.Random, chars: int) -> str:
+    out, size = [], 0
+    while size < chars:
+        w = rng.choice(WORDS)
+        out.append(w)
+        size += len(w) + 1
+    return " ".join(out)
+
+def run(label: str, texts):
+    token_engine.TOKEN_CACHE_ENABLED = False
+    started = time.perf_counter()
+    serial = [count_tokens(t)[0] for t in texts]
+    t_serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = count_tokens_batch(texts)
+    t_batch = time.perf_counter() - started
+
+    assert serial == batch, "contagens divergentes"
+    total_mb = sum(len(t) for t in texts) / 1e6
+    print(f"{label}: {len(texts)} textos, {total_mb:.1f} M caracteres, {sum(serial)} tokens")
+    print(f"  serial: {t_serial:.3f}s | lote: {t_batch:.3f}s | {t_serial / max(t_batch, 1e-9):.1f}x")
+
+    token_engine.TOKEN_CACHE_ENABLED = True
+    started = time.perf_counter()
+    cold = count_tokens_batch(texts)
+    t_cold = time.perf_counter() - started
+    started = time.perf_counter()
+    warm = count_tokens_batch(texts)
+    t_warm = time.perf_counter() - started
+    assert cold == warm == serial, "contagens do cache divergentes"
+    print(f"  cache: 1ª passada {t_cold:.3f}s | re-scan {t_warm:.3f}s | {t_batch / max(t_warm, 1e-9):.1f}x vs. lote")
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    transcripts = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    rng = random.Random(42)
+    get_encoder()  # carga do BPE fora da medição
+    token_engine.TOKEN_CACHE_PATH = os.path.join(tempfile.mkdtemp(prefix="cf-bench-"), "token_cache.db")
+    print(f"Workers do pool: {TOKENIZE_WORKERS}")
+    run("Arquivos pequenos", [make_text(rng, rng.randint(200, 6000)) for _ in range(files)])
+    run("Transcrições (~1h)", [make_text(rng, rng.randint(40000, 70000)) for _ in range(transcripts)])
+    print(f"Cache de tokens: {get_token_cache_stats()}")
+
+if __name__ == "__main__":
+    main()
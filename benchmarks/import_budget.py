@@ -0,0 +1,100 @@
+# contextflow/benchmarks/import_budget.py
+"""
+Relatório de orçamento de import (partida a frio), a partir de `python -X importtime`.
+Mede o import de cada módulo-alvo num processo novo, lista os pacotes mais caros e
+falha (código 1) se o total passar do orçamento ou se algum módulo que deveria ser
+carregado sob demanda (tiktoken, yt_dlp, ...) aparecer no caminho de partida.
+
+Uso: python benchmarks/import_budget.py [--budget-ms 800] [--top 15] [--headless] [alvo ...]
+     (alvo padrão: main; com --headless, ou sem wxPython instalado, os módulos sem UI do
+     caminho de partida: roda em CI/servidor sem display)
+"""
+import os
+import sys
+import argparse
+import importlib.util
+import subprocess
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_TARGETS = ["main"]
+# O que main carrega antes da primeira janela, fora o wx (não precisa de wxPython nem display)
+HEADLESS_TARGETS = ["constants", "storage.db_handler", "core.token_engine"]
+DEFAULT_BUDGET_MS = 800.0
+# Carregados sob demanda ou no warm-up em background: não podem entrar na partida
+LAZY_MODULES = ("tiktoken", "yt_dlp", "youtube_transcript_api", "wx.html2", "wx", "core.processor")
+
+def measure(target: str) -> List[Tuple[str, int, int, int]]:
+    """(módulo, self_us, cumulativo_us, profundidade) de cada import feito por `import target`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        errors = [l for l in proc.stderr.splitlines() if l.strip() and not l.startswith("import time:")]
+        raise RuntimeError(f"import {target} falhou: {errors[-1] if errors else '?'}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative), depth))
+    # Só a subárvore do alvo (os filhos vêm antes do pai); descarta a partida do interpretador
+    end = max(i for i, r in enumerate(rows) if r[0] == target and r[3] == 0)
+    start = max((i + 1 for i, r in enumerate(rows[:end]) if r[3] == 0), default=0)
+    return rows[start:end + 1]
+
+def top_level(rows: List[Tuple[str, int, int, int]]) -> Dict[str, int]:
+    """Custo cumulativo por pacote importado diretamente pelo alvo (somando entradas repetidas)."""
+    totals: Dict[str, int] = {}
+    for name, _, cumulative, depth in rows:
+        if depth == 1:
+            pkg = name.split(".")[0]
+            totals[pkg] = totals.get(pkg, 0) + cumulative
+    return totals
+
+def report(target: str, budget_ms: float, top: int) -> bool:
+    rows = measure(target)
+    names = {r[0] for r in rows}
+    total_ms = rows[-1][2] / 1000.0
+    # wx é o próprio toolkit da janela: só conta como regressão nos alvos sem UI
+    lazy = [m for m in LAZY_MODULES if m != "wx" or target in HEADLESS_TARGETS]
+    lazy_hits = sorted(m for m in lazy if m in names)
+
+    print(f"\n== import {target}: {total_ms:.1f} ms (orçamento {budget_ms:.0f} ms), {len(rows)} módulos ==")
+    for pkg, us in sorted(top_level(rows).items(), key=lambda kv: -kv[1])[:top]:
+        print(f"  {us / 1000.0:9.1f} ms  {pkg}")
+
+    ok = True
+    if total_ms > budget_ms:
+        print(f"  ESTOURO: {total_ms - budget_ms:.1f} ms acima do orçamento")
+        ok = False
+    if lazy_hits:
+        print(f"  REGRESSÃO: importados na partida (deveriam ser sob demanda): {', '.join(lazy_hits)}")
+        ok = False
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Orçamento de tempo de import na partida")
+    parser.add_argument("targets", nargs="*")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--headless", action="store_true", help="mede só os módulos sem UI da partida")
+    args = parser.parse_args()
+
+    targets = args.targets
+    if not targets:
+        headless = args.headless or importlib.util.find_spec("wx") is None
+        targets = HEADLESS_TARGETS if headless else DEFAULT_TARGETS
+
+    ok = True
+    for target in targets:
+        try:
+            ok = report(target, args.budget_ms, args.top) and ok
+        except RuntimeError as e:
+            print(f"\n== {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
 
 # contextflow/constants.py
 import os
-import wx
 
 # --- Application Info ---
 APP_NAME = "ContextFlow"
@@ -10,6 +9,19 @@ APP_VERSION = "0.1.0"
 # --- Models ---
 MODEL_NAME = "gpt-4o"
 
+# --- Tokenização ---
+# Encodings tiktoken disponíveis para contagem (nome -> modelos que o usam).
+# O padrão (o do MODEL_NAME) continua espelhado em videos.token_count.
+TOKEN_ENCODINGS = {
+    "o200k_base": "gpt-4o, gpt-4.1, o1/o3",
+    "cl100k_base": "gpt-4, gpt-3.5-turbo, text-embedding-3",
+}
+DEFAULT_ENCODING = "o200k_base"
+# Pool compartilhado de tokenização (o núcleo do tiktoken libera o GIL: threads escalam por núcleo)
+TOKENIZE_WORKERS = os.cpu_count() or 2
+TOKENIZE_INLINE_MAX_CHARS = 4096      # entradas (ou lotes) menores são contadas na própria thread
+TOKENIZE_BATCH_CHARS = 256 * 1024     # caracteres agrupados por tarefa do pool (amortiza o despacho)
+
 # --- Paths ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 EXPORTS_DIR = os.path.join(BASE_DIR, "exports")
@@ -17,8 +29,118 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 THUMBNAILS_DIR = os.path.join(DATA_DIR, "thumbs")
 DB_PATH = os.path.join(DATA_DIR, "contextflow.db")
 
+# --- Thumbnails ---
+# Variantes geradas uma vez na ingestão (RGB cru na tabela thumb_variants)
+THUMB_SIZE_TABLE = (80, 45)
+THUMB_SIZE_DETAIL = (160, 90)
+THUMB_VARIANTS = (THUMB_SIZE_TABLE, THUMB_SIZE_DETAIL)
+
+# --- Processamento (Pipeline) ---
+# Etapa -> (workers, tamanho máximo da fila de entrada)
+PIPELINE_STAGES = {
+    "metadata": (3, 16),
+    "register": (1, 16),
+    "transcript": (3, 8),
+    "compact": (1, 8),
+    "tokenize": (4, 16),  # os workers só aguardam o pool de tokenização (TOKENIZE_WORKERS)
+    "persist": (1, 8),
+}
+
+# --- Fila Durável (tabela tasks) ---
+TASK_LEASE_SECONDS = 300          # Lease renovado por heartbeat enquanto a tarefa está em andamento
+TASK_MAX_ATTEMPTS = 3
+TASK_RETRY_DELAY = 60             # Atraso base (s) antes de nova tentativa, multiplicado pelas tentativas
+TASK_RETENTION_SECONDS = 7 * 24 * 3600  # Tarefas concluídas são removidas após esse período
+
+# --- Sync de Fontes (playlists/canais rastreados) ---
+SOURCE_AUTO_SYNC = True
+SOURCE_SYNC_INTERVAL = 6 * 3600      # Re-sync de cada fonte a cada 6h
+SOURCE_SYNC_CHECK_INTERVAL = 60      # Frequência com que o agendador verifica fontes vencidas
+
+# --- Rate Limiting (por host) ---
+# Host lógico -> (requisições por segundo, rajada máxima)
+HOST_METADATA = "youtube.com"
+HOST_SUBTITLES = "timedtext"
+HOST_THUMBNAILS = "i.ytimg.com"
+HOST_RATE_LIMITS = {
+    HOST_METADATA: (0.4, 2),
+    HOST_SUBTITLES: (0.5, 3),
+    HOST_THUMBNAILS: (5.0, 10),
+}
+# Limites do controlador AIMD (a taxa parte de HOST_RATE_LIMITS e oscila entre min e max)
+AIMD_MIN_RATES = {
+    HOST_METADATA: 0.05,
+    HOST_SUBTITLES: 0.05,
+    HOST_THUMBNAILS: 0.5,
+}
+AIMD_MAX_RATES = {
+    HOST_METADATA: 2.0,
+    HOST_SUBTITLES: 2.0,
+    HOST_THUMBNAILS: 10.0,
+}
+AIMD_INITIAL_CONCURRENCY = 2  # Operações de rede pesadas (metadata/transcrição) simultâneas
+# Jitter máximo (segundos) aplicado após cada requisição ao host
+HOST_JITTER = {
+    HOST_METADATA: 1.0,
+    HOST_SUBTITLES: 0.5,
+}
+
+# --- Pools de clientes (YoutubeDL reaproveitado + Session HTTP keep-alive) ---
+YTDL_POOL_MAX_IDLE = 4          # instâncias ociosas guardadas por conjunto de opções
+HTTP_POOL_HOSTS = 10            # hosts distintos com pool de conexões
+HTTP_POOL_PER_HOST = 4          # conexões simultâneas máximas por host
+
+# --- Cache de respostas em disco (extract_info, listas de legendas, corpos de legendas) ---
+RESPONSE_CACHE_DIR = os.path.join(DATA_DIR, "cache")
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+RESPONSE_CACHE_TTL = {
+    "info": 7 * 24 * 3600,             # metadados + faixas disponíveis
+    "transcript_list": 30 * 24 * 3600, # faixas da API (manual/auto por idioma)
+    "subtitle": 90 * 24 * 3600,        # corpo bruto da legenda (permite re-limpar offline)
+}
+
+# --- Cache de contagens de tokens (hash do conteúdo + encoding -> tokens) ---
+# Textos inalterados (re-scan de diretório, reprocessamento) custam só o hash.
+TOKEN_CACHE_ENABLED = True
+TOKEN_CACHE_PATH = os.path.join(DATA_DIR, "token_cache.db")
+TOKEN_CACHE_LRU_SIZE = 4096     # entradas mantidas em memória na frente do SQLite
+TOKEN_CACHE_MIN_CHARS = 4096    # abaixo disso tokenizar é mais barato que hash + consulta/escrita no SQLite
+
+# Inspeção de tokens (get_tokenization_details): só a página exibida é decodificada em strings
+TOKEN_INSPECT_PAGE_SIZE = 1000
+
+# Chunks de transcrição para LLM (gerados na ingestão, guardados em transcript_chunks)
+CHUNK_MAX_TOKENS = 2000
+CHUNK_OVERLAP_TOKENS = 200
+
+# --- Estimativa calibrada de tokens (exibida enquanto a contagem exata roda) ---
+# Valores iniciais até haver TOKEN_ESTIMATE_MIN_SAMPLES contagens exatas por extensão/idioma.
+TOKEN_ESTIMATE_BYTES_PER_TOKEN = 4.0     # mesmo fallback de count_tokens sem tiktoken
+TOKEN_ESTIMATE_TOKENS_PER_SECOND = 3.0   # fala corrida (~150 palavras/min)
+TOKEN_ESTIMATE_MIN_SAMPLES = 3
+
+# --- Cache negativo de transcrições ---
+# Vídeo confirmado sem legenda num conjunto de idiomas não é sondado de novo até expirar.
+# Tarefas com "Forçar atualização" ignoram o cache negativo.
+TRANSCRIPT_MISS_TTL = 7 * 24 * 3600
+
+# --- Compactação de legendas automáticas (repetições rolantes, [Música], hesitações) ---
+# O texto bruto continua em transcripts.full_text; o compacto vai para transcripts.compact_text.
+CAPTION_COMPACTION = True
+CAPTION_COMPACTION_SOURCES = ("api_auto_pt", "ytdlp_pt", "ytdlp_en")
+
+# --- Faixa de backfill (thumbnails, variantes, re-tokenização, prévias de resumo) ---
+# Roda livre quando a fila principal está ociosa; com ela ocupada, jobs de rede só usam
+# BACKFILL_BUDGET_SHARE da taxa atual de cada host e jobs locais esperam.
+BACKFILL_BUDGET_SHARE = 0.2
+BACKFILL_WORKERS = 1
+BACKFILL_SCAN_INTERVAL = 600      # Varredura do banco por vídeos com enriquecimento pendente (s)
+BACKFILL_SCAN_LIMIT = 200         # Vídeos por tipo de job em cada varredura
+SUMMARY_PREVIEW_CHARS = 280       # Prévia extrativa usada enquanto não há resumo
+
 # --- UI Colors (Dark Theme) ---
-COLOR_BG = wx.Colour(30, 30, 30)
-COLOR_FG = wx.Colour(220, 220, 220)
-COLOR_HIGHLIGHT = wx.Colour(70, 70, 70)
-COLOR_ACCENT = wx.Colour(0, 120, 215)  # Blue accent
+# RGB (use wx.Colour(*COLOR_BG)): constants não importa wx, assim core/storage carregam sem UI
+COLOR_BG = (30, 30, 30)
+COLOR_FG = (220, 220, 220)
+COLOR_HIGHLIGHT = (70, 70, 70)
+COLOR_ACCENT = (0, 120, 215)  # Blue accent
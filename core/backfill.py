@@ -0,0 +1,145 @@
+# contextflow/core/backfill.py
+import threading
+import queue
+import time
+import collections
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from core.rate_limiter import HostRateLimiter, TokenBucket
+
+class BackfillLane:
+    """
+    Faixa de baixa prioridade para enriquecimento não essencial (thumbnails, variantes,
+    re-tokenização, prévias de resumo), separada do pipeline de transcrições.
+    - Fila principal ociosa: roda livre (ainda respeitando o HostRateLimiter global).
+    - Fila principal ocupada: jobs de rede só gastam `budget_share` da taxa de cada host;
+      jobs locais (CPU/DB) esperam a fila principal esvaziar.
+    """
+    POLL_INTERVAL = 0.5
+    # Tempo máximo que stop() espera os workers terminarem o job em mãos
+    STOP_TIMEOUT = 10.0
+
+    def __init__(self, rate_limiter: HostRateLimiter, is_main_busy: Callable[[], bool],
+                 budget_share: float = 0.2, on_error: Callable[[str, str, Exception], None] = None):
+        self.rate_limiter = rate_limiter
+        self.is_main_busy = is_main_busy
+        self.budget_share = budget_share
+        self.on_error = on_error
+        self.running = threading.Event()
+        self.threads: List[threading.Thread] = []
+        self._handlers: Dict[str, Tuple[Callable[..., bool], Optional[str]]] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._pending_keys = set()
+        self._lock = threading.Lock()
+        # Buckets próprios da faixa: fração da taxa atual (ajustada pelo AIMD) de cada host
+        self._budget: Dict[str, TokenBucket] = {}
+        self._stats: Dict[str, collections.Counter] = collections.defaultdict(collections.Counter)
+        self.mode = "ociosa"
+
+    def register(self, kind: str, handler: Callable[..., bool], host: str = None):
+        """handler(video_id, **payload) -> True (feito) / False (nada a fazer). `host`=None: job local."""
+        self._handlers[kind] = (handler, host)
+
+    def submit(self, kind: str, video_id: str, **payload) -> bool:
+        # O payload entra na chave: o mesmo vídeo pode ter jobs do mesmo tipo com parâmetros diferentes
+        key = (kind, video_id) + tuple(sorted(payload.items()))
+        with self._lock:
+            if key in self._pending_keys:
+                return False
+            self._pending_keys.add(key)
+            self._stats[kind]['queued'] += 1
+        self._queue.put((key, kind, video_id, payload))
+        return True
+
+    def start(self, workers: int = 1):
+        if self.running.is_set():
+            return
+        self.running.set()
+        self.threads = []
+        for i in range(max(1, workers)):
+            t = threading.Thread(target=self._loop, name=f"cf-backfill-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def stop(self):
+        """
+        Para a faixa (esperando o job em execução, até STOP_TIMEOUT) e descarta os jobs em fila;
+        a varredura de backfill os reencontra no próximo start.
+        """
+        self.running.clear()
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(max(0.0, deadline - time.monotonic()))
+        with self._lock:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._pending_keys.clear()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending_keys)
+
+    def _wait_turn(self, host: Optional[str]) -> bool:
+        """Bloqueia até o job poder rodar. Retorna False se a faixa foi parada."""
+        while self.running.is_set():
+            if not self.is_main_busy():
+                self.mode = "ociosa"
+                return True
+            self.mode = "orçamento"
+            if host is None:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            bucket = self._budget_bucket(host)
+            if bucket is None or bucket.try_acquire():
+                return True
+            time.sleep(min(self.POLL_INTERVAL, 1.0 / max(bucket.rate, 0.01)))
+        return False
+
+    def _budget_bucket(self, host: str) -> Optional[TokenBucket]:
+        main = self.rate_limiter.buckets.get(host)
+        if main is None:
+            return None
+        rate = main.rate * self.budget_share
+        bucket = self._budget.get(host)
+        if bucket is None:
+            bucket = self._budget[host] = TokenBucket(rate, 1)
+        elif bucket.rate != rate:
+            bucket.set_rate(rate)
+        return bucket
+
+    def _loop(self):
+        while self.running.is_set():
+            try:
+                key, kind, video_id, payload = self._queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            handler, host = self._handlers[kind]
+            try:
+                if not self._wait_turn(host):
+                    # Parada: o job é descartado junto com a fila (ver stop)
+                    return
+                done = handler(video_id, **payload)
+                with self._lock:
+                    self._stats[kind]['done' if done else 'skipped'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._stats[kind]['failed'] += 1
+                if self.on_error:
+                    self.on_error(kind, video_id, e)
+            finally:
+                if self.running.is_set():
+                    with self._lock:
+                        self._pending_keys.discard(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'pending': len(self._pending_keys),
+                'budget_share': self.budget_share,
+                'jobs': {k: dict(v) for k, v in self._stats.items()},
+            }
@@ -0,0 +1,62 @@
+# contextflow/core/caption_compactor.py
+import re
+from typing import List, Optional, Tuple
+
+Segment = Tuple[Optional[int], str]
+
+# Anotações de som ([Música], [Aplausos], (risos), ♪...) e hesitações isoladas
+_NON_SPEECH_RE = re.compile(
+    r'\[[^\]]{1,40}\]|\((?:risos|música|musica|aplausos|laughs?|music|applause|inaudível|inaudible)\)|[♪♫]+',
+    re.IGNORECASE)
+_FILLERS = frozenset({'ahn', 'ãh', 'hã', 'hum', 'hmm', 'hmmm', 'uh', 'uhm', 'erm'})
+_STRIP = '.,!?…;:'
+
+class CaptionCompactor:
+    """
+    Normaliza legendas automáticas antes da tokenização:
+    - remove a repetição "rolante" (cada cue repete o fim da anterior);
+    - remove anotações sem fala ([Música], ♪) e hesitações isoladas.
+    Trabalha por palavras numa única passada, comparando só as últimas `max_overlap`
+    palavras emitidas, então o custo é linear no tamanho da transcrição.
+    """
+    def __init__(self, max_overlap: int = 24, min_overlap: int = 2):
+        self.max_overlap = max_overlap
+        # Sobreposição de uma palavra só ("que que", "e e") costuma ser fala real
+        self.min_overlap = min_overlap
+
+    def _words(self, text: str) -> List[str]:
+        if '[' in text or '(' in text or '♪' in text or '♫' in text:
+            text = _NON_SPEECH_RE.sub(' ', text)
+        return [w for w in text.split() if w.lower().strip(_STRIP) not in _FILLERS]
+
+    def _overlap(self, tail: List[str], tail_keys: List[str], words: List[str]) -> int:
+        """Maior k tal que as últimas k palavras emitidas == as primeiras k da nova cue."""
+        keys = [w.lower().strip(_STRIP) for w in words[:len(tail)]]
+        for k in range(min(len(tail), len(keys)), self.min_overlap - 1, -1):
+            if tail_keys[-k:] == keys[:k]:
+                return k
+        return 0
+
+    def compact(self, segments: List[Segment]) -> List[Segment]:
+        out: List[Segment] = []
+        tail: List[str] = []
+        tail_keys: List[str] = []
+        for start, text in segments:
+            words = self._words(text)
+            if not words:
+                continue
+            k = self._overlap(tail, tail_keys, words)
+            if k:
+                words = words[k:]
+                if not words:
+                    continue
+            out.append((start, " ".join(words)))
+            tail.extend(words)
+            tail_keys.extend(w.lower().strip(_STRIP) for w in words)
+            if len(tail) > self.max_overlap:
+                del tail[:-self.max_overlap]
+                del tail_keys[:-self.max_overlap]
+        return out
+
+    def compact_text(self, segments: List[Segment]) -> str:
+        return " ".join(text for _, text in self.compact(segments))
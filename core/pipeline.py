@@ -0,0 +1,147 @@
+# contextflow/core/pipeline.py
+import threading
+import queue
+import time
+from typing import Callable, List, Dict, Any, Optional
+
+class Stage:
+    """
+    Etapa do pipeline: fila limitada de entrada + N workers executando `handler`.
+    O handler recebe a tarefa e retorna a própria tarefa (segue adiante) ou None (encerra).
+    """
+    def __init__(self, name: str, handler: Callable[[Any], Any], workers: int = 1, maxsize: int = 0):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.busy = 0
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queued': self.queue.qsize(),
+            'capacity': self.queue.maxsize,
+            'busy': self.busy,
+            'processed': self.processed,
+        }
+
+
+class Pipeline:
+    """
+    Encadeia Stages com filas limitadas. Quando a fila de uma etapa enche,
+    os workers da etapa anterior bloqueiam no `put` (backpressure para montante),
+    até chegar ao produtor que chama `submit`.
+    """
+    POLL_INTERVAL = 0.5
+    # Tempo máximo que stop() espera os workers terminarem o item em mãos
+    STOP_TIMEOUT = 10.0
+
+    def __init__(self, stages: List[Stage], on_error: Callable[[Any, Exception], None] = None):
+        self.stages = stages
+        self.on_error = on_error
+        self.running = threading.Event()
+        self.threads: List[threading.Thread] = []
+        # Itens dentro do pipeline (de submit até sair da última etapa)
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+    def start(self):
+        if self.running.is_set():
+            return
+        self.running.set()
+        self.threads = []
+        for idx, stage in enumerate(self.stages):
+            for i in range(stage.workers):
+                t = threading.Thread(target=self._stage_loop, args=(idx,),
+                                     name=f"cf-{stage.name}-{i}", daemon=True)
+                t.start()
+                self.threads.append(t)
+
+    def stop(self) -> int:
+        """
+        Para os workers (esperando o item em execução, até STOP_TIMEOUT) e descarta o que ficou
+        nas filas. Retorna quantos itens foram descartados.
+        """
+        self.running.clear()
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+        for t in self.threads:
+            if t is not threading.current_thread():
+                t.join(max(0.0, deadline - time.monotonic()))
+        return self._drain()
+
+    def _drain(self) -> int:
+        """Esvazia as filas das etapas, mantendo `_inflight` em dia."""
+        drained = 0
+        for stage in self.stages:
+            while True:
+                try:
+                    stage.queue.get_nowait()
+                except queue.Empty:
+                    break
+                stage.queue.task_done()
+                drained += 1
+        if drained:
+            self._track(-drained)
+        return drained
+
+    def submit(self, item: Any) -> bool:
+        """Entrega um item à primeira etapa. Bloqueia enquanto ela estiver cheia."""
+        self._track(+1)
+        if self._put(self.stages[0], item):
+            return True
+        self._track(-1)
+        return False
+
+    def _track(self, delta: int):
+        with self._inflight_lock:
+            self._inflight += delta
+
+    def _put(self, stage: Stage, item: Any) -> bool:
+        while self.running.is_set():
+            try:
+                stage.queue.put(item, timeout=self.POLL_INTERVAL)
+            except queue.Full:
+                continue
+            # Entrou depois do esvaziamento de stop(): descarta aqui mesmo
+            if not self.running.is_set():
+                self._drain()
+            return True
+        return False
+
+    def _stage_loop(self, idx: int):
+        stage = self.stages[idx]
+        next_stage = self.stages[idx + 1] if idx + 1 < len(self.stages) else None
+
+        while self.running.is_set():
+            try:
+                item = stage.queue.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            with stage._lock:
+                stage.busy += 1
+            forwarded = False
+            try:
+                result = stage.handler(item)
+                if result is not None and next_stage is not None:
+                    forwarded = self._put(next_stage, result)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(item, e)
+            finally:
+                with stage._lock:
+                    stage.busy -= 1
+                    stage.processed += 1
+                if not forwarded:
+                    self._track(-1)
+                stage.queue.task_done()
+
+    def pending(self) -> int:
+        """Itens em fila ou em execução em qualquer etapa."""
+        with self._inflight_lock:
+            return self._inflight
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {s.name: s.stats() for s in self.stages}
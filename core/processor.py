@@ -1,42 +1,160 @@
-
 # contextflow/core/processor.py
 import threading
-import queue
 import time
+import bisect
 import wx
 import os
 import uuid
-import random
-from typing import List, Callable, Dict, Any, Optional
+import socket
+import json
+import collections
+from typing import List, Callable, Dict, Any, Optional, Tuple
 
 from services.youtube_manager import YouTubeManager
 from storage.db_handler import DatabaseHandler
-from core.token_engine import count_tokens
-from constants import THUMBNAILS_DIR, EXPORTS_DIR
+from storage.response_cache import ResponseCache
+from storage.token_cache import TokenCountCache
+from core.token_engine import (count_tokens, count_tokens_at_offsets, count_tokens_async, count_tokens_batch,
+                               submit_tokenize, get_token_cache_stats, chunk_text)
+from core.segment_index import SegmentIndex, transcript_window
+from core.rate_limiter import HostRateLimiter, ConcurrencyLimiter, AIMDController
+from core.pipeline import Pipeline, Stage
+from core.source_predictor import SourcePredictor
+from core.caption_compactor import CaptionCompactor
+from core.thumbnails import make_variants
+from core.backfill import BackfillLane
+from core.token_estimator import get_token_estimator, duration_seconds
+from constants import (THUMBNAILS_DIR, THUMB_VARIANTS, EXPORTS_DIR, PIPELINE_STAGES, HOST_RATE_LIMITS, HOST_JITTER,
+                       AIMD_MIN_RATES, AIMD_MAX_RATES, AIMD_INITIAL_CONCURRENCY,
+                       TASK_LEASE_SECONDS, TASK_MAX_ATTEMPTS, TASK_RETRY_DELAY, TASK_RETENTION_SECONDS,
+                       SOURCE_AUTO_SYNC, SOURCE_SYNC_INTERVAL, SOURCE_SYNC_CHECK_INTERVAL,
+                       RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL,
+                       TRANSCRIPT_MISS_TTL, CAPTION_COMPACTION, CAPTION_COMPACTION_SOURCES, HOST_THUMBNAILS,
+                       BACKFILL_BUDGET_SHARE, BACKFILL_WORKERS, BACKFILL_SCAN_INTERVAL, BACKFILL_SCAN_LIMIT,
+                       SUMMARY_PREVIEW_CHARS, DEFAULT_ENCODING, TOKEN_ENCODINGS, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
 
 class ProcessingTask:
-    def __init__(self, url: str, playlist_id: str = None, playlist_title: str = None):
-        self.uuid = str(uuid.uuid4())
+    def __init__(self, url: str, playlist_id: str = None, playlist_title: str = None, task_id: str = None,
+                 video_id: str = None, force_refresh: bool = False, flat_meta: Dict[str, Any] = None):
+        # task_id: id da linha na tabela tasks (tarefas retomadas mantêm o mesmo UUID)
+        self.uuid = task_id or str(uuid.uuid4())
         self.url = url
         self.status = "pending" # pending, downloading, transcribing, completed, error
-        self.video_id = None
+        self.video_id = video_id
+        self.force_refresh = force_refresh
+        # Entrada flat da playlist (id, título, duração, canal, thumb) usada como metadado rápido
+        self.flat_meta = flat_meta
         self.title = "Aguardando..."
         self.error_msg = ""
         self.playlist_id = playlist_id
         self.playlist_title = playlist_title
 
+        # Resultados intermediários passados entre as etapas do pipeline
+        self.meta: Dict[str, Any] = {}
+        self.meta_provenance: Dict[str, str] = {}
+        self.thumbnail_path = ""
+        self.transcript: Optional[str] = None
+        self.segment_index: Optional[SegmentIndex] = None
+        self.segments = None
+        self.compact_transcript: Optional[str] = None
+        self.compact_token_count: Optional[int] = None
+        self.transcript_source = ""
+        self.token_count = 0
+        # Dicionário do yt-dlp extraído no máximo uma vez por tarefa (metadados + legendas)
+        self.info: Optional[Dict[str, Any]] = None
+        self.info_error: Optional[Exception] = None
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> 'ProcessingTask':
+        flat_meta = json.loads(row['flat_meta']) if row.get('flat_meta') else None
+        return cls(row['url'], row.get('playlist_id'), row.get('playlist_title'), task_id=row['id'],
+                   video_id=row.get('video_id'), force_refresh=bool(row.get('force_refresh')),
+                   flat_meta=flat_meta)
+
 class Processor:
     """
     Controlador central de processamento.
-    Gerencia a fila de vídeos e executa as etapas de download/transcrição em background.
+    Gerencia a fila de vídeos e executa as etapas de download/transcrição em background,
+    como um pipeline: metadata -> register -> transcript -> compact -> tokenize -> persist.
+    Enriquecimento não essencial (thumbnails, variantes, re-tokenização, prévias de resumo)
+    fica fora do caminho crítico, na faixa de backfill de baixa prioridade.
+    As tarefas ficam na tabela `tasks` (SQLite) e são reservadas com lease, então
+    sobrevivem a reinícios e podem ser divididas entre vários processos.
     """
-    def __init__(self):
-        self.task_queue = queue.Queue()
+    # Intervalo (s) do alimentador quando a fila durável está vazia
+    FEEDER_IDLE_INTERVAL = 1.0
+    # Janela (segundos) usada para calcular vídeos/minuto
+    THROUGHPUT_WINDOW = 300.0
+    # Vídeos por job no recálculo em lote de um encoding
+    ENCODING_BATCH_VIDEOS = 32
+
+    def __init__(self, stage_config: Dict[str, Tuple[int, int]] = None):
         self.active = False
-        self.thread = None
+        self.stage_config = dict(PIPELINE_STAGES)
+        if stage_config:
+            self.stage_config.update(stage_config)
         
-        self.yt_manager = YouTubeManager()
+        # Pacing por host (token buckets) em vez de sleep fixo entre vídeos
+        self.rate_limiter = HostRateLimiter(HOST_RATE_LIMITS, jitter=HOST_JITTER)
+        self.response_cache = ResponseCache(RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+        self.yt_manager = YouTubeManager(rate_limiter=self.rate_limiter, response_cache=self.response_cache)
         self.db_handler = DatabaseHandler()
+
+        # Controle adaptativo (AIMD): 429/403 reduzem taxa e concorrência, sucessos aumentam
+        network_workers = self.stage_config['metadata'][0] + self.stage_config['transcript'][0]
+        self.concurrency = ConcurrencyLimiter(AIMD_INITIAL_CONCURRENCY, network_workers)
+        self.controller = AIMDController(self.rate_limiter, self.concurrency,
+                                         AIMD_MIN_RATES, AIMD_MAX_RATES,
+                                         on_change=lambda msg: self._log(msg, "AIMD"))
+        self.yt_manager.on_response = self.controller.observe
+        # Ordem de sondagem de legendas aprendida por canal
+        self.predictor = SourcePredictor(self.db_handler, self.yt_manager.DEFAULT_PROBE_ORDER,
+                                         aliases=self.yt_manager.LEGACY_SOURCE_LABELS)
+        self.compactor = CaptionCompactor()
+
+        # Faixa de baixa prioridade: só usa o que sobra da fila principal
+        self.backfill = BackfillLane(self.rate_limiter, is_main_busy=lambda: self.pipeline.pending() > 0,
+                                     budget_share=BACKFILL_BUDGET_SHARE, on_error=self._on_backfill_error)
+        self.backfill.register('thumbnail', self._backfill_thumbnail, host=HOST_THUMBNAILS)
+        self.backfill.register('variants', self._backfill_variants)
+        self.backfill.register('retokenize', self._backfill_retokenize)
+        self.backfill.register('summary', self._backfill_summary)
+        self.backfill.register('encoding', self._backfill_encoding)
+        self.backfill.register('chunks', self._backfill_chunks)
+        # Estimativas calibradas (bytes/token e tokens/s por idioma) exibidas antes da contagem exata
+        self.token_estimator = get_token_estimator()
+        # Encodings extras já calculados para a biblioteca: vídeos novos também recebem a contagem
+        self._tracked_encodings = {e for e in self.db_handler.get_encoding_coverage() if e != DEFAULT_ENCODING}
+
+        self.pipeline = self._build_pipeline()
+        # Fila de entrada do pipeline (etapa de metadados)
+        self.task_queue = self.pipeline.stages[0].queue
+
+        # Identidade deste worker na fila durável (única por processo/instância)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leased: Dict[str, ProcessingTask] = {}
+        self._leased_lock = threading.Lock()
+        self._announced = set()  # UUIDs já exibidos na UI (on_task_queued)
+        self._wake_feeder = threading.Event()
+
+        # Índice local de vídeos já ingeridos/enfileirados: evita rede para duplicatas
+        self._index_lock = threading.Lock()
+        self.completed_ids = set()
+        self.queued_ids = set()
+
+        # Métricas de throughput
+        self._stats_lock = threading.Lock()
+        self._completed_times = collections.deque()
+        self._completed_total = 0
+        self._error_total = 0
+        # Origem dos metadados: entrada flat reaproveitada vs extração completa
+        self._meta_counts = collections.Counter()
+        # Tarefas encerradas pelo cache negativo de transcrições (sem nenhuma requisição)
+        self._transcript_skips = 0
+        # Compactação de legendas automáticas: vídeos, tempo gasto e tokens economizados
+        self._compaction = {'videos': 0, 'seconds': 0.0, 'tokens_saved': 0}
+        self._started_at = None
+        self.last_time_to_first_task: Optional[float] = None
         
         # Garante diretório de thumbnails
         os.makedirs(THUMBNAILS_DIR, exist_ok=True)
@@ -50,133 +168,767 @@ class Processor:
         self.on_task_queued: Callable[[str, str], None] = None # (uuid, url)
         self.on_task_started: Callable[[str], None] = None # (uuid)
         self.on_metadata_fetched: Callable[[str, str, str], None] = None # (uuid, video_id, title)
+        self.on_log: Callable[[str, str], None] = None # (mensagem, nível) -> console
+        # Contagens exatas gravadas em background (a UI troca a estimativa pelo valor exato)
+        self.on_tokens_updated: Callable[[List[str], str], None] = None # (video_ids, encoding)
+
+    def _build_pipeline(self) -> Pipeline:
+        handlers = [
+            ("metadata", self._stage_metadata),
+            ("register", self._stage_register),
+            ("transcript", self._stage_transcript),
+            ("compact", self._stage_compact),
+            ("tokenize", self._stage_tokenize),
+            ("persist", self._stage_persist),
+        ]
+        stages = []
+        for name, handler in handlers:
+            workers, maxsize = self.stage_config.get(name, (1, 0))
+            stages.append(Stage(name, handler, workers=workers, maxsize=maxsize))
+        return Pipeline(stages, on_error=self._handle_task_error)
 
     def start_processing(self):
         if not self.active:
             self.active = True
-            self.thread = threading.Thread(target=self._worker_loop, daemon=True)
-            self.thread.start()
+            self._started_at = time.monotonic()
+            self.db_handler.purge_finished_tasks(TASK_RETENTION_SECONDS)
+            self.pipeline.start()
+            threading.Thread(target=self._feeder_loop, name="cf-feeder", daemon=True).start()
+            threading.Thread(target=self._heartbeat_loop, name="cf-heartbeat", daemon=True).start()
+            self.backfill.start(BACKFILL_WORKERS)
+            threading.Thread(target=self._backfill_scan_loop, name="cf-backfill-scan", daemon=True).start()
+            threading.Thread(target=self._seed_token_estimator, name="cf-estimator-seed", daemon=True).start()
+            if SOURCE_AUTO_SYNC:
+                threading.Thread(target=self._sync_scheduler_loop, name="cf-sync", daemon=True).start()
 
     def stop_processing(self):
         self.active = False
+        self._wake_feeder.set()
+        # Espera os workers e esvazia as filas antes de soltar as reservas: nada do que foi
+        # devolvido continua na fila desta sessão (senão o vídeo seria processado duas vezes)
+        self.pipeline.stop()
+        self.backfill.stop()
+        # Devolve o que estava reservado: outro processo (ou o próximo start) retoma de onde parou
+        self.db_handler.release_tasks(self.worker_id)
+        with self._leased_lock:
+            self._leased.clear()
+
+    def _feeder_loop(self):
+        """Reserva tarefas da tabela `tasks` conforme há espaço na primeira etapa do pipeline."""
+        while self.active:
+            free = self.task_queue.maxsize - self.task_queue.qsize() if self.task_queue.maxsize else 8
+            rows = self.db_handler.claim_tasks(self.worker_id, max(1, free), TASK_LEASE_SECONDS) if free > 0 else []
+
+            if not rows:
+                self._wake_feeder.wait(self.FEEDER_IDLE_INTERVAL)
+                self._wake_feeder.clear()
+                continue
+
+            for row in rows:
+                task = ProcessingTask.from_row(row)
+                with self._leased_lock:
+                    self._leased[task.uuid] = task
+                # Tarefa retomada de outra sessão: ainda não tem linha na UI
+                if task.uuid not in self._announced:
+                    self._announce(task)
+                # Bloqueia enquanto a etapa de metadados estiver cheia (backpressure)
+                if not self.pipeline.submit(task):
+                    break
+
+    def _heartbeat_loop(self):
+        """Renova periodicamente o lease das tarefas em andamento neste worker."""
+        interval = TASK_LEASE_SECONDS / 3.0
+        while self.active:
+            time.sleep(interval)
+            with self._leased_lock:
+                ids = list(self._leased.keys())
+            try:
+                self.db_handler.renew_leases(self.worker_id, ids, TASK_LEASE_SECONDS)
+            except Exception as e:
+                print(f"Erro ao renovar leases: {e}")
+
+    def _release_lease(self, task: ProcessingTask):
+        with self._leased_lock:
+            self._leased.pop(task.uuid, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas para tuning: throughput (vídeos/min), etapas do pipeline e taxa por host."""
+        return {
+            'queued': self.pipeline.pending(),
+            'durable_queue': self.db_handler.get_task_counts(),
+            'completed': self._completed_total,
+            'errors': self._error_total,
+            'videos_per_minute': round(self.videos_per_minute(), 2),
+            'time_to_first_task': self.last_time_to_first_task,
+            'metadata_sources': dict(self._meta_counts),
+            'transcript_misses_skipped': self._transcript_skips,
+            'source_predictor': self.predictor.get_stats(),
+            'compaction': self._compaction_stats(),
+            'controller': self.controller.get_state(),
+            'stages': self.pipeline.get_stats(),
+            'hosts': self.rate_limiter.get_stats(),
+            'response_cache': self.response_cache.get_stats(),
+            'token_cache': get_token_cache_stats(),
+            'token_estimator': self.token_estimator.get_stats(),
+            'backfill': self.backfill.get_stats(),
+            'encodings': self.db_handler.get_encoding_coverage(),
+        }
+
+    def _compaction_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            c = dict(self._compaction)
+        c['ms_per_video'] = round(c.pop('seconds') * 1000 / c['videos'], 2) if c['videos'] else 0.0
+        return c
+
+    def videos_per_minute(self) -> float:
+        now = time.monotonic()
+        with self._stats_lock:
+            while self._completed_times and now - self._completed_times[0] > self.THROUGHPUT_WINDOW:
+                self._completed_times.popleft()
+            count = len(self._completed_times)
+        if not count or self._started_at is None:
+            return 0.0
+        # Antes de completar a janela, usa o tempo decorrido desde o início
+        elapsed = min(self.THROUGHPUT_WINDOW, now - self._started_at)
+        return count * 60.0 / max(elapsed, 1.0)
+
+    def _record_result(self, success: bool):
+        with self._stats_lock:
+            if success:
+                self._completed_total += 1
+                self._completed_times.append(time.monotonic())
+            else:
+                self._error_total += 1
+
+    def add_urls(self, raw_text: str, force_refresh: bool = False, sync_only_new: bool = False):
+        """
+        Recebe texto bruto e inicia processamento em background (não bloqueante).
+        force_refresh: reprocessa mesmo vídeos já concluídos.
+        sync_only_new: para playlists/canais, enfileira só entradas nunca vistas antes.
+        """
+        threading.Thread(target=self._async_resolve_urls, args=(raw_text, force_refresh, sync_only_new),
+                         daemon=True).start()
+
+    def _resolve_source(self, url: str, force_refresh: bool = False, sync_only_new: bool = False,
+                        batch: Dict[str, Any] = None) -> int:
+        """
+        Expande uma playlist/canal página a página, registra as entradas na tabela
+        source_entries e enfileira os vídeos conforme chegam. Em modo sync, só entradas
+        novas desde a última listagem. Retorna quantos vídeos foram ignorados como duplicatas.
+        """
+        url, kind = self.yt_manager.normalize_collection_url(url)
+        batch = batch if batch is not None else self._new_batch()
+        sync_started = time.time()
+
+        pl_id = pl_title = None
+        known = set()
+        skipped = new_count = total = 0
+        for pl_meta, page in self.yt_manager.iter_playlist_pages(url):
+            if pl_id is None:
+                pl_id, pl_title = pl_meta['id'], pl_meta['title']
+                self.db_handler.upsert_source(pl_id, url, pl_title, kind)
+                known = self.db_handler.get_source_entry_ids(pl_id)
+
+            self.db_handler.upsert_source_entries(pl_id, page, sync_started)
+            total += len(page)
+            for vid_info in page:
+                is_new = vid_info['id'] not in known
+                new_count += is_new
+                if sync_only_new and not is_new:
+                    continue
+                v_url = vid_info.get('url') or f"https://www.youtube.com/watch?v={vid_info['id']}"
+                result = self._enqueue_video(v_url, pl_id, pl_title, video_id=vid_info.get('id'),
+                                             force_refresh=force_refresh, flat_meta=vid_info)
+                if result is False:
+                    skipped += 1
+                elif result:
+                    self._mark_first_task(batch)
+
+        if pl_id is None:
+            self._log(f"Não foi possível listar: {url}", "ERROR")
+            return 0
 
-    def add_urls(self, raw_text: str):
-        """Recebe texto bruto e inicia processamento em background (não bloqueante)."""
-        threading.Thread(target=self._async_resolve_urls, args=(raw_text,), daemon=True).start()
+        removed = self.db_handler.finish_source_sync(pl_id, sync_started)
+        self._log(f"Sync '{pl_title}': {total} entradas, {new_count} novas, {len(removed)} removidas.", "SYNC")
+        return skipped
 
-    def _async_resolve_urls(self, raw_text: str):
+    def _new_batch(self) -> Dict[str, Any]:
+        return {'started': time.monotonic(), 'first_task': None}
+
+    def _mark_first_task(self, batch: Dict[str, Any]):
+        """Mede o tempo até a primeira tarefa enfileirada (time-to-first-task) do lote."""
+        if batch['first_task'] is not None:
+            return
+        batch['first_task'] = time.monotonic() - batch['started']
+        self.last_time_to_first_task = batch['first_task']
+        self._log(f"Primeira tarefa enfileirada em {batch['first_task']:.2f}s.", "PERF")
+
+    def sync_all_sources(self, only_due: bool = False):
+        """Re-sincroniza todas as fontes rastreadas (enfileira só vídeos novos)."""
+        now = time.time()
+        self._refresh_video_index()
+        for source in self.db_handler.get_sources(auto_sync_only=only_due):
+            if only_due and source.get('last_sync_at') and now - source['last_sync_at'] < SOURCE_SYNC_INTERVAL:
+                continue
+            if not self.active:
+                break
+            try:
+                self._resolve_source(source['url'], sync_only_new=True)
+            except Exception as e:
+                self._log(f"Erro ao sincronizar {source['url']}: {e}", "ERROR")
+
+    def _sync_scheduler_loop(self):
+        """Agendador de re-sync em background das fontes com auto_sync."""
+        while self.active:
+            try:
+                self.sync_all_sources(only_due=True)
+            except Exception as e:
+                print(f"Erro no agendador de sync: {e}")
+            for _ in range(int(SOURCE_SYNC_CHECK_INTERVAL)):
+                if not self.active: break
+                time.sleep(1)
+
+    def _refresh_video_index(self):
+        """Recarrega o índice local (barato: só IDs). Reflete exclusões feitas na UI."""
+        completed = self.db_handler.get_completed_video_ids()
+        queued = self.db_handler.get_open_task_video_ids()
+        with self._index_lock:
+            self.completed_ids = completed
+            self.queued_ids = queued
+
+    def _is_duplicate(self, video_id: Optional[str]) -> bool:
+        if not video_id: return False
+        with self._index_lock:
+            return video_id in self.completed_ids or video_id in self.queued_ids
+
+    def _async_resolve_urls(self, raw_text: str, force_refresh: bool = False, sync_only_new: bool = False):
         """Expande playlists e valida URLs em background."""
         lines = [l.strip() for l in raw_text.split('\n') if l.strip()]
+        batch = self._new_batch()
+        self._refresh_video_index()
+        skipped = 0
         
         for line in lines:
             try:
-                if "list=" in line:
-                    # É playlist
-                    pl_info = self.yt_manager.get_playlist_info(line)
-                    if pl_info and pl_info.get('videos'):
-                        pl_id = pl_info['id']
-                        pl_title = pl_info['title']
-                        for vid_info in pl_info['videos']:
-                            v_url = vid_info.get('url') or f"https://www.youtube.com/watch?v={vid_info['id']}"
-                            # Verifica cancelamento ou status aqui se necessário
-                            self._enqueue_video(v_url, pl_id, pl_title)
+                if self.yt_manager.is_collection_url(line):
+                    # É playlist ou canal
+                    skipped += self._resolve_source(line, force_refresh, sync_only_new, batch=batch)
                 else:
-                    self._enqueue_video(line)
+                    result = self._enqueue_video(line, force_refresh=force_refresh)
+                    if result is False:
+                        skipped += 1
+                    elif result:
+                        self._mark_first_task(batch)
             except Exception as e:
                 print(f"Erro ao resolver URL {line}: {e}")
 
-    def _enqueue_video(self, url: str, pl_id: str = None, pl_title: str = None):
+        if skipped:
+            self._log(f"{skipped} vídeo(s) já processado(s) ou na fila foram ignorados "
+                      f"(use 'Forçar atualização' para reprocessar).", "INFO")
+
+    def _enqueue_video(self, url: str, pl_id: str = None, pl_title: str = None,
+                       video_id: str = None, force_refresh: bool = False,
+                       flat_meta: Dict[str, Any] = None) -> Optional[bool]:
+        """Enfileira a URL. Retorna False se for duplicata ignorada, None se a URL for inválida."""
         if self.yt_manager.validate_url(url):
-            task = ProcessingTask(url, pl_id, pl_title)
-            self.task_queue.put(task)
+            # ID resolvido localmente (regex ou entrada flat da playlist), sem yt-dlp
+            video_id = video_id or self.yt_manager.extract_video_id(url)
+            if not force_refresh and self._is_duplicate(video_id):
+                return False
+
+            task = ProcessingTask(url, pl_id, pl_title, video_id=video_id, force_refresh=force_refresh,
+                                  flat_meta=flat_meta)
+            if video_id:
+                with self._index_lock:
+                    self.queued_ids.add(video_id)
             
-            # Notifica UI que entrou na fila
-            if self.on_task_queued:
-                wx.CallAfter(self.on_task_queued, task.uuid, task.url)
+            # Persiste na fila durável; o alimentador entrega ao pipeline
+            self.db_handler.enqueue_task(task.uuid, task.url, pl_id, pl_title,
+                                         video_id=video_id, force_refresh=force_refresh,
+                                         flat_meta=json.dumps(flat_meta) if flat_meta else None)
+            self._announce(task)
+            self._wake_feeder.set()
+            return True
+        return None
+
+    def _announce(self, task: ProcessingTask):
+        # Notifica UI que entrou na fila
+        self._announced.add(task.uuid)
+        if self.on_task_queued:
+            wx.CallAfter(self.on_task_queued, task.uuid, task.url)
+
+    # --- Etapas do Pipeline ---
+
+    def _stage_metadata(self, task: ProcessingTask) -> Optional[ProcessingTask]:
+        # 0. Notifica Início (Task Started)
+        if self.on_task_started:
+            wx.CallAfter(self.on_task_started, task.uuid)
+
+        # Concluído por outra tarefa/processo desde que foi enfileirado
+        if not task.force_refresh and task.video_id:
+            existing = self.db_handler.get_video(task.video_id)
+            if existing and existing.get('status') == 'completed':
+                task.title = existing.get('title') or task.title
+                return self._skip_task(task)
+            # Cache negativo: todos os idiomas confirmados sem legenda; encerra antes da extração
+            if self._transcript_known_missing(task):
+                task.title = (existing or {}).get('title') or task.title
+                return self._skip_no_transcript(task)
+
+        # 1. Metadados: entrada flat da playlist quando completa, extração só para o que faltar
+        meta, provenance = self._resolve_metadata(task)
+
+        task.meta = meta
+        task.meta_provenance = provenance
+        task.video_id = meta.get('id')
+        task.title = meta.get('title')
+        self.db_handler.update_task_video_id(task.uuid, task.video_id)
+
+        # Notifica ID real descoberto
+        if self.on_metadata_fetched:
+            wx.CallAfter(self.on_metadata_fetched, task.uuid, task.video_id, task.title)
+        
+        self._notify_update(task.video_id, "Registrando...")
+        return task
+
+    def _count_meta_source(self, source: str):
+        with self._stats_lock:
+            self._meta_counts[source] += 1
+
+    def _count_transcript_skip(self):
+        with self._stats_lock:
+            self._transcript_skips += 1
+
+    def _resolve_metadata(self, task: ProcessingTask) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        if task.flat_meta:
+            meta, provenance = self.yt_manager.metadata_from_flat_entry(task.flat_meta, task.url)
+            missing = [f for f in self.yt_manager.FLAT_REQUIRED_FIELDS if provenance.get(f) == 'missing']
+            if not missing:
+                self._count_meta_source('flat')
+                return meta, provenance
+        else:
+            meta, provenance = {}, {}
+
+        # Extração completa (limitada pela concorrência do controlador AIMD)
+        with self.concurrency:
+            info = self._task_info(task)
+        if info is not None:
+            full = self.yt_manager.get_video_metadata(task.url, info=info)
+        else:
+            full = self.yt_manager.metadata_error(task.url, task.info_error)
+        
+        if full['status'] == 'error':
+            raise Exception("Falha ao obter metadados")
+
+        self._count_meta_source('extract')
+        if not meta:
+            return full, {k: 'extract' for k in ('title', 'duration', 'channel_name', 'upload_date', 'thumbnail')}
+
+        # Preenche apenas os campos que a entrada flat não trouxe
+        for field, source in list(provenance.items()):
+            if source == 'missing' and full.get(field):
+                meta[field] = full[field]
+                provenance[field] = 'extract'
+        if 'duration_seconds' not in meta and full.get('duration_seconds'):
+            meta['duration_seconds'] = full['duration_seconds']
+        return meta, provenance
+
+    def _task_info(self, task: ProcessingTask) -> Optional[Dict[str, Any]]:
+        """
+        Extrai o vídeo com yt-dlp uma única vez durante a vida da tarefa; metadados e
+        fallback de legendas leem do mesmo dicionário. O chamador segura a concorrência.
+        """
+        if task.info is None and task.info_error is None:
+            try:
+                task.info = self.yt_manager.extract_video_info(task.url)
+            except Exception as e:
+                task.info_error = e
+        return task.info
+
+    def _stage_register(self, task: ProcessingTask) -> ProcessingTask:
+        # Thumbnail fica para a faixa de backfill; aqui só reaproveita a que já existir
+        thumb_local_path = os.path.join(THUMBNAILS_DIR, f"{task.video_id}.jpg")
+        task.thumbnail_path = thumb_local_path if os.path.exists(thumb_local_path) else ""
+        if not task.thumbnail_path:
+            self.backfill.submit('thumbnail', task.video_id, url=task.meta.get('thumbnail'))
 
-    def _worker_loop(self):
+        # Salva metadados iniciais no banco
+        self.db_handler.add_video_entry({
+            'id': task.video_id,
+            'url': task.url,
+            'title': task.title,
+            'duration': task.meta.get('duration'),
+            'upload_date': task.meta.get('upload_date'),
+            'thumbnail_path': task.thumbnail_path,
+            'playlist_id': task.playlist_id,
+            'playlist_title': task.playlist_title,
+            'channel_name': task.meta.get('channel_name'),
+            'added_at': task.meta.get('added_at'),
+            'meta_provenance': json.dumps(task.meta_provenance) if task.meta_provenance else None,
+            'status': 'processing'
+        })
+
+        self._notify_update(task.video_id, "Baixando Transcrição...")
+        return task
+
+    def _stage_transcript(self, task: ProcessingTask) -> Optional[ProcessingTask]:
+        # 2. Transcrição
+        # Cache negativo: idiomas já confirmados sem legenda não são sondados de novo
+        skip = set() if task.force_refresh else self.db_handler.get_transcript_misses(task.video_id)
+        if skip.issuperset(self.yt_manager.TRANSCRIPT_LANG_SETS):
+            return self._skip_no_transcript(task)
+
+        channel = task.meta.get('channel_name')
+        order = self.predictor.order_for(channel)
+        with self.concurrency:
+            segments, source, missing, probes = self.yt_manager.probe_transcript(
+                task.video_id, info_provider=lambda: self._task_info(task), skip_langs=skip, order=order)
+        if missing:
+            self.db_handler.record_transcript_misses(task.video_id, sorted(missing), TRANSCRIPT_MISS_TTL)
+        
+        if not segments:
+            if skip.union(missing).issuperset(self.yt_manager.TRANSCRIPT_LANG_SETS):
+                # Nenhum idioma tem legenda: resultado definitivo, não adianta repetir a tarefa
+                return self._skip_no_transcript(task, probed=True)
+            raise Exception("Transcrição indisponível")
+        self.predictor.record(channel, order, source, probes)
+
+        task.transcript, task.segment_index = SegmentIndex.from_segments(segments)
+        task.segments = segments
+        task.transcript_source = source
+        # O info dict (formatos, legendas de todos os idiomas) é grande; não precisa seguir adiante
+        task.info = None
+        self._notify_update(task.video_id, "Contando Tokens...")
+        return task
+
+    def _stage_compact(self, task: ProcessingTask) -> ProcessingTask:
+        # 2b. Legendas automáticas: remove repetições rolantes e anotações sem fala
+        if CAPTION_COMPACTION and task.transcript_source in CAPTION_COMPACTION_SOURCES:
+            started = time.perf_counter()
+            task.compact_transcript = self.compactor.compact_text(task.segments)
+            with self._stats_lock:
+                self._compaction['videos'] += 1
+                self._compaction['seconds'] += time.perf_counter() - started
+        task.segments = None
+        return task
+
+    def _stage_tokenize(self, task: ProcessingTask) -> ProcessingTask:
+        # 3. Contagem de Tokens (pool compartilhado: texto bruto e compacto em paralelo)
+        raw = submit_tokenize(self._count_transcript, task.transcript, task.segment_index)
+        compact = count_tokens_async(task.compact_transcript) if task.compact_transcript is not None else None
+        task.token_count = raw.result()
+        if compact is not None:
+            task.compact_token_count = compact.result()
+            with self._stats_lock:
+                self._compaction['tokens_saved'] += task.token_count - task.compact_token_count
+        return task
+
+    @staticmethod
+    def _count_transcript(text: str, index: Optional[SegmentIndex]) -> int:
+        if index is not None:
+            # Mesma tokenização do total, com as somas prefixas por segmento
+            total, prefix = count_tokens_at_offsets(text, index.token_boundaries())
+            index.set_token_prefix(prefix)
+            return total
+        total, _ = count_tokens(text)
+        return total
+
+    def _stage_persist(self, task: ProcessingTask) -> None:
+        # 4. Salvar
+        self.db_handler.save_transcript(task.video_id, task.transcript, compact_text=task.compact_transcript)
+        self.db_handler.set_compact_token_count(task.video_id, task.compact_token_count)
+        self.db_handler.save_token_counts(task.video_id, DEFAULT_ENCODING, task.token_count,
+                                          task.compact_token_count, replace_others=True)
+        self.db_handler.save_segment_index(task.video_id, task.segment_index.to_blobs() if task.segment_index else None)
+        self.db_handler.update_video_status(task.video_id, "completed", task.token_count)
+        self.db_handler.set_transcript_source(task.video_id, task.transcript_source)
+        self.db_handler.complete_task(task.uuid)
+        self._release_lease(task)
+        self.token_estimator.observe('lang', self._source_language(task.transcript_source), DEFAULT_ENCODING,
+                                     len(task.transcript.encode('utf-8')), task.token_count,
+                                     task.meta.get('duration_seconds') or 0)
+        with self._index_lock:
+            self.completed_ids.add(task.video_id)
+            self.queued_ids.discard(task.video_id)
+        
+        self._record_result(True)
+        self._notify_complete(task.video_id, task.title)
+        # save_transcript zera o resumo: a prévia volta pela faixa de backfill
+        self.backfill.submit('summary', task.video_id)
+        self.backfill.submit('chunks', task.video_id)
+        for encoding in list(self._tracked_encodings):
+            self.backfill.submit('encoding', task.video_id, encoding=encoding)
+        return None
+
+    # --- Faixa de backfill ---
+
+    def _backfill_scan_loop(self):
+        """Varre o banco periodicamente por enriquecimento pendente (ex.: vídeos de sessões antigas)."""
         while self.active:
             try:
-                task = self.task_queue.get(timeout=1) 
-            except queue.Empty:
-                continue
+                self.schedule_backfill()
+            except Exception as e:
+                print(f"Erro na varredura de backfill: {e}")
+            for _ in range(int(BACKFILL_SCAN_INTERVAL)):
+                if not self.active: break
+                time.sleep(1)
 
-            self._process_task(task)
-            self.task_queue.task_done()
-            
-            # Jitter Anti-Blocking: Pausa aleatória entre vídeos
-            time.sleep(random.uniform(2.0, 5.0))
+    def schedule_backfill(self) -> int:
+        """Enfileira na faixa de backfill o que estiver faltando no banco. Retorna quantos jobs novos."""
+        submitted = 0
+        for kind, video_ids in self.db_handler.get_backfill_candidates(BACKFILL_SCAN_LIMIT).items():
+            for video_id in video_ids:
+                submitted += self.backfill.submit(kind, video_id)
+        return submitted
 
-    def _process_task(self, task: ProcessingTask):
-        try:
-            # 0. Notifica Início (Task Started)
-            if self.on_task_started:
-                wx.CallAfter(self.on_task_started, task.uuid)
+    def _backfill_thumbnail(self, video_id: str, url: str = None) -> bool:
+        thumb_local_path = os.path.join(THUMBNAILS_DIR, f"{video_id}.jpg")
+        if not os.path.exists(thumb_local_path):
+            if not self.yt_manager.download_thumbnail(url or self.yt_manager.thumbnail_url(video_id), thumb_local_path):
+                raise Exception("Falha ao baixar thumbnail")
+        self.db_handler.set_thumbnail_path(video_id, thumb_local_path)
+        # Variantes (tabela/detalhe) geradas aqui, fora da thread da UI, uma única vez
+        self._backfill_variants(video_id)
+        return True
 
-            # 1. Metadados
-            meta = self.yt_manager.get_video_metadata(task.url)
-            
-            if meta['status'] == 'error':
-                raise Exception("Falha ao obter metadados")
+    def _backfill_variants(self, video_id: str) -> bool:
+        variants = make_variants(os.path.join(THUMBNAILS_DIR, f"{video_id}.jpg"), THUMB_VARIANTS)
+        self.db_handler.save_thumb_variants(video_id, variants)
+        return bool(variants)
 
-            task.video_id = meta.get('id')
-            task.title = meta.get('title')
+    def _backfill_retokenize(self, video_id: str) -> bool:
+        data = self.db_handler.get_transcript(video_id)
+        if not data or not data.get('full_text'):
+            return False
+        row = self.db_handler.get_segment_index(video_id)
+        index = SegmentIndex.from_blobs(row) if row else None
+        raw = submit_tokenize(self._count_transcript, data['full_text'], index)
+        compact = count_tokens_async(data['compact_text']) if data.get('compact_text') else None
+        token_count = raw.result()
+        self.db_handler.set_token_count(video_id, token_count)
+        if index is not None:
+            self.db_handler.save_segment_index(video_id, index.to_blobs())
+        compact_count = compact.result() if compact is not None else None
+        if compact_count is not None:
+            self.db_handler.set_compact_token_count(video_id, compact_count)
+        self.db_handler.save_token_counts(video_id, DEFAULT_ENCODING, token_count, compact_count)
+        self._notify_tokens_updated([video_id], DEFAULT_ENCODING)
+        return True
 
-            # Notifica ID real descoberto
-            if self.on_metadata_fetched:
-                wx.CallAfter(self.on_metadata_fetched, task.uuid, task.video_id, task.title)
-            
-            self._notify_update(task.video_id, "Baixando Thumbnail...")
-            
-            # Download Thumbnail
-            thumb_filename = f"{task.video_id}.jpg"
-            thumb_local_path = os.path.join(THUMBNAILS_DIR, thumb_filename)
-            thumb_url = meta.get('thumbnail')
-            
-            if thumb_url and not os.path.exists(thumb_local_path):
-                self.yt_manager.download_thumbnail(thumb_url, thumb_local_path)
-            
-            # Se falhar ou não existir, deixar path vazio ou padrão
-            final_thumb_path = thumb_local_path if os.path.exists(thumb_local_path) else ""
+    def _backfill_encoding(self, video_id: str, encoding: str, batch: Tuple[str, ...] = ()) -> bool:
+        """Conta `encoding` para um vídeo ou um lote (uma chamada a count_tokens_batch para todos)."""
+        rows = [(vid, self.db_handler.get_transcript(vid)) for vid in (batch or (video_id,))]
+        rows = [(vid, data) for vid, data in rows if data and data.get('full_text')]
+        if not rows:
+            return False
+        texts = []
+        for _, data in rows:
+            texts += [data['full_text'], data.get('compact_text') or ""]
+        counts = count_tokens_batch(texts, encoding)
+        samples = []
+        for i, (vid, data) in enumerate(rows):
+            compact_count = counts[2 * i + 1] if data.get('compact_text') else None
+            self.db_handler.save_token_counts(vid, encoding, counts[2 * i], compact_count)
+            video = self.db_handler.get_video(vid) or {}
+            samples.append(('lang', self._source_language(video.get('transcript_source')), encoding,
+                            len(data['full_text'].encode('utf-8')), counts[2 * i],
+                            duration_seconds(video.get('duration')) or 0))
+        self.token_estimator.observe_many(samples)
+        self._notify_tokens_updated([vid for vid, _ in rows], encoding)
+        return True
 
-            self._notify_update(task.video_id, "Baixando Transcrição...")
-            
-            # Salva metadados iniciais no banco
-            self.db_handler.add_video_entry({
-                'id': task.video_id,
-                'url': task.url,
-                'title': task.title,
-                'duration': meta.get('duration'),
-                'upload_date': meta.get('upload_date'),
-                'thumbnail_path': final_thumb_path,
-                'playlist_id': task.playlist_id,
-                'playlist_title': task.playlist_title,
-                'channel_name': meta.get('channel_name'),
-                'added_at': meta.get('added_at'),
-                'status': 'processing'
-            })
-
-            # 2. Transcrição
-            transcript, source = self.yt_manager.get_transcript(task.video_id)
-            
-            if not transcript:
-                raise Exception("Transcrição indisponível")
+    def _notify_tokens_updated(self, video_ids: List[str], encoding: str):
+        if self.on_tokens_updated:
+            wx.CallAfter(self.on_tokens_updated, video_ids, encoding)
 
-            # 3. Contagem de Tokens
-            token_count, _ = count_tokens(transcript)
-            
-            # 4. Salvar
-            self.db_handler.save_transcript(task.video_id, transcript)
-            self.db_handler.update_video_status(task.video_id, "completed", token_count)
-            
-            self._notify_complete(task.video_id, task.title)
+    # --- Chunks para LLM ---
 
+    def get_chunks(self, video_id: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS,
+                   encoding: str = None) -> List[Dict[str, Any]]:
+        """
+        Chunks da transcrição com no máximo `max_tokens` (cortes nos inícios de segmento, ou fins
+        de frase sem índice). Lidos de transcript_chunks; gerados e gravados se não existirem
+        ou se o hash do full_text mudou. Cada chunk: index, text, tokens, char_start/char_end e,
+        com índice de segmentos, start_ms.
+        """
+        encoding = encoding or DEFAULT_ENCODING
+        data = self.db_handler.get_transcript(video_id)
+        text = data.get('full_text') if data else None
+        if not text:
+            return []
+        content_hash = TokenCountCache.content_hash(text)
+        row = self.db_handler.get_segment_index(video_id)
+        index = SegmentIndex.from_blobs(row) if row else None
+
+        rows = self.db_handler.get_transcript_chunks(video_id, encoding, max_tokens, overlap)
+        if rows and rows[0]['content_hash'] == content_hash:
+            spans = [(r['char_start'], r['char_end'], r['token_count']) for r in rows]
+        else:
+            boundaries = index.token_boundaries() if index is not None else None
+            spans = chunk_text(text, max_tokens, overlap, boundaries, encoding)
+            self.db_handler.save_transcript_chunks(video_id, encoding, max_tokens, overlap, content_hash, spans)
+
+        chunks = []
+        for i, (start, end, tokens) in enumerate(spans):
+            chunk = {'index': i, 'text': text[start:end].strip(), 'tokens': tokens, 'char_start': start, 'char_end': end}
+            if index is not None:
+                # start + 1: o espaço antes do segmento pertence a ele (ver token_boundaries)
+                seg = min(len(index) - 1, max(0, bisect.bisect_right(index.offsets, start + 1) - 1))
+                chunk['start_ms'] = index.starts[seg]
+            chunks.append(chunk)
+        return chunks
+
+    def _backfill_chunks(self, video_id: str) -> bool:
+        return bool(self.get_chunks(video_id))
+
+    # --- Estimativas de tokens ---
+
+    def _source_language(self, source: Optional[str]) -> Optional[str]:
+        """Idioma ('pt', 'en') da fonte gravada em videos.transcript_source."""
+        probe = self.yt_manager.TRANSCRIPT_PROBES.get(self.yt_manager.normalize_source(source) or "")
+        return probe[1] if probe else None
+
+    def _seed_token_estimator(self):
+        """Primeira execução: calibra o estimador com as contagens exatas já guardadas na biblioteca."""
+        if self.token_estimator.is_calibrated('lang'):
+            return
+        try:
+            rows = self.db_handler.get_token_ratio_samples()
         except Exception as e:
-            if task.video_id:
-                self.db_handler.update_video_status(task.video_id, "error")
-                self._notify_error(task.video_id, str(e))
-            else:
-                self._notify_error("UNKNOWN", str(e))
+            print(f"Erro ao calibrar o estimador de tokens: {e}")
+            return
+        self.token_estimator.observe_many(
+            ('lang', self._source_language(source), encoding, n_bytes, tokens, duration_seconds(duration) or 0)
+            for encoding, source, duration, n_bytes, tokens in rows)
+
+    def estimate_video_tokens(self, video: Dict[str, Any], encoding: str = None) -> Optional[int]:
+        """
+        Estimativa instantânea para um vídeo sem contagem exata em `encoding`: a partir da contagem
+        do encoding padrão (se houver) ou da duração, com o idioma da fonte gravada ou prevista.
+        """
+        encoding = encoding or DEFAULT_ENCODING
+        lang = self._source_language(video.get('transcript_source'))
+        if lang is None and video.get('channel_name'):
+            lang = self._source_language(self.predictor.order_for(video['channel_name'])[0])
+        known = video.get('token_count') or 0
+        if known and encoding != DEFAULT_ENCODING:
+            n_bytes = known * self.token_estimator.bytes_per_token('lang', lang, DEFAULT_ENCODING)
+            return self.token_estimator.estimate_bytes(int(n_bytes), 'lang', lang, encoding)
+        return self.token_estimator.estimate_duration(duration_seconds(video.get('duration')), lang, encoding)
+
+    def encoding_token_counts(self, encoding: str) -> Optional[Dict[str, Tuple[int, Optional[int]]]]:
+        """Contagens do encoding escolhido nas telas (None = padrão, lido de videos.token_count)."""
+        if encoding == DEFAULT_ENCODING:
+            return None
+        return self.db_handler.get_token_counts(encoding)
+
+    def token_text(self, video: Dict[str, Any], counts, encoding: str = None, estimate: bool = True) -> str:
+        """
+        Texto da coluna de tokens (grade e tabela): contagem exata; sem ela, a estimativa calibrada
+        marcada com '~' (trocada quando a exata chegar). `counts` vem de encoding_token_counts.
+        """
+        if counts is None:
+            exact = video.get('token_count') or 0
+            if exact or video.get('status') in ('completed', 'error', 'no_transcript'):
+                return str(exact)
+        else:
+            c = counts.get(video['id'])
+            if c:
+                return str(c[0])
+        approx = None
+        if estimate and video.get('status') not in ('error', 'no_transcript'):
+            approx = self.estimate_video_tokens(video, encoding)
+        if approx:
+            return f"~{approx}"
+        return "0" if counts is None else "…"  # ainda na fila de recálculo
+
+    def recompute_encoding(self, encoding: str) -> int:
+        """
+        Recalcula em lote (faixa de backfill, em background) a contagem de `encoding` para toda a
+        biblioteca; daqui em diante vídeos novos também a recebem. Retorna quantos vídeos entraram.
+        """
+        if encoding not in TOKEN_ENCODINGS:
+            raise ValueError(f"Encoding desconhecido: {encoding}")
+        if encoding != DEFAULT_ENCODING:
+            self._tracked_encodings.add(encoding)
+        video_ids = self.db_handler.get_video_ids_missing_encoding(encoding)
+        if encoding == DEFAULT_ENCODING:
+            submitted = sum(self.backfill.submit('retokenize', vid) for vid in video_ids)
+        else:
+            # Lotes de vídeos por job: cada lote é espalhado pelos núcleos via count_tokens_batch
+            submitted = 0
+            for i in range(0, len(video_ids), self.ENCODING_BATCH_VIDEOS):
+                chunk = tuple(video_ids[i:i + self.ENCODING_BATCH_VIDEOS])
+                if self.backfill.submit('encoding', chunk[0], encoding=encoding, batch=chunk):
+                    submitted += len(chunk)
+        self._log(f"Recalculando tokens ({encoding}) para {submitted} vídeo(s) em background.", "INFO")
+        return submitted
+
+    def _backfill_summary(self, video_id: str) -> bool:
+        data = self.db_handler.get_transcript(video_id)
+        if not data or data.get('summary'):
+            return False
+        preview = self._summary_preview(data.get('compact_text') or data.get('full_text') or "")
+        return bool(preview) and self.db_handler.set_summary_placeholder(video_id, preview)
+
+    @staticmethod
+    def _summary_preview(text: str, limit: int = SUMMARY_PREVIEW_CHARS) -> str:
+        """Prévia extrativa (início do texto, cortado em fim de frase ou palavra) até haver resumo real."""
+        text = text.strip()
+        if not text:
+            return ""
+        if len(text) > limit:
+            cut = text[:limit]
+            end = max(cut.rfind('. '), cut.rfind('? '), cut.rfind('! '))
+            text = cut[:end + 1] if end >= limit // 2 else cut.rsplit(' ', 1)[0] + "…"
+        return f"[Prévia] {text}"
+
+    def _on_backfill_error(self, kind: str, video_id: str, error: Exception):
+        self._log(f"Backfill '{kind}' falhou para {video_id}: {error}", "WARN")
+
+    def _skip_task(self, task: ProcessingTask) -> None:
+        """Encerra a tarefa sem trabalho de rede (vídeo já ingerido)."""
+        self.db_handler.complete_task(task.uuid)
+        self._release_lease(task)
+        if self.on_metadata_fetched:
+            wx.CallAfter(self.on_metadata_fetched, task.uuid, task.video_id, task.title)
+        self._notify_update(task.video_id, "completed")
+        return None
+
+    def _transcript_known_missing(self, task: ProcessingTask) -> bool:
+        misses = self.db_handler.get_transcript_misses(task.video_id)
+        return misses.issuperset(self.yt_manager.TRANSCRIPT_LANG_SETS)
+
+    def _skip_no_transcript(self, task: ProcessingTask, probed: bool = False) -> None:
+        """
+        Encerra a tarefa (sem nova tentativa) para vídeo sem legendas em nenhum idioma. `probed`:
+        a sondagem acabou de confirmar; senão veio do cache negativo. force_refresh sonda de novo.
+        """
+        if not probed:
+            self._count_transcript_skip()
+        self.db_handler.complete_task(task.uuid)
+        self._release_lease(task)
+        with self._index_lock:
+            self.queued_ids.discard(task.video_id)
+        self.db_handler.update_video_status(task.video_id, "no_transcript")
+        if self.on_metadata_fetched:
+            wx.CallAfter(self.on_metadata_fetched, task.uuid, task.video_id, task.title)
+        self._notify_update(task.video_id, "no_transcript")
+        return None
+
+    def _handle_task_error(self, task: ProcessingTask, error: Exception):
+        self._record_result(False)
+        self.db_handler.fail_task(task.uuid, self.worker_id, str(error), TASK_MAX_ATTEMPTS, TASK_RETRY_DELAY)
+        self._release_lease(task)
+        if task.video_id:
+            self.db_handler.update_video_status(task.video_id, "error")
+            self._notify_error(task.video_id, str(error))
+        else:
+            self._notify_error("UNKNOWN", str(error))
+
+    def _log(self, message, level="INFO"):
+        if self.on_log:
+            wx.CallAfter(self.on_log, message, level)
 
     def _notify_update(self, video_id, status):
         if self.on_task_update:
@@ -190,9 +942,14 @@ class Processor:
         if self.on_error:
             wx.CallAfter(self.on_error, video_id, error_msg)
 
-    def export_data(self, video_ids: List[str], format_type: str = "markdown") -> str:
+    def export_data(self, video_ids: List[str], format_type: str = "markdown",
+                    time_range: Tuple[int, int] = None, encoding: str = None, compact: bool = False) -> str:
         """
-        Gera arquivos de exportação.
+        Gera arquivos de exportação ("markdown": ZIP com um .md por vídeo; "chunks": JSONL com os
+        chunks prontos de cada vídeo).
+        time_range: (início_ms, fim_ms) exporta só esse trecho de cada vídeo (via índice de segmentos).
+        encoding: contagem de tokens exibida (padrão: DEFAULT_ENCODING, a de videos.token_count).
+        compact: exporta o texto compacto das legendas automáticas no lugar do bruto (quando houver).
         """
         import zipfile
         
@@ -203,19 +960,85 @@ class Processor:
             zip_name = f"export_contextflow_{timestamp}.zip"
             zip_path = os.path.join(EXPORTS_DIR, zip_name)
             
-            with zipfile.ZipFile(zip_path, 'w') as zf:
-                for vid in video_ids:
+            encoding = encoding or DEFAULT_ENCODING
+            counts = self.db_handler.get_token_counts(encoding) if encoding != DEFAULT_ENCODING else None
+            token_label = "Tokens" if counts is None else f"Tokens ({encoding})"
+
+            # Metadados lidos uma vez; textos sem contagem neste encoding contados num único lote
+            videos = {v['id']: v for v in self.db_handler.get_all_videos()}
+            items = []
+            for vid in video_ids:
+                meta = videos.get(vid)
+                if time_range:
+                    window = transcript_window(self.db_handler, vid, *time_range)
+                    data = {'full_text': window['text'], 'window_tokens': window['tokens']} if window else None
+                else:
                     data = self.db_handler.get_transcript(vid)
-                    meta = next((v for v in self.db_handler.get_all_videos() if v['id'] == vid), None)
-                    
-                    if data and meta:
-                        safe_title = "".join([c for c in meta['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
-                        pl_info = f"\n**Playlist:** {meta['playlist_title']}" if meta.get('playlist_title') else ""
-                        
-                        content = f"# {meta['title']}\n\n**URL:** {meta['url']}\n**Tokens:** {meta['token_count']}{pl_info}\n\n## Transcrição\n\n{data['full_text']}"
-                        
-                        zf.writestr(f"{safe_title}.md", content)
-            
+                if data and meta:
+                    items.append((meta, data))
+
+            pending = []
+            if counts is not None:
+                for meta, data in items:
+                    if time_range:
+                        # Somas prefixas só existem no encoding padrão; nos outros conta o trecho
+                        pending.append((data, 'window_tokens', data['full_text']))
+                    elif meta['id'] not in counts:
+                        # Encoding ainda não recalculado para este vídeo
+                        pending.append((data, 'raw_tokens', data['full_text']))
+                        if data.get('compact_text'):
+                            pending.append((data, 'compact_tokens', data['compact_text']))
+            for (data, field, _), n in zip(pending, count_tokens_batch([t for _, _, t in pending], encoding)):
+                data[field] = n
+
+            with zipfile.ZipFile(zip_path, 'w') as zf:
+                for meta, data in items:
+                    safe_title = "".join([c for c in meta['title'] if c.isalnum() or c in (' ', '-', '_')]).strip()
+                    pl_info = f"\n**Playlist:** {meta['playlist_title']}" if meta.get('playlist_title') else ""
+                    raw_tokens, compact_tokens = meta['token_count'], meta.get('compact_token_count')
+                    if counts is not None:
+                        raw_tokens, compact_tokens = counts.get(meta['id']) or (
+                            data.get('raw_tokens'), data.get('compact_tokens'))
+                    tokens = raw_tokens
+                    text = data['full_text']
+                    if data.get('compact_text') and compact_tokens is not None:
+                        if compact:
+                            # Legendas automáticas: texto compacto (mesmo conteúdo, menos tokens)
+                            text = data['compact_text']
+                            tokens = f"{compact_tokens} (compacto; bruto {raw_tokens})"
+                        else:
+                            tokens = f"{raw_tokens} (bruto; compacto {compact_tokens})"
+                    if time_range:
+                        tokens = f"{data['window_tokens']} ({self._format_ms(time_range[0])}–{self._format_ms(time_range[1])})"
+
+                    content = f"# {meta['title']}\n\n**URL:** {meta['url']}\n**{token_label}:** {tokens}{pl_info}\n\n## Transcrição\n\n{text}"
+
+                    zf.writestr(f"{safe_title}.md", content)
+
             return zip_path
+
+        if format_type == "chunks":
+            # JSONL com um chunk por linha (orçamento CHUNK_MAX_TOKENS), pronto para alimentar um LLM
+            encoding = encoding or DEFAULT_ENCODING
+            path = os.path.join(EXPORTS_DIR, f"export_contextflow_chunks_{timestamp}.jsonl")
+            videos = {v['id']: v for v in self.db_handler.get_all_videos()}
+            with open(path, 'w', encoding='utf-8') as f:
+                for vid in video_ids:
+                    meta = videos.get(vid)
+                    if not meta:
+                        continue
+                    chunks = self.get_chunks(vid, encoding=encoding)
+                    for chunk in chunks:
+                        record = {'video_id': vid, 'title': meta['title'], 'url': meta['url'], 'encoding': encoding,
+                                  'chunk': chunk['index'], 'chunks': len(chunks), 'tokens': chunk['tokens'],
+                                  'start_ms': chunk.get('start_ms'), 'text': chunk['text']}
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return path
         
         return ""
+
+    @staticmethod
+    def _format_ms(ms: int) -> str:
+        m, s = divmod(int(ms) // 1000, 60)
+        h, m = divmod(m, 60)
+        return f"{h:02d}:{m:02d}:{s:02d}"
@@ -0,0 +1,251 @@
+# contextflow/core/rate_limiter.py
+import threading
+import time
+import random
+import collections
+from typing import Dict, Tuple, Optional, Any, Callable
+
+class TokenBucket:
+    """
+    Token bucket clássico: recarrega `rate` fichas por segundo até `burst`.
+    Cada requisição consome uma ficha; sem fichas, o chamador espera.
+    """
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, cancel_event: Optional[threading.Event] = None) -> float:
+        """Bloqueia até haver fichas. Retorna o tempo esperado (segundos)."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                deficit = tokens - self._tokens
+                wait = deficit / self.rate if self.rate > 0 else 0.5
+
+            if cancel_event is not None and cancel_event.is_set():
+                return waited
+            # Dorme em fatias curtas para reagir a mudanças de taxa/cancelamento
+            wait = min(wait, 0.5)
+            time.sleep(wait)
+            waited += wait
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def drain(self):
+        """Zera as fichas: a próxima requisição espera um intervalo completo."""
+        with self._lock:
+            self._tokens = 0.0
+            self._last = time.monotonic()
+
+
+class HostRateLimiter:
+    """
+    Conjunto de token buckets por host (youtube.com, timedtext, i.ytimg.com...).
+    Substitui o sleep fixo entre vídeos: só quem faz requisição de rede espera,
+    e apenas pelo bucket do host que vai acessar.
+    """
+    def __init__(self, limits: Dict[str, Tuple[float, float]], jitter: Dict[str, float] = None,
+                 stats_window: float = 60.0):
+        self.buckets: Dict[str, TokenBucket] = {
+            host: TokenBucket(rate, burst) for host, (rate, burst) in limits.items()
+        }
+        self.jitter = jitter or {}
+        self.stats_window = stats_window
+        self._history: Dict[str, collections.deque] = collections.defaultdict(collections.deque)
+        self._totals: Dict[str, int] = collections.defaultdict(int)
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str, cancel_event: Optional[threading.Event] = None) -> float:
+        """Aguarda a vez do host e registra a requisição. Hosts desconhecidos não esperam."""
+        bucket = self.buckets.get(host)
+        waited = bucket.acquire(cancel_event=cancel_event) if bucket else 0.0
+
+        # Jitter Anti-Blocking: pequena pausa aleatória apenas para hosts sensíveis
+        max_jitter = self.jitter.get(host, 0.0)
+        if max_jitter > 0:
+            pause = random.uniform(0, max_jitter)
+            time.sleep(pause)
+            waited += pause
+
+        self._record(host)
+        return waited
+
+    def _record(self, host: str):
+        now = time.monotonic()
+        with self._lock:
+            hist = self._history[host]
+            hist.append(now)
+            self._totals[host] += 1
+            self._trim(hist, now)
+
+    def _trim(self, hist: collections.deque, now: float):
+        while hist and now - hist[0] > self.stats_window:
+            hist.popleft()
+
+    def set_rate(self, host: str, rate: float):
+        if host in self.buckets:
+            self.buckets[host].set_rate(rate)
+
+    def request_rate(self, host: str) -> float:
+        """Requisições por minuto observadas na janela de estatísticas."""
+        now = time.monotonic()
+        with self._lock:
+            hist = self._history[host]
+            self._trim(hist, now)
+            return len(hist) * 60.0 / self.stats_window
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        hosts = set(self.buckets) | set(self._totals)
+        return {
+            host: {
+                'configured_rps': self.buckets[host].rate if host in self.buckets else None,
+                'observed_rpm': round(self.request_rate(host), 2),
+                'total_requests': self._totals.get(host, 0),
+            }
+            for host in sorted(hosts)
+        }
+
+
+class ConcurrencyLimiter:
+    """Semáforo com limite ajustável em tempo real (usado pelo AIMDController)."""
+    def __init__(self, limit: int, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = max(1, min(limit, self.max_limit))
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_use >= self.limit:
+                self._cond.wait(0.5)
+            self.in_use += 1
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, min(int(limit), self.max_limit))
+            self._cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class AIMDController:
+    """
+    Additive-Increase / Multiplicative-Decrease sobre a taxa por host e a concorrência.
+    - Cada resposta OK soma `rate_step` à taxa do host (até o teto configurado) e,
+      a cada `successes_per_slot` sucessos seguidos, libera mais um slot de concorrência.
+    - 429/403 multiplicam taxa e concorrência por `decrease_factor` (no máximo uma vez
+      por `cooldown` segundos, para uma rajada de erros não derrubar tudo a zero).
+    """
+    def __init__(self, rate_limiter: HostRateLimiter, concurrency: ConcurrencyLimiter,
+                 min_rates: Dict[str, float], max_rates: Dict[str, float],
+                 rate_step: float = 0.02, decrease_factor: float = 0.5,
+                 successes_per_slot: int = 20, cooldown: float = 15.0,
+                 on_change: Callable[[str], None] = None):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.min_rates = min_rates
+        self.max_rates = max_rates
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.successes_per_slot = successes_per_slot
+        self.cooldown = cooldown
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._success_streak = 0
+        self._last_decrease: Dict[str, float] = {}
+        self._counts: Dict[str, int] = collections.defaultdict(int)
+        self.last_event = "inicial"
+
+    def observe(self, host: str, outcome: str):
+        """Recebe o resultado classificado de uma requisição (ver youtube_manager.classify_*)."""
+        message = None
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome == "ok":
+                message = self._increase(host)
+            elif outcome in ("throttled", "blocked"):
+                message = self._decrease(host, outcome)
+        if message and self.on_change:
+            self.on_change(message)
+
+    def _increase(self, host: str) -> Optional[str]:
+        bucket = self.rate_limiter.buckets.get(host)
+        if bucket and host in self.max_rates:
+            bucket.set_rate(min(self.max_rates[host], bucket.rate + self.rate_step))
+
+        self._success_streak += 1
+        if self._success_streak >= self.successes_per_slot:
+            self._success_streak = 0
+            if self.concurrency.limit < self.concurrency.max_limit:
+                self.concurrency.set_limit(self.concurrency.limit + 1)
+                self.last_event = f"+1 slot após {self.successes_per_slot} sucessos"
+                return f"AIMD: concorrência aumentada para {self.concurrency.limit}"
+        return None
+
+    def _decrease(self, host: str, outcome: str) -> Optional[str]:
+        self._success_streak = 0
+        now = time.monotonic()
+        if now - self._last_decrease.get(host, 0.0) < self.cooldown:
+            return None
+        self._last_decrease[host] = now
+
+        bucket = self.rate_limiter.buckets.get(host)
+        if bucket:
+            new_rate = max(self.min_rates.get(host, 0.05), bucket.rate * self.decrease_factor)
+            bucket.set_rate(new_rate)
+            bucket.drain()
+        self.concurrency.set_limit(int(self.concurrency.limit * self.decrease_factor))
+        self.last_event = f"{outcome} em {host}"
+        rate_txt = f"{bucket.rate:.2f} req/s" if bucket else "-"
+        return f"AIMD: {outcome} em {host} -> taxa {rate_txt}, concorrência {self.concurrency.limit}"
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'concurrency': self.concurrency.limit,
+                'max_concurrency': self.concurrency.max_limit,
+                'in_use': self.concurrency.in_use,
+                'rates': {h: round(b.rate, 3) for h, b in self.rate_limiter.buckets.items()},
+                'outcomes': dict(self._counts),
+                'last_event': self.last_event,
+            }
+
+    def describe(self) -> str:
+        st = self.get_state()
+        rates = ", ".join(f"{h}={r}/s" for h, r in st['rates'].items())
+        return (f"AIMD: concorrência {st['in_use']}/{st['concurrency']} (máx {st['max_concurrency']}) | "
+                f"{rates} | último evento: {st['last_event']}")
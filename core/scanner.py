@@ -5,8 +5,10 @@ import threading
 import re
 from typing import Dict, Any, List, Optional, Set
 
-from .token_engine import count_tokens 
+from .token_engine import count_tokens_batch, is_available
+from .token_estimator import get_token_estimator
 from .tree_logic import TreeNode
+from constants import DEFAULT_ENCODING
 
 # === CONSTANTES DE CONFIGURAÇÃO ===
 TEXT_EXTENSIONS: Set[str] = {
@@ -75,7 +77,25 @@ def _get_common_root(paths: List[str]) -> str:
     return os.path.normpath(root_path)
 
 
-def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_callback: callable) -> Dict[str, Any]:
+def _apply_exact_counts(text_nodes: List[Any]):
+    """Contagem exata de todos os arquivos numa chamada (lotes espalhados pelo pool de tokenização)."""
+    counts = count_tokens_batch([content for _, content in text_nodes])
+    for (node, _), tokens in zip(text_nodes, counts):
+        node.token_count = tokens
+        node.token_estimated = False
+    if is_available():
+        # Calibra o estimador (bytes/token por extensão) com as contagens reais
+        get_token_estimator().observe_many(
+            ('ext', os.path.splitext(node.name)[1].lower() or None, DEFAULT_ENCODING, node.size_bytes, tokens, 0)
+            for (node, _), tokens in zip(text_nodes, counts))
+
+def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_callback: callable,
+                   on_exact_counts: Optional[callable] = None) -> Dict[str, Any]:
+    """
+    Varre os caminhos e conta os tokens dos arquivos de texto. Com `on_exact_counts`, retorna logo
+    com estimativas calibradas (node.token_estimated) e conta em background; ao terminar, os nós
+    recebem as contagens exatas e on_exact_counts(resultado) é chamado (fora da thread da UI).
+    """
     if not paths:
         return {'root_node': None, 'file_contents': {}, 'text_file_paths': set(), 'all_extensions': set(), 'total_files': 0, 'root_path': "", 'node_map': {}}
 
@@ -172,15 +192,19 @@ def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_call
         finally:
             progress_callback(current_scanned_count, total_files, full_path)
 
-    for path, content in file_contents.items():
-        node = node_map.get(path)
-        if node and node.is_text:
-            tokens, _ = count_tokens(content)
-            node.token_count = tokens
+    text_nodes = [(node_map[path], content) for path, content in file_contents.items()
+                  if node_map.get(path) and node_map[path].is_text]
+    if on_exact_counts is None:
+        _apply_exact_counts(text_nodes)
+    else:
+        estimator = get_token_estimator()
+        for node, _ in text_nodes:
+            node.token_count = estimator.estimate_file(node.name, node.size_bytes)
+            node.token_estimated = True
             
     text_file_paths_set = {path for path in file_contents.keys() if node_map.get(path) and node_map.get(path).is_text}
     
-    return {
+    result = {
         'root_node': root_node,
         'file_contents': file_contents,
         'text_file_paths': text_file_paths_set,
@@ -189,3 +213,10 @@ def scan_directory(paths: List[str], cancel_flag: threading.Event, progress_call
         'root_path': root_path, 
         'node_map': node_map
     }
+
+    if on_exact_counts is not None:
+        def finish():
+            _apply_exact_counts(text_nodes)
+            on_exact_counts(result)
+        threading.Thread(target=finish, name="cf-scan-tokens", daemon=True).start()
+    return result
@@ -0,0 +1,119 @@
+# contextflow/core/segment_index.py
+import sys
+import bisect
+from array import array
+from typing import Iterable, List, Optional, Tuple, Dict, Any
+
+from services.subtitle_parser import Segment
+
+def _to_blob(values: array) -> bytes:
+    # Grava sempre little-endian, independente da máquina
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_blob(blob: bytes) -> array:
+    values = array('I')
+    values.frombytes(blob or b"")
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+class SegmentIndex:
+    """
+    Índice tempo -> texto -> tokens de uma transcrição, em arrays compactos (uint32):
+    - starts[i]: início do segmento i (ms)
+    - offsets[i]: posição do segmento i no full_text (offsets[n] = len(full_text))
+    - token_prefix[i]: tokens antes do segmento i (token_prefix[n] = total)
+    Consultas como "tokens entre 12:00 e 25:00" são duas buscas binárias e uma subtração.
+    """
+    def __init__(self, starts: array, offsets: array, token_prefix: array = None):
+        self.starts = starts
+        self.offsets = offsets
+        self.token_prefix = token_prefix
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment]) -> Tuple[str, Optional['SegmentIndex']]:
+        """
+        Monta o full_text (segmentos unidos por espaço) e o índice. Inícios ausentes herdam
+        o anterior; sem nenhum tempo conhecido não há índice (retorna None).
+        """
+        starts, offsets, parts = array('I'), array('I'), []
+        pos, last, timed = 0, 0, False
+        for start, text in segments:
+            if start is not None:
+                timed = True
+                last = max(last, int(start))  # mantém a ordem para a busca binária
+            starts.append(last)
+            offsets.append(pos)
+            parts.append(text)
+            pos += len(text) + 1
+        full_text = " ".join(parts)
+        offsets.append(len(full_text))
+        if not timed or not parts:
+            return full_text, None
+        return full_text, cls(starts, offsets)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def token_boundaries(self) -> List[int]:
+        """
+        Offsets de caractere onde cada segmento começa para fins de contagem: o espaço
+        separador pertence ao segmento seguinte (tokens do tipo " palavra").
+        """
+        return [max(0, off - 1) if i else 0 for i, off in enumerate(self.offsets[:-1])] + [self.offsets[-1]]
+
+    def set_token_prefix(self, prefix: List[int]):
+        self.token_prefix = array('I', prefix)
+
+    def locate(self, start_ms: int, end_ms: int) -> Tuple[int, int]:
+        """Segmentos [i, j) que se sobrepõem ao intervalo [start_ms, end_ms)."""
+        i = max(0, bisect.bisect_right(self.starts, start_ms) - 1)
+        # Segmentos sem tempo herdam o início anterior: o intervalo começa no primeiro do empate
+        i = bisect.bisect_left(self.starts, self.starts[i], 0, i) if i else 0
+        j = bisect.bisect_left(self.starts, end_ms)
+        return i, max(i, j)
+
+    def char_range(self, start_ms: int, end_ms: int) -> Tuple[int, int]:
+        i, j = self.locate(start_ms, end_ms)
+        end = self.offsets[j] - 1 if j < len(self.starts) else self.offsets[j]
+        return self.offsets[i], max(self.offsets[i], end)
+
+    def tokens_between(self, start_ms: int, end_ms: int) -> Optional[int]:
+        if self.token_prefix is None:
+            return None
+        i, j = self.locate(start_ms, end_ms)
+        return self.token_prefix[j] - self.token_prefix[i]
+
+    def to_blobs(self) -> Dict[str, Any]:
+        return {
+            'segment_count': len(self.starts),
+            'starts': _to_blob(self.starts),
+            'text_offsets': _to_blob(self.offsets),
+            'token_prefix': _to_blob(self.token_prefix) if self.token_prefix is not None else None,
+        }
+
+    @classmethod
+    def from_blobs(cls, row: Dict[str, Any]) -> 'SegmentIndex':
+        prefix = _from_blob(row['token_prefix']) if row.get('token_prefix') else None
+        return cls(_from_blob(row['starts']), _from_blob(row['text_offsets']), prefix)
+
+
+def transcript_window(db_handler, video_id: str, start_ms: int, end_ms: int) -> Optional[Dict[str, Any]]:
+    """
+    Trecho da transcrição entre dois instantes: texto (lido com substr, sem carregar o
+    full_text inteiro) e contagem de tokens pelas somas prefixas.
+    """
+    row = db_handler.get_segment_index(video_id)
+    if not row:
+        return None
+    index = SegmentIndex.from_blobs(row)
+    first, last = index.char_range(start_ms, end_ms)
+    return {
+        'text': db_handler.get_transcript_slice(video_id, first, last),
+        'tokens': index.tokens_between(start_ms, end_ms),
+        'start_ms': start_ms,
+        'end_ms': end_ms,
+    }
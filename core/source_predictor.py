@@ -0,0 +1,77 @@
+# contextflow/core/source_predictor.py
+import threading
+import collections
+from typing import Dict, List, Any
+
+class SourcePredictor:
+    """
+    Aprende, por canal, de qual fonte a transcrição costuma vir (api_manual_en, api_auto_pt,
+    ytdlp_pt...) e devolve a ordem de sondagem com a mais provável primeiro.
+    O histórico inicial vem da coluna videos.transcript_source; `aliases` traduz rótulos de
+    versões anteriores (ex.: 'ytdlp_fallback_ytdlp') para os rótulos atuais.
+    """
+    def __init__(self, db_handler, default_order: List[str], min_samples: int = 3,
+                 aliases: Dict[str, str] = None):
+        self.db_handler = db_handler
+        self.default_order = list(default_order)
+        self.min_samples = min_samples
+        self.aliases = dict(aliases or {})
+        # Amostras do histórico com rótulo sem correspondência (fora da previsão, mas contadas)
+        self.ignored_samples: Dict[str, int] = collections.Counter()
+        self._counts: Dict[str, collections.Counter] = None
+        self._lock = threading.Lock()
+        # Estatísticas: previsões feitas, acertos (1ª sondagem venceu) e sondagens gastas
+        self.predictions = 0
+        self.hits = 0
+        self.transcripts = 0
+        self.probes = 0
+
+    def _load(self):
+        if self._counts is None:
+            known = set(self.default_order)
+            self._counts = collections.defaultdict(collections.Counter)
+            for channel, sources in self.db_handler.get_channel_source_counts().items():
+                for source, n in sources.items():
+                    source = self.aliases.get(source, source)
+                    if source in known:
+                        self._counts[channel][source] += n
+                    else:
+                        self.ignored_samples[source] += n
+            if self.ignored_samples:
+                print(f"Previsão de fonte: rótulos desconhecidos ignorados: {dict(self.ignored_samples)}")
+
+    def order_for(self, channel: str) -> List[str]:
+        """Ordem de sondagem para o canal (padrão enquanto houver poucas amostras)."""
+        with self._lock:
+            self._load()
+            counts = self._counts.get(channel) if channel else None
+            if not counts or sum(counts.values()) < self.min_samples:
+                return list(self.default_order)
+            rank = {s: i for i, s in enumerate(self.default_order)}
+            return sorted(self.default_order, key=lambda s: (-counts.get(s, 0), rank[s]))
+
+    def record(self, channel: str, order: List[str], source: str, probes: int):
+        """Registra o resultado de uma sondagem feita com `order`."""
+        with self._lock:
+            self._load()
+            counts = self._counts.get(channel) if channel else None
+            # Só conta como previsão se o canal já tinha amostras suficientes
+            if counts and sum(counts.values()) >= self.min_samples:
+                self.predictions += 1
+                if order and order[0] == source:
+                    self.hits += 1
+            self.transcripts += 1
+            self.probes += probes
+            if channel and source in self.default_order:
+                self._counts[channel][source] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'channels': len(self._counts or {}),
+                'predictions': self.predictions,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.predictions, 3) if self.predictions else 0.0,
+                'avg_probes': round(self.probes / self.transcripts, 2) if self.transcripts else 0.0,
+                'ignored_samples': sum(self.ignored_samples.values()),
+            }
@@ -0,0 +1,32 @@
+# contextflow/core/thumbnails.py
+import os
+import wx
+from typing import Dict, Tuple, Iterable
+
+Size = Tuple[int, int]
+
+def make_variants(thumb_path: str, sizes: Iterable[Size]) -> Dict[Size, bytes]:
+    """
+    Decodifica o JPEG original uma única vez e gera cada tamanho como RGB cru
+    (largura*altura*3 bytes). Seguro fora da thread da UI: usa só wx.Image, nunca wx.Bitmap.
+    """
+    if not thumb_path or not os.path.exists(thumb_path):
+        return {}
+    no_log = wx.LogNull()  # JPEGs corrompidos não poluem o console
+    try:
+        img = wx.Image(thumb_path, wx.BITMAP_TYPE_ANY)
+        if not img.IsOk():
+            return {}
+        return {(w, h): bytes(img.Scale(w, h, wx.IMAGE_QUALITY_HIGH).GetData()) for w, h in sizes}
+    except Exception as e:
+        print(f"Erro ao gerar variantes de {thumb_path}: {e}")
+        return {}
+    finally:
+        del no_log
+
+def bitmap_from_rgb(data: bytes, size: Size) -> wx.Bitmap:
+    """Bitmap direto do buffer RGB (sem decodificar nem escalar). Só na thread da UI."""
+    w, h = size
+    if not data or len(data) != w * h * 3:
+        return wx.NullBitmap
+    return wx.Bitmap.FromBuffer(w, h, data)
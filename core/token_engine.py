@@ -1,58 +1,388 @@
-
 # contextflow/core/token_engine.py
-import tiktoken
-from typing import Tuple, Dict, Any, Optional
-
-try:
-    TOKEN_ENCODER = tiktoken.encoding_for_model("gpt-4o")
-    TIKTOKEN_AVAILABLE = True
-    MODEL_NAME = "gpt-4o"
-    CONTEXT_INFO = f"{MODEL_NAME} (Tokenização real)"
-except ImportError:
-    TOKEN_ENCODER = None
-    TIKTOKEN_AVAILABLE = False
-    MODEL_NAME = "N/A"
-    CONTEXT_INFO = "gpt-4o (tiktoken AUSENTE, usando bytes/4 como FALLBACK)"
-
-def count_tokens(text: str) -> Tuple[int, str]:
-    """Calcula o número de tokens para o texto fornecido."""
+import re
+import bisect
+import itertools
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Tuple, Dict, Any, Optional, List, Sequence, Callable
+
+from constants import (MODEL_NAME, DEFAULT_ENCODING, TOKEN_ENCODINGS,
+                       TOKENIZE_WORKERS, TOKENIZE_INLINE_MAX_CHARS, TOKENIZE_BATCH_CHARS,
+                       TOKEN_CACHE_ENABLED, TOKEN_CACHE_PATH, TOKEN_CACHE_LRU_SIZE, TOKEN_CACHE_MIN_CHARS,
+                       TOKEN_INSPECT_PAGE_SIZE)
+
+# Cada encoder (import do tiktoken + leitura do BPE) custa centenas de ms: carrega no primeiro
+# uso ou em warm_up(), nunca no import do módulo, e fica em cache pelo resto da sessão.
+CONTEXT_INFO_OK = f"{MODEL_NAME} (Tokenização real)"
+CONTEXT_INFO_FALLBACK = f"{MODEL_NAME} (tiktoken AUSENTE, usando bytes/4 como FALLBACK)"
+CONTEXT_INFO = CONTEXT_INFO_FALLBACK
+
+_encoders: Dict[str, Any] = {}  # nome do encoding -> Encoding (ou None se indisponível)
+_encoder_lock = threading.Lock()
+
+def get_encoder(encoding: str = None):
+    """Encoder tiktoken do encoding (padrão: DEFAULT_ENCODING), carregado uma vez; None se indisponível."""
+    global CONTEXT_INFO
+    name = encoding or DEFAULT_ENCODING
+    if name not in _encoders:
+        with _encoder_lock:
+            if name not in _encoders:
+                try:
+                    import tiktoken
+                    encoder = tiktoken.get_encoding(name)
+                except Exception as e:
+                    # ImportError, encoding desconhecido ou falha ao obter o BPE (ex.: offline sem cache)
+                    print(f"Tokenizador '{name}' indisponível, usando bytes/4: {e}")
+                    encoder = None
+                _encoders[name] = encoder
+                if name == DEFAULT_ENCODING and encoder is not None:
+                    CONTEXT_INFO = CONTEXT_INFO_OK
+    return _encoders[name]
+
+def is_available(encoding: str = None) -> bool:
+    return get_encoder(encoding) is not None
+
+def available_encodings() -> Dict[str, str]:
+    """Encodings oferecidos na UI (nome -> modelos)."""
+    return dict(TOKEN_ENCODINGS)
+
+def encoding_label(encoding: str = None) -> str:
+    """Rótulo do resultado de count_tokens: o modelo para o encoding padrão, senão o nome do encoding."""
+    name = encoding or DEFAULT_ENCODING
+    return MODEL_NAME if name == DEFAULT_ENCODING else name
+
+def warm_up(encodings: Sequence[str] = None) -> threading.Thread:
+    """Carrega os encoders em background (chamado após a janela aparecer)."""
+    def load():
+        for name in encodings or (DEFAULT_ENCODING,):
+            get_encoder(name)
+    t = threading.Thread(target=load, name="cf-encoder-warmup", daemon=True)
+    t.start()
+    return t
+
+# --- Cache de contagens (hash do conteúdo) ---
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+_token_cache_failed = False
+
+def get_token_cache():
+    """TokenCountCache do processo (aberto no primeiro uso); None se desativado ou indisponível."""
+    global _token_cache, _token_cache_failed
+    if not TOKEN_CACHE_ENABLED or _token_cache_failed:
+        return None
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None and not _token_cache_failed:
+                try:
+                    from storage.token_cache import TokenCountCache
+                    _token_cache = TokenCountCache(TOKEN_CACHE_PATH, TOKEN_CACHE_LRU_SIZE)
+                except Exception as e:
+                    print(f"Cache de tokens indisponível, contando sem cache: {e}")
+                    _token_cache_failed = True
+    return _token_cache
+
+def _cacheable(text: str) -> bool:
+    return bool(text) and len(text) >= TOKEN_CACHE_MIN_CHARS
+
+def get_token_cache_stats() -> Optional[Dict[str, Any]]:
+    cache = get_token_cache()
+    return cache.get_stats() if cache else None
+
+def _fallback_count(text: str) -> int:
+    return max(1, len(text.encode('utf-8')) // 4)
+
+def _count_exact(text: str, encoding: str = None) -> Optional[int]:
+    """Contagem BPE sem cache; None se o encoder não estiver disponível."""
+    encoder = get_encoder(encoding)
+    if encoder:
+        try:
+            return len(encoder.encode(text))
+        except Exception:
+            pass
+    return None
+
+def count_tokens(text: str, encoding: str = None) -> Tuple[int, str]:
+    """Calcula o número de tokens para o texto fornecido (encoding padrão se omitido)."""
     if not text: return 0, CONTEXT_INFO
-    
-    try:
-        if TIKTOKEN_AVAILABLE and TOKEN_ENCODER:
-            tokens = TOKEN_ENCODER.encode(text)
-            return len(tokens), MODEL_NAME
-        else:
-            # Fallback
-            byte_size = len(text.encode('utf-8'))
-            estimated_tokens = max(1, byte_size // 4)
-            return estimated_tokens, CONTEXT_INFO
-            
-    except Exception:
-        byte_size = len(text.encode('utf-8'))
-        estimated_tokens = max(1, byte_size // 4)
-        return estimated_tokens, CONTEXT_INFO
+
+    name = encoding or DEFAULT_ENCODING
+    cache = get_token_cache() if _cacheable(text) and is_available(name) else None
+    if cache:
+        key = cache.content_hash(text)
+        cached = cache.get(key, name)
+        if cached is not None:
+            return cached, encoding_label(encoding)
+
+    count = _count_exact(text, encoding)
+    if count is None:
+        # Fallback (nunca vai para o cache: não é a contagem real)
+        return _fallback_count(text), CONTEXT_INFO
+    if cache:
+        cache.put(key, name, count)
+    return count, encoding_label(encoding)
+
+# --- Tokenização em lote (pool compartilhado) ---
+
+_POOL_THREAD_PREFIX = "cf-tokenize"
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_token_pool() -> ThreadPoolExecutor:
+    """Pool único do processo, dimensionado pelos núcleos (criado no primeiro uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=TOKENIZE_WORKERS, thread_name_prefix=_POOL_THREAD_PREFIX)
+    return _pool
+
+def _in_pool() -> bool:
+    # Dentro do pool, submeter e esperar pode esgotar os workers (deadlock): roda inline
+    return threading.current_thread().name.startswith(_POOL_THREAD_PREFIX)
+
+def _done(value: Any) -> Future:
+    f = Future()
+    f.set_result(value)
+    return f
+
+def submit_tokenize(fn: Callable[..., Any], *args, **kwargs) -> Future:
+    """Executa `fn` no pool de tokenização (inline se já estiver numa thread do pool)."""
+    if _in_pool():
+        try:
+            return _done(fn(*args, **kwargs))
+        except Exception as e:
+            f = Future()
+            f.set_exception(e)
+            return f
+    return get_token_pool().submit(fn, *args, **kwargs)
+
+def count_tokens_async(text: str, encoding: str = None) -> Future:
+    """Future com a contagem; entradas pequenas são contadas já (despachar custaria mais)."""
+    if not text or len(text) <= TOKENIZE_INLINE_MAX_CHARS:
+        return _done(count_tokens(text, encoding)[0])
+    return submit_tokenize(lambda: count_tokens(text, encoding)[0])
+
+def _count_many(texts: Sequence[str], encoding: str = None) -> List[int]:
+    counts = []
+    for t in texts:
+        if not t:
+            counts.append(0)
+            continue
+        n = _count_exact(t, encoding)
+        counts.append(_fallback_count(t) if n is None else n)
+    return counts
+
+def _count_many_uncached(texts: List[str], encoding: str = None) -> List[int]:
+    """Distribui os textos pelo pool em lotes de até TOKENIZE_BATCH_CHARS caracteres."""
+    total = sum(len(t) for t in texts if t)
+    if total <= TOKENIZE_INLINE_MAX_CHARS or TOKENIZE_WORKERS <= 1 or _in_pool():
+        return _count_many(texts, encoding)
+
+    get_encoder(encoding)  # carrega antes de espalhar pelos workers
+    futures, start, size = [], 0, 0
+    for i, t in enumerate(texts):
+        size += len(t) if t else 0
+        if size >= TOKENIZE_BATCH_CHARS:
+            futures.append(get_token_pool().submit(_count_many, texts[start:i + 1], encoding))
+            start, size = i + 1, 0
+    if start < len(texts):
+        futures.append(get_token_pool().submit(_count_many, texts[start:], encoding))
+    return [n for f in futures for n in f.result()]
+
+def count_tokens_batch(texts: Sequence[str], encoding: str = None) -> List[int]:
+    """
+    Contagens de vários textos, na mesma ordem. Os já conhecidos saem do cache (uma consulta
+    para o lote todo); o restante é agrupado em lotes de até TOKENIZE_BATCH_CHARS caracteres,
+    um por tarefa do pool; se o total for pequeno (<= TOKENIZE_INLINE_MAX_CHARS) tudo roda
+    na thread chamadora.
+    """
+    texts = list(texts)
+    name = encoding or DEFAULT_ENCODING
+    cache = get_token_cache() if any(_cacheable(t) for t in texts) and is_available(name) else None
+    if not cache:
+        return _count_many_uncached(texts, encoding)
+
+    hashes = {i: cache.content_hash(t) for i, t in enumerate(texts) if _cacheable(t)}
+    known = cache.get_many(hashes.values(), name)
+    counts: List[Optional[int]] = [known.get(hashes[i]) if i in hashes else None for i in range(len(texts))]
+    missing = [i for i, n in enumerate(counts) if n is None]
+    if missing:
+        fresh = _count_many_uncached([texts[i] for i in missing], encoding)
+        for i, n in zip(missing, fresh):
+            counts[i] = n
+        cache.put_many({hashes[i]: counts[i] for i in missing if i in hashes}, name)
+    return counts
+
+def count_tokens_at_offsets(text: str, char_offsets: Sequence[int], encoding: str = None) -> Tuple[int, List[int]]:
+    """
+    Uma única tokenização do texto: retorna o total e, para cada offset de caractere
+    (em ordem crescente), quantos tokens começam antes dele (somas prefixas).
+    """
+    if not text: return 0, [0] * len(char_offsets)
+
+    # Transcrição já contada (reprocessamento/retokenização): total e somas saem do cache
+    name = encoding or DEFAULT_ENCODING
+    cache = get_token_cache() if _cacheable(text) and is_available(name) else None
+    if cache:
+        key = cache.offsets_hash(text, char_offsets)
+        cached = cache.get_prefix(key, name)
+        if cached is not None:
+            return cached
+
+    encoder = get_encoder(encoding)
+    if encoder:
+        try:
+            tokens = encoder.encode(text)
+            _, starts = encoder.decode_with_offsets(tokens)
+            prefix = [bisect.bisect_left(starts, off) for off in char_offsets]
+            if cache:
+                cache.put_prefix(key, name, len(tokens), prefix)
+                cache.put(cache.content_hash(text), name, len(tokens))
+            return len(tokens), prefix
+        except Exception:
+            pass
+
+    # Fallback bytes/4, acumulando os bytes trecho a trecho
+    prefix, byte_pos, prev = [], 0, 0
+    for off in char_offsets:
+        byte_pos += len(text[prev:off].encode('utf-8'))
+        prev = off
+        prefix.append(byte_pos // 4)
+    return max(1, len(text.encode('utf-8')) // 4), prefix
+
+# --- Chunks com orçamento de tokens ---
+
+# Fim de frase (pontuação + fechamentos opcionais seguidos de espaço) ou quebra de linha. O corte fica
+# antes do espaço: o BPE junta o espaço à palavra seguinte (" Segunda"), como em token_boundaries.
+_SENTENCE_END = re.compile(r'[.!?…]+["\')\]»]*(?=\s)|(?=\n)')
+
+def sentence_boundaries(text: str) -> List[int]:
+    """Offsets de caractere onde cada frase termina (antes do espaço separador; 0 e len(text) incluídos)."""
+    return [0] + [m.end() for m in _SENTENCE_END.finditer(text)] + [len(text)]
+
+def chunk_text(text: str, max_tokens: int, overlap: int = 0, boundaries: Sequence[int] = None,
+               encoding: str = None) -> List[Tuple[int, int, int]]:
+    """
+    Divide o texto em chunks de no máximo `max_tokens`, cortando só em `boundaries` (offsets de
+    caractere em ordem crescente, p.ex. inícios de segmento; padrão: fins de frase). Um trecho
+    sem fronteira cabível é cortado no limite de tokens. Cada chunk começa até `overlap` tokens
+    antes do fim do anterior, de preferência numa fronteira.
+    Uma única tokenização do texto. Retorna [(char_inicio, char_fim, tokens)]; as contagens são
+    as da tokenização do texto inteiro (re-tokenizar o trecho isolado pode diferir nas bordas).
+    """
+    if not text or max_tokens <= 0:
+        return []
+    overlap = max(0, min(overlap, max_tokens - 1))
+
+    starts = None
+    encoder = get_encoder(encoding)
+    if encoder:
+        try:
+            _, starts = encoder.decode_with_offsets(encoder.encode(text))
+        except Exception:
+            starts = None
+    if starts is None:
+        # Fallback bytes/4: um "token" a cada 4 caracteres
+        starts = list(range(0, len(text), 4))
+    n = len(starts)
+
+    cuts = sorted({bisect.bisect_left(starts, off) for off in (boundaries or sentence_boundaries(text))} | {0, n})
+    chunks, s, prev_end = [], 0, 0
+    while s < n:
+        e = n if s + max_tokens >= n else cuts[bisect.bisect_right(cuts, s + max_tokens) - 1]
+        if e <= max(s, prev_end):
+            e = min(n, s + max_tokens)  # nenhuma fronteira nova dentro do orçamento
+        prev_end = e
+        char_end = starts[e] if e < n else len(text)
+        chunks.append((starts[s], char_end, e - s))
+        if e >= n:
+            break
+        nxt = e
+        if overlap:
+            # Primeira fronteira dentro da sobreposição (sempre depois do início atual)
+            k = bisect.bisect_right(cuts, max(s, e - overlap - 1))
+            if cuts[k] < e:
+                nxt = cuts[k]
+            elif e - overlap > s:
+                nxt = e - overlap
+        s = nxt
+    return chunks
 
 def get_encoder_info() -> str:
+    """Descrição do encoder; não força o carregamento (antes dele, informa que está carregando)."""
+    if DEFAULT_ENCODING not in _encoders:
+        return f"{MODEL_NAME} (carregando tokenizador...)"
     return CONTEXT_INFO
 
-def get_tokenization_details(text: str) -> Dict[str, Any]:
-    token_count, encoder_info = count_tokens(text)
+# --- Inspeção paginada ---
+
+_token_lengths: Dict[str, Dict[int, int]] = {}  # encoding -> bytes de cada id já visto (preenchido sob demanda)
+
+def _token_byte_lengths(token_ids: Sequence[int], encoding: str = None) -> Dict[int, int]:
+    """
+    id -> bytes do token, só para os ids pedidos: decodifica os que ainda não foram vistos neste
+    encoding (alguns milhares por texto, não o vocabulário inteiro) e guarda para as próximas chamadas.
+    """
+    name = encoding or DEFAULT_ENCODING
+    known = _token_lengths.setdefault(name, {})
+    missing = set(token_ids).difference(known)
+    if missing:
+        encoder = get_encoder(name)
+        for token_id in missing:
+            known[token_id] = len(encoder.decode_single_token_bytes(token_id))
+    return known
+
+def tokenize_with_offsets(text: str, encoding: str = None) -> Tuple[Optional[array], Optional[array]]:
+    """
+    IDs dos tokens (array('I')) e offsets em bytes UTF-8 (array('I') com len(ids) + 1 posições:
+    o token i ocupa offsets[i]:offsets[i + 1]). Nenhuma string é criada; (None, None) sem encoder.
+    """
+    encoder = get_encoder(encoding)
+    if encoder is None:
+        return None, None
+    try:
+        ids = array('I', encoder.encode(text))
+        lengths = _token_byte_lengths(ids, encoding)
+    except Exception:
+        return None, None
+    offsets = array('I', itertools.accumulate((lengths[t] for t in ids), initial=0))
+    return ids, offsets
+
+def decode_token_window(token_ids: Sequence[int], start: int, count: int, encoding: str = None) -> List[str]:
+    """Decodifica em strings só os tokens [start, start + count) (a janela exibida)."""
+    encoder = get_encoder(encoding)
+    if encoder is None:
+        return []
+    return [encoder.decode_single_token_bytes(t).decode('utf-8', errors='ignore')
+            for t in token_ids[max(0, start):start + count]]
+
+def get_tokenization_details(text: str, encoding: str = None, page: int = 0,
+                             page_size: int = TOKEN_INSPECT_PAGE_SIZE) -> Dict[str, Any]:
+    """
+    Contagem e inspeção dos tokens. token_ids/byte_offsets cobrem o texto todo em arrays compactos;
+    token_list traz só a página pedida (use decode_token_window para as demais).
+    """
     byte_size = len(text.encode('utf-8'))
-    
+    token_ids, byte_offsets = tokenize_with_offsets(text, encoding) if text else (None, None)
+    if token_ids is not None:
+        token_count, encoder_info = len(token_ids), encoding_label(encoding)
+    else:
+        token_count, encoder_info = count_tokens(text, encoding)
+
     details = {
         'tokens': token_count,
         'byte_size': byte_size,
         'encoder_info': encoder_info,
+        'token_ids': token_ids,
+        'byte_offsets': byte_offsets,
+        'page': page,
+        'page_size': page_size,
+        'pages': -(-len(token_ids) // page_size) if token_ids is not None else 0,
         'token_list': None
     }
-    
-    if TIKTOKEN_AVAILABLE and TOKEN_ENCODER:
-        try:
-            tokens = [TOKEN_ENCODER.decode_single_token_bytes(t).decode('utf-8', errors='ignore') 
-                      for t in TOKEN_ENCODER.encode(text)]
-            details['token_list'] = tokens
-        except Exception:
-            pass
+    if token_ids is not None:
+        details['token_list'] = decode_token_window(token_ids, page * page_size, page_size, encoding)
 
     return details
@@ -0,0 +1,150 @@
+# contextflow/core/token_estimator.py
+import os
+import re
+import threading
+from typing import Dict, Any, Optional, Tuple, List, Iterable
+
+from constants import (DEFAULT_ENCODING, TOKEN_ESTIMATE_BYTES_PER_TOKEN, TOKEN_ESTIMATE_TOKENS_PER_SECOND,
+                       TOKEN_ESTIMATE_MIN_SAMPLES)
+
+def duration_seconds(value: Any) -> Optional[int]:
+    """Duração gravada em videos.duration ('HH:MM:SS', 'MM:SS' ou segundos) em segundos."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return int(value) or None
+    if not re.fullmatch(r"\d+(:\d{1,2}){1,2}", str(value)):
+        return None
+    total = 0
+    for part in str(value).split(":"):
+        total = total * 60 + int(part)
+    return total or None
+
+class TokenEstimator:
+    """
+    Estimativa instantânea de tokens, calibrada pela própria biblioteca: razões bytes/token
+    aprendidas por extensão de arquivo e por idioma de transcrição (e tokens/segundo por idioma,
+    para vídeos ainda sem transcrição). Serve para mostrar um valor marcado como estimativa
+    enquanto a contagem exata roda em background.
+
+    Chaves com menos de TOKEN_ESTIMATE_MIN_SAMPLES amostras caem no agregado geral do tipo
+    ('*'), depois no do encoding padrão, depois nas constantes (bytes/4).
+    """
+
+    def __init__(self, store=None):
+        self.store = store  # TokenCountCache (tabela token_ratios); None = só memória
+        self._lock = threading.Lock()
+        # (kind, key, encoding) -> [bytes, tokens, seconds, tokens das amostras com duração, samples]
+        self._ratios: Dict[Tuple[str, str, str], List[float]] = {}
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = self.store.get_ratio_samples() if self.store else []
+            for kind, key, encoding, n_bytes, tokens, seconds, timed_tokens, samples in rows:
+                self._ratios[(kind, key, encoding)] = [n_bytes, tokens, seconds, timed_tokens, samples]
+            self._loaded = True
+
+    def is_calibrated(self, kind: str, encoding: str = None) -> bool:
+        self._ensure_loaded()
+        with self._lock:
+            agg = self._ratios.get((kind, '*', encoding or DEFAULT_ENCODING))
+            return bool(agg and agg[4] >= TOKEN_ESTIMATE_MIN_SAMPLES)
+
+    # --- Aprendizado ---
+
+    def observe_many(self, samples: Iterable[Tuple[str, str, str, int, int, float]]):
+        """
+        Registra contagens exatas (kind, key, encoding, bytes, tokens, seconds). Cada amostra
+        também entra no agregado '*' do tipo; tokens/segundo só considera amostras com duração.
+        Persistido em uma única escrita.
+        """
+        self._ensure_loaded()
+        merged: Dict[Tuple[str, str, str], List[float]] = {}
+        for kind, key, encoding, n_bytes, tokens, seconds in samples:
+            if not tokens or not n_bytes:
+                continue
+            keys = {(kind, key or '*', encoding), (kind, '*', encoding)}
+            for k in keys:
+                acc = merged.setdefault(k, [0, 0, 0.0, 0, 0])
+                acc[0] += n_bytes
+                acc[1] += tokens
+                if seconds:
+                    acc[2] += seconds
+                    acc[3] += tokens
+                acc[4] += 1
+        if not merged:
+            return
+        with self._lock:
+            for k, values in merged.items():
+                acc = self._ratios.setdefault(k, [0, 0, 0.0, 0, 0])
+                for i, v in enumerate(values):
+                    acc[i] += v
+        if self.store:
+            self.store.add_ratio_samples([(kind, key, encoding, int(b), int(t), float(s), int(tt), int(n))
+                                          for (kind, key, encoding), (b, t, s, tt, n) in merged.items()])
+
+    def observe(self, kind: str, key: str, encoding: str, n_bytes: int, tokens: int, seconds: float = 0.0):
+        self.observe_many([(kind, key, encoding, n_bytes, tokens, seconds)])
+
+    # --- Estimativa ---
+
+    def _lookup(self, kind: str, key: Optional[str], encoding: str, need_seconds: bool = False) -> Optional[List[float]]:
+        self._ensure_loaded()
+        with self._lock:
+            for k in ((kind, key, encoding), (kind, '*', encoding), (kind, '*', DEFAULT_ENCODING)):
+                if k[1] is None:
+                    continue
+                agg = self._ratios.get(k)
+                if agg and agg[4] >= TOKEN_ESTIMATE_MIN_SAMPLES and agg[1] and (not need_seconds or agg[2]):
+                    return list(agg)
+        return None
+
+    def bytes_per_token(self, kind: str, key: str = None, encoding: str = None) -> float:
+        agg = self._lookup(kind, key, encoding or DEFAULT_ENCODING)
+        return agg[0] / agg[1] if agg else TOKEN_ESTIMATE_BYTES_PER_TOKEN
+
+    def estimate_bytes(self, n_bytes: int, kind: str, key: str = None, encoding: str = None) -> int:
+        if not n_bytes:
+            return 0
+        return max(1, round(n_bytes / self.bytes_per_token(kind, key, encoding)))
+
+    def estimate_text(self, text: str, kind: str, key: str = None, encoding: str = None) -> int:
+        return self.estimate_bytes(len(text.encode('utf-8')) if text else 0, kind, key, encoding)
+
+    def estimate_file(self, path: str, n_bytes: int, encoding: str = None) -> int:
+        return self.estimate_bytes(n_bytes, 'ext', os.path.splitext(path)[1].lower() or None, encoding)
+
+    def estimate_duration(self, seconds: Optional[int], lang: str = None, encoding: str = None) -> Optional[int]:
+        """Tokens esperados para uma transcrição de `seconds` segundos (None sem duração)."""
+        if not seconds:
+            return None
+        agg = self._lookup('lang', lang, encoding or DEFAULT_ENCODING, need_seconds=True)
+        rate = agg[3] / agg[2] if agg else TOKEN_ESTIMATE_TOKENS_PER_SECOND
+        return max(1, round(seconds * rate))
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._ensure_loaded()
+        with self._lock:
+            return {f"{kind}:{key}/{encoding}": {
+                        'bytes_per_token': round(b / t, 3) if t else None,
+                        'tokens_per_second': round(tt / s, 3) if s else None,
+                        'samples': n}
+                    for (kind, key, encoding), (b, t, s, tt, n) in sorted(self._ratios.items())}
+
+_estimator: Optional[TokenEstimator] = None
+_estimator_lock = threading.Lock()
+
+def get_token_estimator() -> TokenEstimator:
+    """Estimador do processo; as amostras ficam na base do cache de tokens (se disponível)."""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                from core.token_engine import get_token_cache
+                _estimator = TokenEstimator(get_token_cache())
+    return _estimator
@@ -12,6 +12,8 @@ class TreeNode:
         self.size_bytes: int = size_bytes
         self.is_text: bool = is_text
         self.token_count: int = token_count
+        # True enquanto token_count for a estimativa calibrada (a contagem exata ainda está rodando)
+        self.token_estimated: bool = False
         
         self.children: List['TreeNode'] = []
         self.parent: Optional['TreeNode'] = None
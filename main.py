@@ -3,20 +3,35 @@
 import wx
 import sys
 import os
+import threading
 
 # Adiciona o diretório atual ao path para imports funcionarem corretamente
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ui.app_window import AppWindow
-from core.token_engine import TIKTOKEN_AVAILABLE
+from core import token_engine
+
+def warm_up():
+    """
+    Carrega em background o que fica fora do caminho da primeira janela: o encoder
+    tiktoken e as bibliotecas do YouTube (importadas sob demanda pelos serviços).
+    """
+    available = token_engine.is_available()
+    print(f"Ambiente: wxpython={wx.version()}, tiktoken={'OK' if available else 'FAIL'}")
+    try:
+        import yt_dlp  # noqa: F401
+        import youtube_transcript_api  # noqa: F401
+    except ImportError as e:
+        print(f"Dependência ausente: {e}")
 
 class ContextFlowApp(wx.App):
     def OnInit(self):
         print(f"Iniciando ContextFlow...")
-        print(f"Ambiente: wxpython={wx.version()}, tiktoken={'OK' if TIKTOKEN_AVAILABLE else 'FAIL'}")
         
         self.frame = AppWindow(None)
         self.SetTopWindow(self.frame)
+        # Só depois da janela pintar
+        wx.CallAfter(lambda: threading.Thread(target=warm_up, name="cf-warmup", daemon=True).start())
         return True
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+# contextflow/services/client_pool.py
+import threading
+import contextlib
+import logging
+from typing import Dict, Any, List, Iterator, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("contextflow.youtube")
+
+def _opts_key(opts: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, repr(v)) for k, v in opts.items()))
+
+class YoutubeDLPool:
+    """
+    Pool thread-safe de instâncias yt_dlp.YoutubeDL, separadas pelas opções usadas.
+    Criar um YoutubeDL carrega e instancia todos os extractors; reaproveitar evita esse
+    custo a cada vídeo. Uma instância nunca é usada por duas threads ao mesmo tempo.
+    """
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @contextlib.contextmanager
+    def borrow(self, opts: Dict[str, Any]) -> Iterator[Any]:
+        key = _opts_key(opts)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            ydl = idle.pop() if idle else None
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if ydl is None:
+            import yt_dlp  # sob demanda: importar o yt-dlp custa centenas de ms na partida
+            ydl = yt_dlp.YoutubeDL(dict(opts))
+
+        ok = False
+        try:
+            yield ydl
+            ok = True
+        finally:
+            self._give_back(key, ydl, ok)
+
+    def _give_back(self, key: Tuple, ydl: Any, ok: bool):
+        # Instâncias que terminaram em exceção são descartadas (estado interno incerto)
+        if ok:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(ydl)
+                    return
+        try:
+            ydl.close()
+        except Exception as e:
+            logger.warning(f"YoutubeDL close failed: {e}")
+
+    def close(self):
+        with self._lock:
+            instances = [y for idle in self._idle.values() for y in idle]
+            self._idle.clear()
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused,
+                    'idle': sum(len(v) for v in self._idle.values())}
+
+
+def create_http_session(headers: Dict[str, str] = None, hosts: int = 10,
+                        connections_per_host: int = 4) -> requests.Session:
+    """
+    Session compartilhada pelos workers: conexões keep-alive reaproveitadas (sem novo
+    handshake TCP/TLS por requisição). `pool_block=True` faz do pool_maxsize um limite
+    real de conexões simultâneas por host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=hosts, pool_maxsize=connections_per_host, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
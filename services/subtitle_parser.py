@@ -0,0 +1,230 @@
+# contextflow/services/subtitle_parser.py
+"""
+Parsers incrementais de legendas (JSON3, VTT/SRT, TTML/srv3).
+Cada parser lê a entrada aos poucos (string inteira ou iterável de pedaços) e emite
+segmentos (start_ms, texto) já limpos, sem montar a árvore/lista completa em memória
+nem repassar regex sobre o texto todo.
+"""
+import re
+import json
+import xml.etree.ElementTree as ET
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+Source = Union[str, Iterable[str]]
+Segment = Tuple[Optional[int], str]
+
+_TAG_RE = re.compile(r'<[^>]*>')
+_VTT_TIME_RE = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[\.,](\d{3})')
+_CHUNK_SIZE = 64 * 1024
+# Um evento JSON3 tem algumas centenas de bytes; acima disso a entrada está corrompida
+_MAX_EVENT_CHARS = 1024 * 1024
+
+def _chunks(source: Source) -> Iterator[str]:
+    if isinstance(source, str):
+        for i in range(0, len(source), _CHUNK_SIZE):
+            yield source[i:i + _CHUNK_SIZE]
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+def _normalize(text: str) -> str:
+    # Colapsa qualquer sequência de espaços/quebras numa passada só
+    return " ".join(text.split())
+
+def detect_format(head: str) -> str:
+    head = head.lstrip('﻿ \t\r\n')
+    if head.startswith('{'):
+        return 'json3'
+    if head.startswith('WEBVTT'):
+        return 'vtt'
+    if head.startswith('<'):
+        return 'xml'
+    return 'text'
+
+# --- JSON3 ---
+
+def iter_json3(source: Source) -> Iterator[Segment]:
+    """
+    Decodifica um evento de cada vez (raw_decode a partir do array "events"), então só o
+    evento corrente existe como objeto Python. JSON malformado (evento que não fecha em
+    _MAX_EVENT_CHARS ou no fim da entrada) levanta ValueError em vez de ir acumulando o resto
+    da resposta; o chamador cai no parser de texto.
+    """
+    decoder = json.JSONDecoder()
+    chunks = _chunks(source)
+    buf = ""
+    pos = 0
+    exhausted = False
+
+    def more() -> bool:
+        nonlocal buf, pos, exhausted
+        if exhausted:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    # Avança até o início do array de eventos
+    while True:
+        idx = buf.find('"events"', pos)
+        if idx >= 0:
+            bracket = buf.find('[', idx)
+            if bracket >= 0:
+                pos = bracket + 1
+                break
+        elif len(buf) > 16:
+            pos = len(buf) - 16  # mantém o suficiente para a chave cortada entre pedaços
+        if not more():
+            return
+
+    while True:
+        # Pula separadores entre eventos
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or not more():
+                break
+        if pos >= len(buf) or buf[pos] == ']':
+            return
+        try:
+            event, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if len(buf) - pos > _MAX_EVENT_CHARS:
+                raise ValueError(f"JSON3 malformado: evento sem fechar após {_MAX_EVENT_CHARS} caracteres")
+            if more():
+                continue
+            raise ValueError("JSON3 malformado: evento incompleto no fim da entrada")
+        pos = end
+
+        segs = event.get('segs') if isinstance(event, dict) else None
+        if not segs:
+            continue
+        start = event.get('tStartMs')
+        for s in segs:
+            text = s.get('utf8')
+            if text and not text.isspace():
+                offset = s.get('tOffsetMs', 0)
+                yield (start + offset if start is not None else None), _normalize(text)
+
+# --- VTT / SRT ---
+
+def _vtt_time_ms(line: str) -> Optional[int]:
+    m = _VTT_TIME_RE.search(line)
+    if not m:
+        return None
+    h, mi, s, ms = m.groups()
+    return ((int(h or 0) * 60 + int(mi)) * 60 + int(s)) * 1000 + int(ms)
+
+def _iter_lines(source: Source) -> Iterator[str]:
+    rest = ""
+    for chunk in _chunks(source):
+        rest += chunk
+        lines = rest.split('\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+_VTT_HEADER_BLOCKS = ('WEBVTT', 'NOTE', 'STYLE', 'REGION')
+_VTT_SKIP_LINES = ('Kind:', 'Language:')
+
+def iter_vtt(source: Source) -> Iterator[Segment]:
+    """Máquina de estados por linha: cabeçalho, blocos NOTE/STYLE, tempos e texto das cues."""
+    start = None
+    skipping_block = False
+    tag_sub = _TAG_RE.sub
+    for raw in _iter_lines(source):
+        line = raw.strip()
+        if not line:
+            skipping_block = False
+            continue
+        if skipping_block:
+            continue
+        if '-->' in line:
+            start = _vtt_time_ms(line)
+            continue
+        if '<' in line:
+            line = tag_sub('', line)
+        elif line.startswith(_VTT_HEADER_BLOCKS):
+            skipping_block = True
+            continue
+        elif line.isdigit() or line.startswith(_VTT_SKIP_LINES):
+            continue  # índice de cue (SRT) e metadados do cabeçalho
+        if '&' in line:
+            line = line.replace('&nbsp;', ' ').replace('&amp;', '&')
+        text = " ".join(line.split())
+        if text:
+            yield start, text
+
+# --- TTML / srv3 ---
+
+def _ttml_time_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        if value.endswith('ms'):
+            return int(float(value[:-2]))
+        if value.endswith('s'):
+            return int(float(value[:-1]) * 1000)
+        if ':' in value:
+            parts = value.split(':')
+            secs = float(parts[-1])
+            mins = int(parts[-2]) if len(parts) > 1 else 0
+            hours = int(parts[-3]) if len(parts) > 2 else 0
+            return int(((hours * 60 + mins) * 60 + secs) * 1000)
+        return int(value)  # srv3: t="1234" em ms
+    except ValueError:
+        return None
+
+def iter_xml(source: Source) -> Iterator[Segment]:
+    """TTML (<p begin=...>) e srv3 (<p t=...><s>..</s></p>), via XMLPullParser incremental."""
+    parser = ET.XMLPullParser(events=('end',))
+    for chunk in _chunks(source):
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            tag = elem.tag.rsplit('}', 1)[-1]
+            if tag != 'p':
+                continue
+            text = "".join(elem.itertext())
+            if text and not text.isspace():
+                start = _ttml_time_ms(elem.get('begin') or elem.get('t'))
+                yield start, _normalize(text)
+            elem.clear()
+    parser.close()
+
+# --- Texto genérico ---
+
+def iter_text(source: Source) -> Iterator[Segment]:
+    for line in _iter_lines(source):
+        line = line.strip()
+        if line and '-->' not in line and not line.isdigit():
+            text = _TAG_RE.sub('', line) if '<' in line else line
+            if text and not text.isspace():
+                yield None, _normalize(text)
+
+_PARSERS = {'json3': iter_json3, 'vtt': iter_vtt, 'xml': iter_xml, 'text': iter_text}
+
+def iter_segments(source: Source, fmt: str = None) -> Iterator[Segment]:
+    """Segmentos (start_ms ou None, texto limpo) da legenda, no formato detectado."""
+    chunks = _chunks(source)
+    first = next(chunks, "")
+    fmt = fmt or detect_format(first)
+
+    def replay():
+        yield first
+        yield from chunks
+
+    return _PARSERS.get(fmt, iter_text)(replay())
+
+def join_segments(segments: Iterable[Segment]) -> str:
+    """Texto corrido (os segmentos já vêm normalizados, então basta unir com espaço)."""
+    return " ".join(text for _, text in segments)
+
+def clean_subtitles(source: Source, fmt: str = None) -> str:
+    """Texto corrido da legenda (equivalente ao antigo _clean_downloaded_subs)."""
+    return join_segments(iter_segments(source, fmt))
@@ -1,25 +1,190 @@
-
 # contextflow/services/youtube_manager.py
 
-import yt_dlp
 import re
 import os
 import random
 import time
 import requests
 import logging
-from typing import Optional, Dict, Any, Tuple, List
-from youtube_transcript_api import YouTubeTranscriptApi
+from typing import Optional, Dict, Any, Tuple, List, Iterator, Callable, Set
+from constants import (HOST_METADATA, HOST_SUBTITLES, HOST_THUMBNAILS,
+                       YTDL_POOL_MAX_IDLE, HTTP_POOL_HOSTS, HTTP_POOL_PER_HOST)
+from services.client_pool import YoutubeDLPool, create_http_session
+from services.subtitle_parser import clean_subtitles, iter_segments, join_segments, Segment
 
 logger = logging.getLogger("contextflow.youtube")
 
+# --- Classificação de respostas (alimenta o controlador AIMD) ---
+OUTCOME_OK = "ok"
+OUTCOME_THROTTLED = "throttled"     # HTTP 429 / Too Many Requests
+OUTCOME_BLOCKED = "blocked"         # HTTP 403 / "confirm you're not a bot"
+OUTCOME_UNAVAILABLE = "unavailable" # 404, vídeo privado/removido, sem legendas
+OUTCOME_NETWORK = "network"         # timeout, conexão recusada
+OUTCOME_ERROR = "error"
+
+_HTTP_STATUS_RE = re.compile(r'HTTP Error (\d{3})')
+
+def classify_status(status_code: int) -> str:
+    if status_code is None: return OUTCOME_ERROR
+    if 200 <= status_code < 400: return OUTCOME_OK
+    if status_code == 429: return OUTCOME_THROTTLED
+    if status_code == 403: return OUTCOME_BLOCKED
+    if status_code in (404, 410): return OUTCOME_UNAVAILABLE
+    return OUTCOME_ERROR
+
+def classify_error(error: Exception) -> str:
+    """Extrai o status HTTP (ou a natureza do erro) de exceções do yt-dlp, requests e transcript-api."""
+    # Status explícito (requests.HTTPError, yt_dlp.networking HTTPError, urllib HTTPError)
+    for candidate in (error, getattr(error, 'exc_info', [None, None])[1] if getattr(error, 'exc_info', None) else None):
+        if candidate is None: continue
+        response = getattr(candidate, 'response', None)
+        status = getattr(response, 'status_code', None) or getattr(candidate, 'status', None) or getattr(candidate, 'code', None)
+        if isinstance(status, int):
+            return classify_status(status)
+
+    name = type(error).__name__
+    if name in ('TooManyRequests',):
+        return OUTCOME_THROTTLED
+    if name in ('IpBlocked', 'RequestBlocked'):
+        return OUTCOME_BLOCKED
+    if name in ('TranscriptsDisabled', 'NoTranscriptFound', 'VideoUnavailable', 'NoTranscriptAvailable'):
+        return OUTCOME_UNAVAILABLE
+    if name in ('Timeout', 'ConnectTimeout', 'ReadTimeout', 'ConnectionError', 'TransportError'):
+        return OUTCOME_NETWORK
+
+    msg = str(error)
+    match = _HTTP_STATUS_RE.search(msg)
+    if match:
+        return classify_status(int(match.group(1)))
+    lowered = msg.lower()
+    if 'too many requests' in lowered or 'rate-limit' in lowered or 'rate limit' in lowered:
+        return OUTCOME_THROTTLED
+    if "not a bot" in lowered or 'forbidden' in lowered:
+        return OUTCOME_BLOCKED
+    if 'video unavailable' in lowered or 'private video' in lowered:
+        return OUTCOME_UNAVAILABLE
+    if 'timed out' in lowered or 'connection' in lowered:
+        return OUTCOME_NETWORK
+    return OUTCOME_ERROR
+
+class _ApiTracks:
+    """
+    Estado do caminho YouTubeTranscriptApi durante uma sondagem: a lista de faixas é
+    carregada no primeiro uso (cache em disco antes da rede) e a lista "viva" só é
+    pedida quando algum corpo de legenda não está no cache.
+    """
+    def __init__(self, manager: 'YouTubeManager', video_id: str):
+        self.manager = manager
+        self.video_id = video_id
+        self.tracks: Optional[List[Dict[str, Any]]] = None
+        self.live = None
+        self.loaded = False
+        self.unavailable = False
+
+    def _load(self):
+        self.loaded = True
+        m = self.manager
+        self.tracks = m.cache.get('transcript_list', self.video_id) if m.cache else None
+        if self.tracks is not None:
+            return
+        try:
+            self.live = self._list()
+            self.tracks = [{'language_code': t.language_code, 'is_generated': bool(t.is_generated)} for t in self.live]
+            if m.cache:
+                m.cache.put('transcript_list', self.video_id, self.tracks)
+        except Exception as e:
+            outcome = classify_error(e)
+            if outcome in (OUTCOME_THROTTLED, OUTCOME_BLOCKED):
+                m._report(HOST_SUBTITLES, outcome)
+            elif outcome == OUTCOME_UNAVAILABLE:
+                # TranscriptsDisabled / NoTranscriptFound: a API não tem nada para o vídeo
+                self.unavailable = True
+            logger.warning(f"YouTubeTranscriptApi initial check failed ({outcome}): {e}")
+
+    def _list(self):
+        from youtube_transcript_api import YouTubeTranscriptApi  # sob demanda (ver client_pool)
+        self.manager._throttle(HOST_METADATA)
+        return YouTubeTranscriptApi.list_transcripts(self.video_id)
+
+    def fetch(self, langs: List[str], generated: bool) -> Optional[List[Segment]]:
+        if not self.loaded:
+            self._load()
+        if not self.tracks:
+            return None
+        code = next((lang for lang in langs for t in self.tracks
+                     if t['language_code'] == lang and t['is_generated'] == generated), None)
+        if not code:
+            return None
+        m = self.manager
+        key = f"api:{self.video_id}:{code}:{'auto' if generated else 'manual'}"
+        try:
+            snippets = m.cache.get('subtitle', key) if m.cache else None
+            if snippets is None:
+                if self.live is None:
+                    self.live = self._list()
+                find = self.live.find_generated_transcript if generated else self.live.find_manually_created_transcript
+                t = find([code])
+                m._throttle(HOST_SUBTITLES)
+                snippets = [{'text': i['text'], 'start': i.get('start'), 'duration': i.get('duration')}
+                            for i in t.fetch()]
+                m._report(HOST_SUBTITLES, OUTCOME_OK)
+                if m.cache:
+                    m.cache.put('subtitle', key, snippets)
+            segments = []
+            for i in snippets:
+                text = " ".join(i['text'].split())
+                if text:
+                    start = i.get('start')
+                    segments.append((int(start * 1000) if start is not None else None, text))
+            return segments
+        except Exception as e:
+            # 429/bloqueio aqui também precisam chegar ao controlador AIMD
+            outcome = classify_error(e)
+            m._report(HOST_SUBTITLES, outcome)
+            logger.warning(f"YouTubeTranscriptApi fetch failed for {self.video_id} [{code}] ({outcome}): {e}")
+            return None
+
+    def missing(self, lang_sets: Dict[str, List[str]]) -> Set[str]:
+        """Conjuntos sem nenhuma faixa na API (vazio se a API não respondeu de forma conclusiva)."""
+        if not self.loaded:
+            self._load()
+        if self.unavailable:
+            return set(lang_sets)
+        if self.tracks is None:
+            return set()
+        codes = {t['language_code'] for t in self.tracks}
+        return {name for name, langs in lang_sets.items() if not codes.intersection(langs)}
+
+
 class YouTubeManager:
     """
     Gerencia interações com o YouTube: Extração de metadados, thumbnails e download de transcrições.
     Isolado de frameworks web (Flask) para uso desktop.
     """
-    def __init__(self):
+    def __init__(self, rate_limiter=None, response_cache=None):
         self.headers = self._get_realistic_headers()
+        # HostRateLimiter compartilhado pelos workers (opcional)
+        self.rate_limiter = rate_limiter
+        # ResponseCache em disco (opcional): reprocessar não volta à rede
+        self.cache = response_cache
+        # Observador de respostas: (host, outcome) -> None (ex.: AIMDController.observe)
+        self.on_response = None
+        # Compartilhados por todos os workers: evita recriar extractors e refazer handshakes
+        self.ydl_pool = YoutubeDLPool(max_idle=YTDL_POOL_MAX_IDLE)
+        self.session = create_http_session(self.headers, hosts=HTTP_POOL_HOSTS,
+                                           connections_per_host=HTTP_POOL_PER_HOST)
+
+    def _report(self, host: str, outcome: str):
+        if self.on_response:
+            try:
+                self.on_response(host, outcome)
+            except Exception as e:
+                logger.warning(f"Response observer failed: {e}")
+
+    def _throttle(self, host: str):
+        """Aguarda o token bucket do host antes de uma requisição de rede."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(host)
 
     def _get_realistic_headers(self) -> Dict[str, str]:
         user_agents = [
@@ -42,6 +207,24 @@ class YouTubeManager:
         )
         return bool(re.match(youtube_regex, url))
 
+    _CHANNEL_RE = re.compile(r'youtube\.com/(@[^/?&]+|channel/[^/?&]+|c/[^/?&]+|user/[^/?&]+)(/[a-z]+)?', re.IGNORECASE)
+
+    def is_collection_url(self, url: str) -> bool:
+        """Playlist (list=) ou canal (/@handle, /channel/, /c/, /user/)."""
+        return "list=" in url or bool(self._CHANNEL_RE.search(url))
+
+    def normalize_collection_url(self, url: str) -> Tuple[str, str]:
+        """
+        Retorna (url, kind). Canais sem aba explícita apontam para /videos; a raiz do canal
+        lista abas (Vídeos, Shorts, Lives) em vez de vídeos.
+        """
+        if "list=" in url:
+            return url, "playlist"
+        match = self._CHANNEL_RE.search(url)
+        if match and not match.group(2):
+            return f"https://www.youtube.com/{match.group(1)}/videos", "channel"
+        return url, "channel"
+
     def extract_video_id(self, url: str) -> Optional[str]:
         patterns = [
             r'(?:youtube\.com\/(?:[^\/\n\s]+\/\S+\/|(?:v|e(?:mbed)?)\/|\S*?[?&]v=))([^"&?\/\s]{11})',
@@ -52,211 +235,387 @@ class YouTubeManager:
             if match: return match.group(1)
         return None
 
-    def get_video_metadata(self, url: str) -> Dict[str, Any]:
-        """Obtém metadados básicos sem baixar o vídeo."""
+    # Chaves volumosas do info dict que nenhum consumidor usa (formatos de mídia e afins)
+    _INFO_DROP_KEYS = ('formats', 'requested_formats', 'heatmap', 'http_headers', 'storyboards')
+    # Marca no info vindo do cache: as URLs assinadas das legendas podem já ter expirado
+    _INFO_CACHED_MARK = '_cf_cached'
+
+    def extract_video_info(self, url: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Extração yt-dlp completa de um vídeo. O dicionário retornado já traz metadados,
+        'subtitles' e 'automatic_captions' de todos os idiomas, então uma única chamada
+        serve tanto aos metadados quanto ao fallback de legendas.
+        refresh: ignora o cache (ex.: URL de legenda expirada) e regrava a entrada.
+        """
+        cache_key = self.extract_video_id(url) or url
+        if self.cache and not refresh:
+            cached = self.cache.get('info', cache_key)
+            if cached is not None:
+                cached[self._INFO_CACHED_MARK] = True
+                return cached
+
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
             'skip_download': True,
         }
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            self._throttle(HOST_METADATA)
+            with self.ydl_pool.borrow(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
-                
-                duration_sec = info.get('duration', 0)
-                formatted_duration = self._format_duration(duration_sec)
-                
-                # Timestamp atual
-                import datetime
-                now_str = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-
-                return {
-                    'id': info.get('id'),
-                    'title': info.get('title', 'Unknown'),
-                    'url': url,
-                    'duration': formatted_duration, # Agora formatado HH:MM:SS
-                    'duration_seconds': duration_sec, # Mantemos o raw se precisar
-                    'upload_date': info.get('upload_date', ''),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'uploader': info.get('uploader', ''),
-                    'channel_name': info.get('uploader') or info.get('channel') or info.get('channel_id') or 'Desconhecido',
-                    'added_at': now_str,
-                    'status': 'fetched'
-                }
         except Exception as e:
-            logger.error(f"Metadata extraction failed for {url}: {e}")
-            video_id = self.extract_video_id(url)
-            return {'id': video_id, 'url': url, 'title': 'Metadata Error', 'status': 'error'}
+            self._report(HOST_METADATA, classify_error(e))
+            raise
+        self._report(HOST_METADATA, OUTCOME_OK)
+
+        import yt_dlp  # já carregado pelo pool ao extrair
+        info = {k: v for k, v in yt_dlp.YoutubeDL.sanitize_info(info).items() if k not in self._INFO_DROP_KEYS}
+        if self.cache:
+            self.cache.put('info', cache_key, info)
+        return info
+
+    def get_video_metadata(self, url: str, info: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Obtém metadados básicos sem baixar o vídeo (reaproveita `info` se já extraído)."""
+        try:
+            if info is None:
+                info = self.extract_video_info(url)
+            return self.metadata_from_info(info, url)
+        except Exception as e:
+            return self.metadata_error(url, e)
+
+    def metadata_from_info(self, info: Dict[str, Any], url: str) -> Dict[str, Any]:
+        duration_sec = info.get('duration', 0)
+        formatted_duration = self._format_duration(duration_sec)
+
+        # Timestamp atual
+        import datetime
+        now_str = datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+        return {
+            'id': info.get('id'),
+            'title': info.get('title', 'Unknown'),
+            'url': url,
+            'duration': formatted_duration, # Agora formatado HH:MM:SS
+            'duration_seconds': duration_sec, # Mantemos o raw se precisar
+            'upload_date': info.get('upload_date', ''),
+            'thumbnail': info.get('thumbnail', ''),
+            'uploader': info.get('uploader', ''),
+            'channel_name': info.get('uploader') or info.get('channel') or info.get('channel_id') or 'Desconhecido',
+            'added_at': now_str,
+            'status': 'fetched'
+        }
+
+    def metadata_error(self, url: str, error: Exception) -> Dict[str, Any]:
+        outcome = classify_error(error) if error else OUTCOME_ERROR
+        logger.error(f"Metadata extraction failed for {url} ({outcome}): {error}")
+        video_id = self.extract_video_id(url)
+        return {'id': video_id, 'url': url, 'title': 'Metadata Error', 'status': 'error', 'error_kind': outcome}
+
+    # Campos que a entrada flat precisa ter para dispensar a extração completa
+    FLAT_REQUIRED_FIELDS = ('title', 'duration', 'channel_name')
+    _UNAVAILABLE_TITLES = ('[Private video]', '[Deleted video]')
+
+    def metadata_from_flat_entry(self, entry: Dict[str, Any], url: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Monta os metadados a partir da entrada flat da playlist (sem yt-dlp por vídeo).
+        Retorna (meta, proveniência) onde proveniência[campo] é 'flat', 'playlist',
+        'derived' ou 'missing'.
+        """
+        import datetime
+        meta = {
+            'id': entry['id'],
+            'url': url,
+            'added_at': datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+            'status': 'fetched',
+        }
+        provenance = {}
+
+        def take(field, value, source='flat'):
+            if value:
+                meta[field] = value
+                provenance[field] = source
+            else:
+                provenance.setdefault(field, 'missing')
+
+        title = entry.get('title')
+        take('title', None if title in self._UNAVAILABLE_TITLES else title)
+
+        duration = entry.get('duration')
+        if duration:
+            meta['duration_seconds'] = int(duration)
+        take('duration', self._format_duration(duration) if duration else None)
+
+        take('channel_name', entry.get('channel') or entry.get('uploader'))
+        if provenance['channel_name'] == 'missing':
+            # Abas de canal (/videos) não repetem o canal em cada entrada
+            provenance.pop('channel_name')
+            take('channel_name', entry.get('playlist_channel'), source='playlist')
+
+        take('upload_date', entry.get('upload_date'))
+
+        take('thumbnail', entry.get('thumbnail'))
+        if provenance['thumbnail'] == 'missing':
+            provenance.pop('thumbnail')
+            take('thumbnail', self.thumbnail_url(entry['id']), source='derived')
+
+        return meta, provenance
+
+    @staticmethod
+    def thumbnail_url(video_id: str) -> str:
+        """URL padrão da thumbnail, derivada só do ID (sem extração)."""
+        return f"https://{HOST_THUMBNAILS}/vi/{video_id}/hqdefault.jpg"
+
+    def _best_thumbnail(self, thumbnails: List[Dict[str, Any]]) -> Optional[str]:
+        candidates = [t for t in (thumbnails or []) if t.get('url')]
+        if not candidates: return None
+        best = max(candidates, key=lambda t: (t.get('width') or 0) * (t.get('height') or 0))
+        return best['url']
 
     def _format_duration(self, seconds: int) -> str:
         """Converte segundos para HH:MM:SS"""
         if not seconds: return "00:00:00"
+        seconds = int(seconds)
         m, s = divmod(seconds, 60)
         h, m = divmod(m, 60)
         return f"{h:02d}:{m:02d}:{s:02d}"
 
-    def get_transcript(self, video_id: str) -> Tuple[Optional[str], str]:
+    # Conjuntos de idioma rastreados pelo cache negativo (conjunto -> códigos aceitos)
+    TRANSCRIPT_LANG_SETS = {'pt': ['pt', 'pt-BR'], 'en': ['en']}
+
+    # Sondagens de transcrição: rótulo (é também a `source` gravada) -> (caminho, conjunto, gerada?)
+    # Manual EN e traduz? Não, por enquanto só pega original
+    TRANSCRIPT_PROBES = {
+        'api_manual_pt': ('api', 'pt', False),
+        'api_manual_en': ('api', 'en', False),
+        'api_auto_pt': ('api', 'pt', True),
+        'ytdlp_pt': ('ytdlp', 'pt', None),
+        'ytdlp_en': ('ytdlp', 'en', None),
+    }
+    DEFAULT_PROBE_ORDER = list(TRANSCRIPT_PROBES)
+    # `source` de versões anteriores -> rótulo atual. O get_transcript original gravava
+    # 'ytdlp_fallback_ytdlp' para o caminho yt-dlp (pt antes de en), sem distinguir o idioma;
+    # os rótulos da API não mudaram.
+    LEGACY_SOURCE_LABELS = {'ytdlp_fallback_ytdlp': 'ytdlp_pt'}
+
+    @classmethod
+    def normalize_source(cls, source: Optional[str]) -> Optional[str]:
+        return cls.LEGACY_SOURCE_LABELS.get(source, source)
+
+    def get_transcript(self, video_id: str,
+                       info_provider: Callable[[], Optional[Dict[str, Any]]] = None) -> Tuple[Optional[str], str]:
         """
         Tenta obter transcrição na seguinte ordem:
         1. API (Manual - PT)
         2. API (Manual - EN)
-        3. yt-dlp (Auto - PT)
-        4. yt-dlp (Auto - EN)
+        3. API (Auto - PT)
+        4. yt-dlp (PT)
+        5. yt-dlp (EN)
+        `info_provider` devolve o dicionário do yt-dlp já extraído para o vídeo (ou o extrai
+        uma vez); sem ele, o fallback faz no máximo uma extração para todos os idiomas.
         """
-        
-        # 1. API - Tentativa Manual
-        try:
-            # Tenta pegar lista de transcrições disponíveis
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # Tenta encontrar manual created em PT
-            try:
-                t = transcript_list.find_manually_created_transcript(['pt', 'pt-BR'])
-                return self._clean_text(" ".join([i['text'] for i in t.fetch()])), "api_manual_pt"
-            except:
-                pass
+        segments, source, _, _ = self.probe_transcript(video_id, info_provider)
+        return (join_segments(segments) if segments else None), source
 
-            # Tenta manual EN e traduz? Não, por enquanto só pega original
-            try:
-                 t = transcript_list.find_manually_created_transcript(['en'])
-                 return self._clean_text(" ".join([i['text'] for i in t.fetch()])), "api_manual_en"
-            except:
-                pass
-                
-            # Fallback para generated se não achou manual (via API)
-            try:
-                t = transcript_list.find_generated_transcript(['pt', 'pt-BR'])
-                return self._clean_text(" ".join([i['text'] for i in t.fetch()])), "api_auto_pt"
-            except:
-                pass
-                
-        except Exception as e:
-            logger.warning(f"YouTubeTranscriptApi initial check failed: {e}")
+    def probe_transcript(self, video_id: str,
+                         info_provider: Callable[[], Optional[Dict[str, Any]]] = None,
+                         skip_langs: Set[str] = frozenset(),
+                         order: List[str] = None) -> Tuple[Optional[List[Segment]], str, Set[str], int]:
+        """
+        Como get_transcript, mas:
+        - segue `order` (rótulos de TRANSCRIPT_PROBES; os omitidos vão ao fim na ordem padrão);
+        - pula os conjuntos de idioma em `skip_langs` (cache negativo).
+        Retorna (segmentos (start_ms, texto), fonte, conjuntos confirmados sem legenda,
+        sondagens tentadas).
+        Um conjunto só é "sem legenda" quando nem a API nem o info dict do yt-dlp têm faixa;
+        falhas de rede/bloqueio nunca contam como ausência.
+        """
+        active = {name: langs for name, langs in self.TRANSCRIPT_LANG_SETS.items() if name not in skip_langs}
+        if not active:
+            return None, "no_transcript_cached", set(), 0
 
-        # 2. Fallback via yt-dlp (Heavy methods)
-        # Tenta Auto PT
-        res, method = self._download_subtitles_fallback(video_id, langs=['pt', 'pt-BR'])
-        if res: return res, f"ytdlp_{method}"
-        
-        # Tenta Auto EN
-        res, method = self._download_subtitles_fallback(video_id, langs=['en'])
-        if res: return res, f"ytdlp_{method}"
+        order = [p for p in (order or []) if p in self.TRANSCRIPT_PROBES]
+        order += [p for p in self.DEFAULT_PROBE_ORDER if p not in order]
 
-        return None, "failed"
+        if info_provider is None:
+            url = f"https://www.youtube.com/watch?v={video_id}"
+            info_provider = self._memoized_info(url)
+        api = _ApiTracks(self, video_id)
+        info, info_loaded = None, False
+        tried = 0
+
+        for label in order:
+            path, lang_set, generated = self.TRANSCRIPT_PROBES[label]
+            if lang_set not in active:
+                continue
+            langs = active[lang_set]
+            if path == 'api':
+                tried += 1
+                segments = api.fetch(langs, generated)
+                if segments:
+                    return segments, label, set(), tried
+            else:
+                if not info_loaded:
+                    info_loaded = True
+                    try:
+                        info = info_provider()
+                    except Exception as e:
+                        logger.error(f"Fallback extraction failed for {video_id} ({classify_error(e)}): {e}")
+                if not info or not self.select_subtitle_track(info, langs):
+                    continue
+                tried += 1
+                segments, _ = self._download_subtitles_fallback(video_id, info, langs=langs)
+                if segments:
+                    return segments, label, set(), tried
+
+        if not info:
+            return None, "failed", set(), tried
+        missing = {name for name, langs in active.items()
+                   if name in api.missing(active) and not self.select_subtitle_track(info, langs)}
+        return None, "failed", missing, tried
+
+    def _memoized_info(self, url: str) -> Callable[[], Dict[str, Any]]:
+        cache = {}
+        def provider():
+            if 'info' not in cache:
+                cache['info'] = self.extract_video_info(url)
+            return cache['info']
+        return provider
 
-    def _download_subtitles_fallback(self, video_id: str, langs: List[str] = None) -> Tuple[Optional[str], str]:
+    def select_subtitle_track(self, info: Dict[str, Any], langs: List[str]) -> Optional[Tuple[str, str, str]]:
+        """Escolhe a melhor faixa (manual antes de automática): (idioma, tipo, url)."""
+        for kind, source in (('manual', info.get('subtitles') or {}), ('auto', info.get('automatic_captions') or {})):
+            for lang in langs:
+                for fmt in source.get(lang, []):
+                    if fmt.get('ext') in ['json3', 'srv3', 'vtt', 'ttml']:
+                        return lang, kind, fmt['url']
+        return None
+
+    def _download_subtitles_fallback(self, video_id: str, info: Dict[str, Any], langs: List[str] = None) -> Tuple[Optional[List[Segment]], str]:
         if langs is None: langs = ["pt", "pt-BR", "en"]
-        
-        url = f"https://www.youtube.com/watch?v={video_id}"
-        ydl_opts = {
-            'skip_download': True,
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': langs,
-            'subformat': 'json3',
-            'quiet': True
-        }
+
+        track = self.select_subtitle_track(info, langs)
+        if not track:
+            return None, "failed"
+        lang, kind, target_url = track
+
+        # Corpo bruto em cache: uma mudança no limpador não exige novo download
+        key = f"ytdlp:{video_id}:{lang}:{kind}"
+        body = self.cache.get('subtitle', key) if self.cache else None
+        if body is not None:
+            return self._parse_subtitle_segments(body), "fallback_ytdlp"
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                # Check standard subtitles first
-                subs = info.get('subtitles', {}) 
-                # Then auto captions
-                auto_subs = info.get('automatic_captions', {})
-                
-                target_url = None
-                
-                # Helper to find url in dict
-                def find_url(source, lang_list):
-                    for lang in lang_list:
-                         if lang in source:
-                            for fmt in source[lang]:
-                                if fmt.get('ext') in ['json3', 'srv3', 'vtt', 'ttml']:
-                                    return fmt['url']
-                    return None
-
-                target_url = find_url(subs, langs)
-                if not target_url:
-                    target_url = find_url(auto_subs, langs)
-                
-                if target_url:
-                    resp = requests.get(target_url, headers=self.headers)
-                    if resp.status_code == 200:
-                        return self._clean_downloaded_subs(resp.text), "fallback_ytdlp"
+            self._throttle(HOST_SUBTITLES)
+            try:
+                resp = self.session.get(target_url, timeout=30)
+            except Exception as e:
+                self._report(HOST_SUBTITLES, classify_error(e))
+                raise
+            if resp.status_code in (403, 410) and info.get(self._INFO_CACHED_MARK):
+                # URL assinada do info em cache expirou: não é bloqueio; re-extrai uma vez e tenta de novo
+                logger.info(f"Subtitle URL expired for {video_id} (HTTP {resp.status_code}), refreshing info")
+                fresh = self.extract_video_info(f"https://www.youtube.com/watch?v={video_id}", refresh=True)
+                return self._download_subtitles_fallback(video_id, fresh, langs=langs)
+            self._report(HOST_SUBTITLES, classify_status(resp.status_code))
+            if resp.status_code == 200:
+                if self.cache:
+                    self.cache.put('subtitle', key, resp.text)
+                return self._parse_subtitle_segments(resp.text), "fallback_ytdlp"
+            logger.error(f"Subtitle request failed for {video_id}: HTTP {resp.status_code}")
         except Exception as e:
-            logger.error(f"Fallback download failed for {video_id} with langs {langs}: {e}")
+            outcome = classify_error(e)
+            logger.error(f"Fallback download failed for {video_id} with langs {langs} ({outcome}): {e}")
         return None, "failed"
 
     def _clean_text(self, text: str) -> str:
         text = re.sub(r'\s+', ' ', text)
         return text.strip()
 
-    def _clean_downloaded_subs(self, raw_content: str) -> str:
-        """Limpa legendas que podem vir em XML, JSON3 ou VTT."""
-        import traceback
-        
-        # Log para debug extremo se falhar
-        # logger.debug(f"Cleaning content (preview): {raw_content[:200]}")
-        
-        # 1. Tentar JSON3 (Google Format)
+    def _parse_subtitle_segments(self, raw_content: str) -> List[Segment]:
+        """Segmentos (start_ms, texto limpo) de legendas JSON3, VTT ou XML."""
         try:
-            import json
-            possible_json = json.loads(raw_content)
-            
-            if possible_json and 'events' in possible_json:
-                segs = []
-                for event in possible_json['events']:
-                    if 'segs' in event:
-                        for s in event['segs']:
-                            if 'utf8' in s and s['utf8'].strip():
-                                segs.append(s['utf8'].strip())
-                return self._clean_text(" ".join(segs))
+            return list(iter_segments(raw_content))
         except Exception as e:
-            # logger.warning(f"JSON3 cleanup failed: {e}")
-            pass
+            logger.error(f"Subtitle parsing failed, using plain-text cleanup: {e}")
+            return list(iter_segments(raw_content, fmt='text'))
 
-        # 2. Fallback (VTT/XML/Raw)
+    def _clean_downloaded_subs(self, raw_content: str) -> str:
+        """Limpa legendas que podem vir em XML, JSON3 ou VTT (parser incremental, uma passada)."""
         try:
-            text = re.sub(r'<[^>]+>', '', raw_content) # Remove XML tags
-            text = re.sub(r'WEBVTT', '', text)
-            # Remove timestamps VTT: 00:00:00.000 -> ...
-            text = re.sub(r'\d{1,2}:\d{1,2}:\d{1,2}[\.,]\d{3}.*', '', text) 
-            
-            # Se tiver cara de JSON mas falhou o load, tenta limpar chaves
-            if '{' in text and '}' in text:
-                 text = re.sub(r'[{:"},]', ' ', text)
-                 text = re.sub(r'wireMagic|pens|wsWinStyles|wpWinPositions|events|tStartMs|dDurationMs|utf8|acAsrConf', '', text)
-            
-            lines = [l.strip() for l in text.split('\n') if l.strip()]
-            clean_lines = [l for l in lines if not re.match(r'^\d+$', l) and '-->' not in l]
-            
-            return self._clean_text(" ".join(clean_lines))
+            return clean_subtitles(raw_content)
         except Exception as e:
-            logger.error(f"Fallback cleanup failed: {traceback.format_exc()}")
-            return ""
+            # XML malformado e afins: aproveita o que der como texto genérico
+            logger.error(f"Subtitle parsing failed, using plain-text cleanup: {e}")
+            return clean_subtitles(raw_content, fmt='text')
 
-    def get_playlist_info(self, url: str) -> Dict[str, Any]:
-        """Retorna info da playlist e vídeos."""
+    PLAYLIST_PAGE_SIZE = 50
+
+    def iter_playlist_pages(self, url: str, page_size: int = PLAYLIST_PAGE_SIZE) -> Iterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Expande a playlist/canal de forma incremental: gera (info_playlist, página_de_vídeos)
+        conforme o yt-dlp resolve as páginas de continuação, sem esperar a lista inteira.
+        """
         ydl_opts = {
             'extract_flat': 'in_playlist',
             'quiet': True,
             'no_warnings': True,
         }
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                if 'entries' in info:
-                    return {
-                        'id': info.get('id'),
-                        'title': info.get('title', 'Playlist'),
-                        'videos': [
-                            {'id': e['id'], 'title': e.get('title'), 'url': e.get('url')} 
-                            for e in info['entries'] if e.get('id')
-                        ]
-                    }
+            self._throttle(HOST_METADATA)
+            with self.ydl_pool.borrow(ydl_opts) as ydl:
+                # process=False: 'entries' vem como gerador preguiçoso (página a página)
+                info = ydl.extract_info(url, download=False, process=False)
+                # URLs como watch?v=...&list=... retornam um redirecionamento para a aba da playlist
+                for _ in range(3):
+                    if not info or info.get('_type') not in ('url', 'url_transparent'):
+                        break
+                    info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+                self._report(HOST_METADATA, OUTCOME_OK)
+                if not info or 'entries' not in info:
+                    return
+                pl_meta = {'id': info.get('id'), 'title': info.get('title', 'Playlist')}
+                pl_channel = info.get('channel') or info.get('uploader')
+
+                page = []
+                for pos, e in enumerate(info['entries']):
+                    if not e or not e.get('id') or e.get('ie_key', 'Youtube') != 'Youtube':
+                        continue
+                    # Campos da entrada flat reaproveitados como metadados (evita extração por vídeo)
+                    page.append({
+                        'id': e['id'],
+                        'title': e.get('title'),
+                        'url': e.get('url'),
+                        'position': pos,
+                        'duration': e.get('duration'),
+                        'channel': e.get('channel'),
+                        'uploader': e.get('uploader'),
+                        'upload_date': e.get('upload_date'),
+                        'thumbnail': e.get('thumbnail') or self._best_thumbnail(e.get('thumbnails')),
+                        'playlist_channel': pl_channel,
+                    })
+                    if len(page) >= page_size:
+                        yield pl_meta, page
+                        page = []
+                        # Próxima página de continuação vai à rede
+                        self._throttle(HOST_METADATA)
+                if page:
+                    yield pl_meta, page
         except Exception as e:
-            logger.error(f"Playlist info extraction failed: {e}")
-        return {}
+            outcome = classify_error(e)
+            self._report(HOST_METADATA, outcome)
+            logger.error(f"Playlist info extraction failed ({outcome}): {e}")
+            raise
+
+    def get_playlist_info(self, url: str) -> Dict[str, Any]:
+        """Retorna info da playlist e vídeos (lista completa; ver iter_playlist_pages)."""
+        result = {}
+        try:
+            for pl_meta, page in self.iter_playlist_pages(url):
+                if not result:
+                    result = dict(pl_meta, videos=[])
+                result['videos'].extend(page)
+        except Exception:
+            return {}
+        return result
 
     def download_thumbnail(self, url: str, save_path: str) -> bool:
         """Baixa e salva thumbnail."""
@@ -264,14 +623,18 @@ class YouTubeManager:
             # Garantir que diretório existe
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             
-            resp = requests.get(url, headers=self.headers, stream=True, timeout=10)
-            if resp.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    for chunk in resp.iter_content(1024):
-                        f.write(chunk)
-                return True
-            else:
-                logger.error(f"Thumbnail request failed: {resp.status_code}")
+            self._throttle(HOST_THUMBNAILS)
+            # `with` devolve a conexão ao pool mesmo com stream=True
+            with self.session.get(url, stream=True, timeout=10) as resp:
+                self._report(HOST_THUMBNAILS, classify_status(resp.status_code))
+                if resp.status_code == 200:
+                    with open(save_path, 'wb') as f:
+                        for chunk in resp.iter_content(1024):
+                            f.write(chunk)
+                    return True
+                else:
+                    logger.error(f"Thumbnail request failed: {resp.status_code}")
         except Exception as e:
+            self._report(HOST_THUMBNAILS, classify_error(e))
             logger.error(f"Thumbnail download failed: {e}")
         return False
@@ -3,8 +3,9 @@
 import sqlite3
 import os
 import datetime
-from typing import Dict, Any, List, Optional
-from constants import DB_PATH
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+from constants import DB_PATH, DEFAULT_ENCODING
 
 class DatabaseHandler:
     def __init__(self, db_path: str = DB_PATH):
@@ -13,13 +14,17 @@ class DatabaseHandler:
         self._check_and_migrate_db()
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        # timeout alto: vários workers (e processos) disputam o lock de escrita
+        return sqlite3.connect(self.db_path, timeout=30)
 
     def _init_db(self):
         """Cria as tabelas se não existirem."""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         conn = self._get_connection()
         cursor = conn.cursor()
+
+        # WAL: leitores não bloqueiam o escritor (UI lendo enquanto workers gravam)
+        cursor.execute("PRAGMA journal_mode=WAL")
         
         # Tabela de Vídeos (Metadados)
         cursor.execute('''
@@ -48,6 +53,119 @@ class DatabaseHandler:
                 FOREIGN KEY (video_id) REFERENCES videos(id)
             )
         ''')
+
+        # Fila durável de tarefas (sobrevive a reinícios, compartilhada entre processos)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                playlist_id TEXT,
+                playlist_title TEXT,
+                video_id TEXT,
+                state TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL DEFAULT 0,
+                force_refresh INTEGER DEFAULT 0,
+                flat_meta TEXT,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at REAL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, available_at)")
+
+        # Fontes rastreadas (playlists/canais) para sincronização incremental
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sources (
+                id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                title TEXT,
+                kind TEXT DEFAULT 'playlist',
+                auto_sync INTEGER DEFAULT 1,
+                entry_count INTEGER DEFAULT 0,
+                last_sync_at REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Entradas conhecidas de cada fonte (removed_at preenchido quando some da listagem)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS source_entries (
+                source_id TEXT NOT NULL,
+                video_id TEXT NOT NULL,
+                position INTEGER,
+                title TEXT,
+                first_seen REAL,
+                last_seen REAL,
+                removed_at REAL,
+                PRIMARY KEY (source_id, video_id)
+            )
+        ''')
+
+        # Segmentos com tempo da transcrição (arrays uint32 compactos, ver core/segment_index.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transcript_segments (
+                video_id TEXT PRIMARY KEY,
+                segment_count INTEGER,
+                starts BLOB,
+                text_offsets BLOB,
+                token_prefix BLOB,
+                FOREIGN KEY (video_id) REFERENCES videos(id)
+            )
+        ''')
+
+        # Miniaturas pré-escaladas (RGB cru): a UI monta o bitmap sem decodificar JPEG
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS thumb_variants (
+                video_id TEXT NOT NULL,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                rgb BLOB,
+                PRIMARY KEY (video_id, width, height)
+            )
+        ''')
+
+        # Contagem de tokens por encoding (o200k_base, cl100k_base...): planejamento de custo por modelo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS token_counts (
+                video_id TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                token_count INTEGER,
+                compact_token_count INTEGER,
+                updated_at REAL,
+                PRIMARY KEY (video_id, encoding)
+            )
+        ''')
+
+        # Chunks prontos para LLM (orçamento de tokens por encoding), válidos enquanto o hash do
+        # full_text for o mesmo; o texto de cada chunk é lido com substr(full_text)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transcript_chunks (
+                video_id TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                max_tokens INTEGER NOT NULL,
+                overlap INTEGER NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                content_hash BLOB,
+                char_start INTEGER,
+                char_end INTEGER,
+                token_count INTEGER,
+                PRIMARY KEY (video_id, encoding, max_tokens, overlap, chunk_index)
+            ) WITHOUT ROWID
+        ''')
+
+        # Cache negativo: vídeo sem legenda em um conjunto de idiomas (válido até expires_at)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS transcript_misses (
+                video_id TEXT NOT NULL,
+                lang_set TEXT NOT NULL,
+                checked_at REAL,
+                expires_at REAL,
+                PRIMARY KEY (video_id, lang_set)
+            )
+        ''')
         
         conn.commit()
         conn.close()
@@ -75,7 +193,32 @@ class DatabaseHandler:
             if 'added_at' not in columns:
                 print("Migrando DB: Adicionando added_at...")
                 cursor.execute("ALTER TABLE videos ADD COLUMN added_at TEXT")
-                
+
+            if 'meta_provenance' not in columns:
+                print("Migrando DB: Adicionando meta_provenance...")
+                cursor.execute("ALTER TABLE videos ADD COLUMN meta_provenance TEXT")
+
+            if 'transcript_source' not in columns:
+                print("Migrando DB: Adicionando transcript_source...")
+                cursor.execute("ALTER TABLE videos ADD COLUMN transcript_source TEXT")
+
+            if 'compact_token_count' not in columns:
+                print("Migrando DB: Adicionando compact_token_count...")
+                cursor.execute("ALTER TABLE videos ADD COLUMN compact_token_count INTEGER")
+
+            cursor.execute("PRAGMA table_info(transcripts)")
+            transcript_columns = [info[1] for info in cursor.fetchall()]
+
+            if 'compact_text' not in transcript_columns:
+                print("Migrando DB: Adicionando transcripts.compact_text...")
+                cursor.execute("ALTER TABLE transcripts ADD COLUMN compact_text TEXT")
+
+            # videos.token_count sempre foi do encoding padrão: semeia a tabela por encoding
+            cursor.execute('''
+                INSERT OR IGNORE INTO token_counts (video_id, encoding, token_count, compact_token_count, updated_at)
+                SELECT id, ?, token_count, compact_token_count, ? FROM videos WHERE token_count > 0
+            ''', (DEFAULT_ENCODING, time.time()))
+
             conn.commit()
         except Exception as e:
             print(f"Erro na migração de DB: {e}")
@@ -88,9 +231,10 @@ class DatabaseHandler:
         cursor = conn.cursor()
         try:
             cursor.execute('''
-                INSERT INTO videos (id, url, title, channel_name, duration, upload_date, thumbnail_path, playlist_id, playlist_title, status, created_at, added_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO videos (id, url, title, channel_name, duration, upload_date, thumbnail_path, playlist_id, playlist_title, status, created_at, added_at, meta_provenance)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(id) DO UPDATE SET
+                    meta_provenance=excluded.meta_provenance,
                     title=excluded.title,
                     channel_name=excluded.channel_name,
                     playlist_id=excluded.playlist_id,
@@ -110,7 +254,8 @@ class DatabaseHandler:
                 video_data.get('playlist_title'),
                 video_data.get('status', 'pending'),
                 datetime.datetime.now().isoformat(),
-                video_data.get('added_at', '')
+                video_data.get('added_at', ''),
+                video_data.get('meta_provenance')
             ))
             conn.commit()
         except Exception as e:
@@ -130,18 +275,277 @@ class DatabaseHandler:
         finally:
             conn.close()
 
-    def save_transcript(self, video_id: str, text: str, summary: str = ""):
+    def set_compact_token_count(self, video_id: str, compact_token_count: Optional[int]):
+        """Tokens do texto compacto (economia = token_count - compact_token_count)."""
+        conn = self._get_connection()
+        try:
+            conn.execute('UPDATE videos SET compact_token_count = ? WHERE id = ?', (compact_token_count, video_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_transcript_source(self, video_id: str, source: str):
+        conn = self._get_connection()
+        try:
+            conn.execute('UPDATE videos SET transcript_source = ? WHERE id = ?', (source, video_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_channel_source_counts(self) -> Dict[str, Dict[str, int]]:
+        """Por canal: quantos vídeos tiveram a transcrição vinda de cada fonte."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT channel_name, transcript_source, COUNT(*) FROM videos
+                WHERE transcript_source IS NOT NULL AND channel_name IS NOT NULL
+                GROUP BY channel_name, transcript_source
+            ''').fetchall()
+        finally:
+            conn.close()
+        counts: Dict[str, Dict[str, int]] = {}
+        for channel, source, n in rows:
+            counts.setdefault(channel, {})[source] = n
+        return counts
+
+    def save_transcript(self, video_id: str, text: str, summary: str = "", compact_text: str = None):
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute('''
-                INSERT INTO transcripts (video_id, full_text, summary)
-                VALUES (?, ?, ?)
+                INSERT INTO transcripts (video_id, full_text, summary, compact_text)
+                VALUES (?, ?, ?, ?)
                 ON CONFLICT(video_id) DO UPDATE SET
                     full_text=excluded.full_text,
-                    summary=excluded.summary
-            ''', (video_id, text, summary))
+                    summary=excluded.summary,
+                    compact_text=excluded.compact_text
+            ''', (video_id, text, summary, compact_text))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_thumb_variants(self, video_id: str, variants: Dict[Tuple[int, int], bytes]):
+        if not variants:
+            return
+        conn = self._get_connection()
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO thumb_variants (video_id, width, height, rgb) VALUES (?, ?, ?, ?)',
+                [(video_id, w, h, data) for (w, h), data in variants.items()])
             conn.commit()
+        except Exception as e:
+            print(f"DB Error (save_thumb_variants): {e}")
+        finally:
+            conn.close()
+
+    def get_thumb_variants(self, width: int, height: int) -> Dict[str, bytes]:
+        """Todas as miniaturas de um tamanho, numa consulta (usado ao popular a tabela)."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('SELECT video_id, rgb FROM thumb_variants WHERE width = ? AND height = ?',
+                                (width, height)).fetchall()
+            return {r[0]: r[1] for r in rows}
+        finally:
+            conn.close()
+
+    def get_thumb_variant(self, video_id: str, width: int, height: int) -> Optional[bytes]:
+        conn = self._get_connection()
+        try:
+            row = conn.execute('SELECT rgb FROM thumb_variants WHERE video_id = ? AND width = ? AND height = ?',
+                               (video_id, width, height)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def save_segment_index(self, video_id: str, blobs: Optional[Dict[str, Any]]):
+        """Grava (ou remove, se None) o índice de segmentos da transcrição."""
+        conn = self._get_connection()
+        try:
+            if blobs is None:
+                conn.execute('DELETE FROM transcript_segments WHERE video_id = ?', (video_id,))
+            else:
+                conn.execute('''
+                    INSERT OR REPLACE INTO transcript_segments (video_id, segment_count, starts, text_offsets, token_prefix)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (video_id, blobs['segment_count'], blobs['starts'], blobs['text_offsets'], blobs['token_prefix']))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_segment_index(self, video_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute('SELECT * FROM transcript_segments WHERE video_id = ?', (video_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def save_transcript_chunks(self, video_id: str, encoding: str, max_tokens: int, overlap: int,
+                               content_hash: bytes, chunks: List[Tuple[int, int, int]]):
+        """Substitui os chunks (char_inicio, char_fim, tokens) do vídeo nessa configuração."""
+        conn = self._get_connection()
+        try:
+            conn.execute(
+                'DELETE FROM transcript_chunks WHERE video_id = ? AND encoding = ? AND max_tokens = ? AND overlap = ?',
+                (video_id, encoding, max_tokens, overlap))
+            conn.executemany('''
+                INSERT INTO transcript_chunks (video_id, encoding, max_tokens, overlap, chunk_index,
+                                               content_hash, char_start, char_end, token_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(video_id, encoding, max_tokens, overlap, i, content_hash, start, end, tokens)
+                  for i, (start, end, tokens) in enumerate(chunks)])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_transcript_chunks(self, video_id: str, encoding: str, max_tokens: int, overlap: int) -> List[Dict[str, Any]]:
+        """Chunks guardados, em ordem, com o content_hash do full_text de quando foram gerados."""
+        conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('''
+                SELECT chunk_index, content_hash, char_start, char_end, token_count FROM transcript_chunks
+                WHERE video_id = ? AND encoding = ? AND max_tokens = ? AND overlap = ?
+                ORDER BY chunk_index
+            ''', (video_id, encoding, max_tokens, overlap)).fetchall()
+            return [dict(r) for r in rows]
+        finally:
+            conn.close()
+
+    def get_transcript_slice(self, video_id: str, start: int, end: int) -> str:
+        """Trecho [start, end) do full_text, lido pelo próprio SQLite (substr é 1-based)."""
+        conn = self._get_connection()
+        try:
+            row = conn.execute('SELECT substr(full_text, ?, ?) FROM transcripts WHERE video_id = ?',
+                               (start + 1, max(0, end - start), video_id)).fetchone()
+            return row[0] if row and row[0] else ""
+        finally:
+            conn.close()
+
+    def set_thumbnail_path(self, video_id: str, path: str):
+        conn = self._get_connection()
+        try:
+            conn.execute('UPDATE videos SET thumbnail_path = ? WHERE id = ?', (path, video_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_token_count(self, video_id: str, token_count: int):
+        """Atualiza só a contagem (re-tokenização), sem mexer no status."""
+        conn = self._get_connection()
+        try:
+            conn.execute('UPDATE videos SET token_count = ? WHERE id = ?', (token_count, video_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def save_token_counts(self, video_id: str, encoding: str, token_count: int,
+                          compact_token_count: Optional[int] = None, replace_others: bool = False):
+        """
+        Grava a contagem de um encoding. replace_others=True descarta as dos outros encodings
+        (transcrição nova: as contagens antigas não valem mais).
+        """
+        conn = self._get_connection()
+        try:
+            if replace_others:
+                conn.execute('DELETE FROM token_counts WHERE video_id = ? AND encoding != ?', (video_id, encoding))
+            conn.execute('''
+                INSERT OR REPLACE INTO token_counts (video_id, encoding, token_count, compact_token_count, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (video_id, encoding, token_count, compact_token_count, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_token_counts(self, encoding: str) -> Dict[str, Tuple[int, Optional[int]]]:
+        """video_id -> (tokens, tokens do texto compacto) de um encoding, numa consulta."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('SELECT video_id, token_count, compact_token_count FROM token_counts WHERE encoding = ?',
+                                (encoding,)).fetchall()
+            return {r[0]: (r[1], r[2]) for r in rows}
+        finally:
+            conn.close()
+
+    def get_encoding_coverage(self) -> Dict[str, int]:
+        """Quantos vídeos têm contagem em cada encoding."""
+        conn = self._get_connection()
+        try:
+            return dict(conn.execute('SELECT encoding, COUNT(*) FROM token_counts GROUP BY encoding').fetchall())
+        finally:
+            conn.close()
+
+    def get_token_ratio_samples(self) -> List[Tuple[str, str, Any, int, int]]:
+        """(encoding, transcript_source, duration, bytes do texto bruto, tokens) de cada contagem exata."""
+        conn = self._get_connection()
+        try:
+            return conn.execute('''
+                SELECT c.encoding, v.transcript_source, v.duration, LENGTH(CAST(t.full_text AS BLOB)), c.token_count
+                FROM token_counts c
+                JOIN videos v ON v.id = c.video_id
+                JOIN transcripts t ON t.video_id = c.video_id
+                WHERE c.token_count > 0 AND t.full_text IS NOT NULL AND t.full_text != ''
+            ''').fetchall()
+        finally:
+            conn.close()
+
+    def get_video_ids_missing_encoding(self, encoding: str) -> List[str]:
+        """Vídeos com transcrição e sem contagem no encoding (alvo do recálculo em lote)."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT t.video_id FROM transcripts t
+                WHERE t.full_text IS NOT NULL AND t.full_text != ''
+                  AND NOT EXISTS (SELECT 1 FROM token_counts c WHERE c.video_id = t.video_id AND c.encoding = ?)
+            ''', (encoding,)).fetchall()
+            return [r[0] for r in rows]
+        finally:
+            conn.close()
+
+    def set_summary_placeholder(self, video_id: str, summary: str) -> bool:
+        """Grava o resumo só se ainda não houver um (nunca sobrescreve um resumo real)."""
+        conn = self._get_connection()
+        try:
+            cur = conn.execute(
+                "UPDATE transcripts SET summary = ? WHERE video_id = ? AND (summary IS NULL OR summary = '')",
+                (summary, video_id))
+            conn.commit()
+            return cur.rowcount > 0
+        finally:
+            conn.close()
+
+    def get_backfill_candidates(self, limit: int) -> Dict[str, List[str]]:
+        """
+        Vídeos com enriquecimento pendente, por tipo de job da faixa de backfill:
+        thumbnail ausente, variantes ausentes, contagem de tokens zerada e resumo vazio.
+        """
+        queries = {
+            'thumbnail': '''
+                SELECT id FROM videos
+                WHERE status = 'completed' AND (thumbnail_path IS NULL OR thumbnail_path = '')
+                LIMIT ?''',
+            'variants': '''
+                SELECT v.id FROM videos v
+                WHERE v.thumbnail_path IS NOT NULL AND v.thumbnail_path != ''
+                  AND NOT EXISTS (SELECT 1 FROM thumb_variants tv WHERE tv.video_id = v.id)
+                LIMIT ?''',
+            'retokenize': '''
+                SELECT v.id FROM videos v JOIN transcripts t ON t.video_id = v.id
+                WHERE v.status = 'completed' AND (v.token_count IS NULL OR v.token_count = 0)
+                  AND t.full_text IS NOT NULL AND t.full_text != ''
+                LIMIT ?''',
+            'summary': '''
+                SELECT v.id FROM videos v JOIN transcripts t ON t.video_id = v.id
+                WHERE v.status = 'completed' AND (t.summary IS NULL OR t.summary = '')
+                LIMIT ?''',
+        }
+        conn = self._get_connection()
+        try:
+            return {kind: [r[0] for r in conn.execute(sql, (limit,)).fetchall()] for kind, sql in queries.items()}
+        except Exception as e:
+            print(f"DB Error (get_backfill_candidates): {e}")
+            return {}
         finally:
             conn.close()
 
@@ -167,6 +571,17 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    def get_video(self, video_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT * FROM videos WHERE id = ?', (video_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
     def get_transcript(self, video_id: str) -> Optional[Dict[str, Any]]:
         conn = self._get_connection()
         conn.row_factory = sqlite3.Row
@@ -198,6 +613,15 @@ class DatabaseHandler:
 
             # Transcripts tem FK, mas vamos garantir
             cursor.execute('DELETE FROM transcripts WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM transcript_segments WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM thumb_variants WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM token_counts WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM transcript_chunks WHERE video_id = ?', (video_id,))
+            # Tarefas abertas manteriam o vídeo como "na fila" (re-adicionar seria ignorado) e o
+            # alimentador poderia reingeri-lo; cache negativo e entradas de fonte saem junto
+            cursor.execute('DELETE FROM tasks WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM transcript_misses WHERE video_id = ?', (video_id,))
+            cursor.execute('DELETE FROM source_entries WHERE video_id = ?', (video_id,))
             cursor.execute('DELETE FROM videos WHERE id = ?', (video_id,))
             conn.commit()
         except Exception as e:
@@ -205,6 +629,16 @@ class DatabaseHandler:
         finally:
             conn.close()
 
+    def get_completed_video_ids(self) -> Set[str]:
+        """IDs já ingeridos com sucesso (índice local para pular vídeos antes de qualquer rede)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT id FROM videos WHERE status = 'completed'")
+            return {r[0] for r in cursor.fetchall()}
+        finally:
+            conn.close()
+
     def get_video_ids_for_playlist(self, playlist_id: str) -> List[str]:
         """Retorna lista de IDs de vídeo para uma dada playlist."""
         conn = self._get_connection()
@@ -238,6 +672,13 @@ class DatabaseHandler:
             if vids:
                 placeholders = ','.join(['?'] * len(vids))
                 cursor.execute(f'DELETE FROM transcripts WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM transcript_segments WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM thumb_variants WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM token_counts WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM transcript_chunks WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM tasks WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM transcript_misses WHERE video_id IN ({placeholders})', vids)
+                cursor.execute(f'DELETE FROM source_entries WHERE video_id IN ({placeholders})', vids)
                 
             cursor.execute('DELETE FROM videos WHERE playlist_id = ?', (playlist_id,))
             conn.commit()
@@ -245,3 +686,283 @@ class DatabaseHandler:
             print(f"Erro ao deletar playlist {playlist_id}: {e}")
         finally:
             conn.close()
+
+    # --- Fila Durável de Tarefas ---
+    # Estados: pending -> leased -> done | failed (leased volta a pending se o lease expirar)
+
+    def enqueue_task(self, task_id: str, url: str, playlist_id: str = None, playlist_title: str = None,
+                     video_id: str = None, force_refresh: bool = False, flat_meta: str = None):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT OR IGNORE INTO tasks (id, url, playlist_id, playlist_title, video_id, force_refresh, flat_meta, state, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+            ''', (task_id, url, playlist_id, playlist_title, video_id, int(force_refresh), flat_meta, time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def claim_tasks(self, owner: str, limit: int, lease_seconds: float) -> List[Dict[str, Any]]:
+        """
+        Reserva atomicamente até `limit` tarefas pendentes (ou com lease expirado).
+        BEGIN IMMEDIATE garante exclusividade mesmo entre processos diferentes.
+        """
+        now = time.time()
+        conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute('''
+                SELECT id FROM tasks
+                WHERE (state = 'pending' AND available_at <= ?)
+                   OR (state = 'leased' AND lease_expires < ?)
+                ORDER BY created_at, rowid
+                LIMIT ?
+            ''', (now, now, limit))
+            ids = [r['id'] for r in cursor.fetchall()]
+            if not ids:
+                conn.commit()
+                return []
+
+            placeholders = ','.join(['?'] * len(ids))
+            cursor.execute(f'''
+                UPDATE tasks
+                SET state = 'leased', lease_owner = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id IN ({placeholders})
+            ''', [owner, now + lease_seconds, now] + ids)
+            cursor.execute(f'SELECT * FROM tasks WHERE id IN ({placeholders}) ORDER BY created_at, rowid', ids)
+            rows = [dict(r) for r in cursor.fetchall()]
+            conn.commit()
+            return rows
+        except Exception as e:
+            conn.rollback()
+            print(f"DB Error (claim_tasks): {e}")
+            return []
+        finally:
+            conn.close()
+
+    def renew_leases(self, owner: str, task_ids: List[str], lease_seconds: float):
+        """Heartbeat: estende o lease das tarefas ainda em andamento neste worker."""
+        if not task_ids: return
+        now = time.time()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            placeholders = ','.join(['?'] * len(task_ids))
+            cursor.execute(f'''
+                UPDATE tasks SET lease_expires = ?, updated_at = ?
+                WHERE lease_owner = ? AND state = 'leased' AND id IN ({placeholders})
+            ''', [now + lease_seconds, now, owner] + list(task_ids))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def update_task_video_id(self, task_id: str, video_id: str):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('UPDATE tasks SET video_id = ?, updated_at = ? WHERE id = ?', (video_id, time.time(), task_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def complete_task(self, task_id: str):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE tasks SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                    last_error = NULL, updated_at = ?
+                WHERE id = ?
+            ''', (time.time(), task_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fail_task(self, task_id: str, owner: str, error: str, max_attempts: int, retry_delay: float):
+        """Devolve a tarefa para a fila (com atraso crescente) ou marca como failed."""
+        now = time.time()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE tasks
+                SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    available_at = ? + attempts * ?,
+                    lease_owner = NULL, lease_expires = NULL,
+                    last_error = ?, updated_at = ?
+                WHERE id = ? AND lease_owner = ?
+            ''', (max_attempts, now, retry_delay, error, now, task_id, owner))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def release_tasks(self, owner: str):
+        """Devolve à fila tudo que este worker reservou (parada limpa), sem contar tentativa."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                UPDATE tasks
+                SET state = 'pending', lease_owner = NULL, lease_expires = NULL,
+                    attempts = MAX(attempts - 1, 0), updated_at = ?
+                WHERE lease_owner = ? AND state = 'leased'
+            ''', (time.time(), owner))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def purge_finished_tasks(self, older_than_seconds: float):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("DELETE FROM tasks WHERE state = 'done' AND updated_at < ?",
+                           (time.time() - older_than_seconds,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_open_task_video_ids(self) -> Set[str]:
+        """IDs de vídeo com tarefa ainda pendente/em andamento na fila durável."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT video_id FROM tasks WHERE state IN ('pending', 'leased') AND video_id IS NOT NULL")
+            return {r[0] for r in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def get_task_counts(self) -> Dict[str, int]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state')
+            return {state: count for state, count in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    # --- Fontes (Sync Incremental de Playlists/Canais) ---
+
+    def upsert_source(self, source_id: str, url: str, title: str, kind: str):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO sources (id, url, title, kind) VALUES (?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET url=excluded.url, title=excluded.title, kind=excluded.kind
+            ''', (source_id, url, title, kind))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_sources(self, auto_sync_only: bool = False) -> List[Dict[str, Any]]:
+        conn = self._get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        try:
+            query = 'SELECT * FROM sources'
+            if auto_sync_only:
+                query += ' WHERE auto_sync = 1'
+            cursor.execute(query + ' ORDER BY COALESCE(last_sync_at, 0)')
+            return [dict(r) for r in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def get_source_entry_ids(self, source_id: str) -> Set[str]:
+        """IDs atualmente presentes na fonte (ignora os marcados como removidos)."""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT video_id FROM source_entries WHERE source_id = ? AND removed_at IS NULL', (source_id,))
+            return {r[0] for r in cursor.fetchall()}
+        finally:
+            conn.close()
+
+    def upsert_source_entries(self, source_id: str, entries: List[Dict[str, Any]], seen_at: float):
+        """Registra entradas vistas na listagem atual (novas ou reaparecidas)."""
+        if not entries: return
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany('''
+                INSERT INTO source_entries (source_id, video_id, position, title, first_seen, last_seen, removed_at)
+                VALUES (?, ?, ?, ?, ?, ?, NULL)
+                ON CONFLICT(source_id, video_id) DO UPDATE SET
+                    position=excluded.position,
+                    title=COALESCE(excluded.title, source_entries.title),
+                    last_seen=excluded.last_seen,
+                    removed_at=NULL
+            ''', [(source_id, e['id'], e.get('position'), e.get('title'), seen_at, seen_at) for e in entries])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def finish_source_sync(self, source_id: str, sync_started_at: float) -> List[str]:
+        """
+        Fecha uma sincronização: entradas não vistas desde `sync_started_at` são marcadas
+        como removidas. Retorna os IDs removidos nesta rodada.
+        """
+        now = time.time()
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                SELECT video_id FROM source_entries
+                WHERE source_id = ? AND removed_at IS NULL AND last_seen < ?
+            ''', (source_id, sync_started_at))
+            removed = [r[0] for r in cursor.fetchall()]
+            if removed:
+                cursor.execute('''
+                    UPDATE source_entries SET removed_at = ?
+                    WHERE source_id = ? AND removed_at IS NULL AND last_seen < ?
+                ''', (now, source_id, sync_started_at))
+            cursor.execute('''
+                UPDATE sources SET last_sync_at = ?,
+                    entry_count = (SELECT COUNT(*) FROM source_entries WHERE source_id = ? AND removed_at IS NULL)
+                WHERE id = ?
+            ''', (now, source_id, source_id))
+            conn.commit()
+            return removed
+        finally:
+            conn.close()
+
+    def record_transcript_misses(self, video_id: str, lang_sets: List[str], ttl: float):
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            conn.executemany('''
+                INSERT OR REPLACE INTO transcript_misses (video_id, lang_set, checked_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', [(video_id, lang_set, now, now + ttl) for lang_set in lang_sets])
+            conn.commit()
+        except Exception as e:
+            print(f"DB Error (record_transcript_misses): {e}")
+        finally:
+            conn.close()
+
+    def get_transcript_misses(self, video_id: str) -> Set[str]:
+        """Conjuntos de idioma ainda válidos no cache negativo do vídeo."""
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(
+                "SELECT lang_set FROM transcript_misses WHERE video_id = ? AND expires_at > ?",
+                (video_id, time.time())).fetchall()
+            return {r[0] for r in rows}
+        finally:
+            conn.close()
+
+    def clear_transcript_misses(self, video_id: str = None) -> int:
+        """Remove o cache negativo de um vídeo (ou de todos, e os expirados)."""
+        conn = self._get_connection()
+        try:
+            if video_id:
+                cursor = conn.execute("DELETE FROM transcript_misses WHERE video_id = ?", (video_id,))
+            else:
+                cursor = conn.execute("DELETE FROM transcript_misses")
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -0,0 +1,207 @@
+# contextflow/storage/response_cache.py
+import sqlite3
+import os
+import json
+import zlib
+import time
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+class ResponseCache:
+    """
+    Cache em disco das respostas do YouTube (dicts do extract_info, listas de legendas,
+    corpos de legendas). Os blobs são endereçados pelo conteúdo (sha256 do JSON) e um
+    índice SQLite mapeia (namespace, chave) -> blob, com validade (TTL) e último acesso
+    para despejo LRU quando o total passa de `max_bytes`.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, ttls: Dict[str, float] = None,
+                 default_ttl: float = 86400.0):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.index_path = os.path.join(cache_dir, "index.db")
+        self.max_bytes = max_bytes
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._init_db()
+
+    def _get_connection(self):
+        return sqlite3.connect(self.index_path, timeout=30)
+
+    def _init_db(self):
+        os.makedirs(self.blob_dir, exist_ok=True)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL,
+                expires_at REAL,
+                last_access REAL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries(digest)")
+        conn.commit()
+        conn.close()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Retorna o valor guardado ou None (ausente, expirado ou blob perdido)."""
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            row = conn.execute("SELECT digest, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                               (namespace, key)).fetchone()
+            if not row or (row[1] is not None and row[1] < now):
+                self._count(False)
+                return None
+            try:
+                with open(self._blob_path(row[0]), 'rb') as f:
+                    value = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+            except (OSError, ValueError, zlib.error):
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                conn.commit()
+                self._count(False)
+                return None
+            conn.execute("UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                         (now, namespace, key))
+            conn.commit()
+            self._count(True)
+            return value
+        except Exception as e:
+            print(f"Cache Error (get): {e}")
+            self._count(False)
+            return None
+        finally:
+            conn.close()
+
+    def put(self, namespace: str, key: str, value: Any, ttl: float = None):
+        """Grava o valor (serializável em JSON). Conteúdo idêntico reaproveita o mesmo blob."""
+        try:
+            payload = json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        except (TypeError, ValueError) as e:
+            print(f"Cache Error (put {namespace}): valor não serializável: {e}")
+            return
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._blob_path(digest)
+        data = zlib.compress(payload, 6)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escrita atômica: outro worker nunca lê um blob pela metade
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        ttl = self.ttls.get(namespace, self.default_ttl) if ttl is None else ttl
+        conn = self._get_connection()
+        try:
+            old = conn.execute("SELECT digest FROM entries WHERE namespace = ? AND key = ?",
+                               (namespace, key)).fetchone()
+            conn.execute('''
+                INSERT OR REPLACE INTO entries (namespace, key, digest, size, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (namespace, key, digest, len(data), now, now + ttl if ttl else None, now))
+            conn.commit()
+            if old and old[0] != digest:
+                self._drop_orphan(conn, old[0])
+            self._evict(conn)
+        except Exception as e:
+            print(f"Cache Error (put): {e}")
+        finally:
+            conn.close()
+
+    def _drop_orphan(self, conn, digest: str):
+        """Remove o blob se nenhuma entrada aponta mais para ele."""
+        if conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+            return
+        try:
+            os.remove(self._blob_path(digest))
+        except OSError:
+            pass
+
+    def _total_bytes(self, conn) -> int:
+        # Blobs compartilhados contam uma vez
+        row = conn.execute("SELECT SUM(size) FROM (SELECT DISTINCT digest, size FROM entries)").fetchone()
+        return row[0] or 0
+
+    def _evict(self, conn):
+        """Expirados primeiro; depois os menos usados recentemente até caber em max_bytes."""
+        self._delete_where(conn, "expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        total = self._total_bytes(conn)
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT namespace, key, digest, size FROM entries ORDER BY last_access").fetchall()
+        for namespace, key, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+            if not conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                total -= size
+                try:
+                    os.remove(self._blob_path(digest))
+                except OSError:
+                    pass
+
+    def _delete_where(self, conn, condition: str, params: tuple) -> int:
+        digests = [r[0] for r in conn.execute(f"SELECT DISTINCT digest FROM entries WHERE {condition}", params)]
+        if not digests:
+            return 0
+        cursor = conn.execute(f"DELETE FROM entries WHERE {condition}", params)
+        conn.commit()
+        for digest in digests:
+            self._drop_orphan(conn, digest)
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        conn = self._get_connection()
+        try:
+            return self._delete_where(conn, "expires_at IS NOT NULL AND expires_at < ?", (time.time(),))
+        finally:
+            conn.close()
+
+    def invalidate(self, namespace: str, key: str):
+        conn = self._get_connection()
+        try:
+            self._delete_where(conn, "namespace = ? AND key = ?", (namespace, key))
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._get_connection()
+        try:
+            per_ns = dict(conn.execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace").fetchall())
+            total = self._total_bytes(conn)
+        finally:
+            conn.close()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': per_ns,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
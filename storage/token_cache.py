@@ -0,0 +1,258 @@
+# contextflow/storage/token_cache.py
+import sqlite3
+import os
+import sys
+import time
+import hashlib
+import threading
+import collections
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Key = Tuple[bytes, str]  # (hash do conteúdo, encoding)
+
+class TokenCountCache:
+    """
+    Cache persistente de contagens de tokens: (hash do conteúdo, encoding) -> tokens.
+    Um LRU pequeno em memória fica na frente do SQLite; com ele, re-escanear arquivos
+    inalterados ou reprocessar a mesma transcrição custa só o hash.
+    """
+    # Limite de parâmetros por consulta IN (...) do SQLite
+    _QUERY_CHUNK = 500
+
+    def __init__(self, db_path: str, lru_size: int = 4096):
+        self.db_path = db_path
+        self.lru_size = lru_size
+        self._lru: 'collections.OrderedDict[Key, int]' = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._init_db()
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS token_counts (
+                content_hash BLOB NOT NULL,
+                encoding TEXT NOT NULL,
+                token_count INTEGER NOT NULL,
+                created_at REAL,
+                PRIMARY KEY (content_hash, encoding)
+            ) WITHOUT ROWID
+        ''')
+        # Somas prefixas de tokens de uma transcrição (count_tokens_at_offsets): o hash cobre
+        # o texto e os offsets dos segmentos; prefix = uint32 little-endian
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS token_prefixes (
+                content_hash BLOB NOT NULL,
+                encoding TEXT NOT NULL,
+                token_count INTEGER NOT NULL,
+                prefix BLOB,
+                created_at REAL,
+                PRIMARY KEY (content_hash, encoding)
+            ) WITHOUT ROWID
+        ''')
+        # Amostras agregadas para o estimador calibrado (core/token_estimator.py):
+        # kind 'ext' (extensão de arquivo) ou 'lang' (idioma da transcrição); key '*' = geral
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS token_ratios (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                bytes INTEGER DEFAULT 0,
+                tokens INTEGER DEFAULT 0,
+                seconds REAL DEFAULT 0,
+                timed_tokens INTEGER DEFAULT 0,
+                samples INTEGER DEFAULT 0,
+                PRIMARY KEY (kind, key, encoding)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def content_hash(text: str) -> bytes:
+        # blake2b de 128 bits: mais rápido que sha256 e colisão irrelevante para contagens
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    @staticmethod
+    def offsets_hash(text: str, offsets) -> bytes:
+        """Hash de (texto, offsets de caractere) para token_prefixes."""
+        h = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16)
+        h.update(b"\0" + ",".join(map(str, offsets)).encode('ascii'))
+        return h.digest()
+
+    def _remember(self, key: Key, count: int):
+        """Insere no LRU (chamador segura o lock)."""
+        self._lru[key] = count
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, hashes: Iterable[bytes], encoding: str) -> Dict[bytes, int]:
+        """Contagens conhecidas para os hashes (LRU primeiro, depois uma consulta por bloco)."""
+        found: Dict[bytes, int] = {}
+        pending: List[bytes] = []
+        with self._lock:
+            for h in set(hashes):
+                key = (h, encoding)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[h] = self._lru[key]
+                else:
+                    pending.append(h)
+            self.memory_hits += len(found)
+
+        if pending:
+            conn = self._get_connection()
+            try:
+                for i in range(0, len(pending), self._QUERY_CHUNK):
+                    chunk = pending[i:i + self._QUERY_CHUNK]
+                    rows = conn.execute(
+                        f"SELECT content_hash, token_count FROM token_counts WHERE encoding = ? "
+                        f"AND content_hash IN ({','.join('?' * len(chunk))})", [encoding, *chunk]).fetchall()
+                    for h, count in rows:
+                        found[bytes(h)] = count
+            except sqlite3.Error as e:
+                print(f"Erro no cache de tokens: {e}")
+            finally:
+                conn.close()
+            with self._lock:
+                disk = [h for h in pending if h in found]
+                for h in disk:
+                    self._remember((h, encoding), found[h])
+                self.disk_hits += len(disk)
+                self.misses += len(pending) - len(disk)
+        return found
+
+    def get(self, content_hash: bytes, encoding: str) -> Optional[int]:
+        return self.get_many([content_hash], encoding).get(content_hash)
+
+    def put_many(self, counts: Dict[bytes, int], encoding: str):
+        if not counts:
+            return
+        with self._lock:
+            for h, count in counts.items():
+                self._remember((h, encoding), count)
+        now = time.time()
+        conn = self._get_connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO token_counts (content_hash, encoding, token_count, created_at) VALUES (?, ?, ?, ?)",
+                [(h, encoding, count, now) for h, count in counts.items()])
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro no cache de tokens: {e}")
+        finally:
+            conn.close()
+
+    def put(self, content_hash: bytes, encoding: str, count: int):
+        self.put_many({content_hash: count}, encoding)
+
+    def get_prefix(self, key: bytes, encoding: str) -> Optional[Tuple[int, List[int]]]:
+        """(total, somas prefixas) gravados para o hash de offsets_hash; None se ausente."""
+        conn = self._get_connection()
+        try:
+            row = conn.execute("SELECT token_count, prefix FROM token_prefixes WHERE content_hash = ? AND encoding = ?",
+                               (key, encoding)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro no cache de tokens: {e}")
+            row = None
+        finally:
+            conn.close()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        values = array('I')
+        values.frombytes(row[1] or b"")
+        if sys.byteorder == 'big':
+            values.byteswap()
+        return row[0], values.tolist()
+
+    def put_prefix(self, key: bytes, encoding: str, total: int, prefix: List[int]):
+        values = array('I', prefix)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        conn = self._get_connection()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO token_prefixes (content_hash, encoding, token_count, prefix, created_at) "
+                "VALUES (?, ?, ?, ?, ?)", (key, encoding, total, values.tobytes(), time.time()))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro no cache de tokens: {e}")
+        finally:
+            conn.close()
+
+    def add_ratio_samples(self, rows: List[Tuple[str, str, str, int, int, float, int, int]]):
+        """Soma amostras (kind, key, encoding, bytes, tokens, seconds, timed_tokens, samples) aos agregados."""
+        if not rows:
+            return
+        conn = self._get_connection()
+        try:
+            conn.executemany('''
+                INSERT INTO token_ratios (kind, key, encoding, bytes, tokens, seconds, timed_tokens, samples)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(kind, key, encoding) DO UPDATE SET
+                    bytes = bytes + excluded.bytes,
+                    tokens = tokens + excluded.tokens,
+                    seconds = seconds + excluded.seconds,
+                    timed_tokens = timed_tokens + excluded.timed_tokens,
+                    samples = samples + excluded.samples
+            ''', rows)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao salvar amostras do estimador: {e}")
+        finally:
+            conn.close()
+
+    def get_ratio_samples(self) -> List[Tuple[str, str, str, int, int, float, int, int]]:
+        conn = self._get_connection()
+        try:
+            return conn.execute(
+                "SELECT kind, key, encoding, bytes, tokens, seconds, timed_tokens, samples FROM token_ratios").fetchall()
+        except sqlite3.Error as e:
+            print(f"Erro ao ler amostras do estimador: {e}")
+            return []
+        finally:
+            conn.close()
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        conn = self._get_connection()
+        try:
+            conn.execute("DELETE FROM token_counts")
+            conn.execute("DELETE FROM token_prefixes")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, float]:
+        conn = self._get_connection()
+        try:
+            entries = conn.execute("SELECT COUNT(*) FROM token_counts").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        finally:
+            conn.close()
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'entries': entries,
+                'lru_entries': len(self._lru),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,36 @@
+# contextflow/tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import TOKEN_ENCODINGS
+from core import token_engine
+
+@pytest.fixture
+def db(tmp_path):
+    from storage.db_handler import DatabaseHandler
+    return DatabaseHandler(str(tmp_path / "contextflow.db"))
+
+@pytest.fixture
+def byte_encoder(monkeypatch, tmp_path):
+    """
+    Encoding tiktoken pequeno (bytes + alguns merges) registrado para todos os encodings,
+    sem baixar o BPE; o cache de tokens vai para um arquivo temporário.
+    """
+    tiktoken = pytest.importorskip("tiktoken")
+    ranks = {bytes([i]): i for i in range(256)}
+    for i, merge in enumerate([b" a", b"er", b"os", b" p", b"en", b"de", b" n"]):
+        ranks[merge] = 256 + i
+    encoder = tiktoken.Encoding(
+        name="cf-test",
+        pat_str=r"""'s|'t|'re|'ve|'m|'ll|'d| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks=ranks, special_tokens={})
+    monkeypatch.setattr(token_engine, "_encoders", {name: encoder for name in TOKEN_ENCODINGS})
+    monkeypatch.setattr(token_engine, "_token_lengths", {})
+    monkeypatch.setattr(token_engine, "TOKEN_CACHE_PATH", str(tmp_path / "token_cache.db"))
+    monkeypatch.setattr(token_engine, "_token_cache", None)
+    monkeypatch.setattr(token_engine, "_token_cache_failed", False)
+    return encoder
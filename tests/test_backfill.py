@@ -0,0 +1,68 @@
+# contextflow/tests/test_backfill.py
+import threading
+import time
+
+from core.backfill import BackfillLane
+from core.rate_limiter import HostRateLimiter
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def make_lane(busy=lambda: False):
+    lane = BackfillLane(HostRateLimiter({"yt": (1000.0, 10)}), busy)
+    lane.POLL_INTERVAL = 0.02
+    return lane
+
+def test_duplicate_jobs_are_not_queued():
+    lane = make_lane()
+    lane.register("thumb", lambda video_id, **kw: True, host="yt")
+    assert lane.submit("thumb", "v1")
+    assert not lane.submit("thumb", "v1")
+    assert lane.submit("thumb", "v1", size="hd")
+    assert lane.pending() == 2
+
+def test_jobs_run_and_are_counted():
+    lane = make_lane()
+    done = []
+    lane.register("thumb", lambda video_id, **kw: done.append(video_id) or True, host="yt")
+    lane.register("retok", lambda video_id, **kw: False)
+    lane.start(2)
+    try:
+        lane.submit("thumb", "v1")
+        lane.submit("retok", "v2")
+        assert wait_until(lambda: lane.pending() == 0)
+    finally:
+        lane.stop()
+    assert done == ["v1"]
+    assert lane.get_stats()["jobs"] == {"thumb": {"queued": 1, "done": 1}, "retok": {"queued": 1, "skipped": 1}}
+
+def test_local_jobs_wait_while_main_queue_is_busy():
+    busy = threading.Event()
+    busy.set()
+    lane = make_lane(busy.is_set)
+    ran = threading.Event()
+    lane.register("retok", lambda video_id, **kw: ran.set() or True)
+    lane.start(1)
+    try:
+        lane.submit("retok", "v1")
+        assert not ran.wait(0.2)
+        busy.clear()
+        assert ran.wait(2)
+    finally:
+        lane.stop()
+
+def test_stop_joins_workers_and_clears_queue():
+    lane = make_lane(lambda: True)
+    lane.register("retok", lambda video_id, **kw: True)
+    lane.start(2)
+    for i in range(5):
+        lane.submit("retok", f"v{i}")
+    lane.stop()
+    assert not any(t.is_alive() for t in lane.threads)
+    assert lane.pending() == 0
+    assert lane.submit("retok", "v0")
@@ -0,0 +1,22 @@
+# contextflow/tests/test_caption_compactor.py
+from core.caption_compactor import CaptionCompactor
+
+def test_rolling_overlap_is_removed():
+    segments = [(0, "hoje vamos falar"), (1000, "vamos falar sobre bancos"), (2000, "sobre bancos de dados")]
+    assert CaptionCompactor().compact(segments) == [(0, "hoje vamos falar"), (1000, "sobre bancos"),
+                                                    (2000, "de dados")]
+
+def test_single_word_repetition_is_kept():
+    assert CaptionCompactor().compact_text([(0, "eu acho que"), (1000, "que que isso")]) == \
+        "eu acho que que que isso"
+
+def test_overlap_ignores_case_and_punctuation():
+    assert CaptionCompactor().compact_text([(0, "Então, é isso."), (1000, "é isso pessoal")]) == \
+        "Então, é isso. pessoal"
+
+def test_non_speech_and_fillers_are_dropped():
+    segments = [(0, "[Música]"), (1000, "♪ ahn bom dia ♪"), (2000, "(risos) hum"), (3000, "pessoal")]
+    assert CaptionCompactor().compact(segments) == [(1000, "bom dia"), (3000, "pessoal")]
+
+def test_fully_repeated_cue_is_dropped():
+    assert CaptionCompactor().compact([(0, "bom dia pessoal"), (1000, "dia pessoal")]) == [(0, "bom dia pessoal")]
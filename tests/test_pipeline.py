@@ -0,0 +1,82 @@
+# contextflow/tests/test_pipeline.py
+import threading
+import time
+
+from core.pipeline import Pipeline, Stage
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_items_flow_through_every_stage():
+    done = []
+    pipeline = Pipeline([Stage("a", lambda x: x + 1, workers=2, maxsize=2),
+                         Stage("b", lambda x: x * 10, workers=1, maxsize=2),
+                         Stage("c", done.append)])
+    pipeline.start()
+    try:
+        for i in range(20):
+            assert pipeline.submit(i)
+        assert wait_until(lambda: pipeline.pending() == 0)
+    finally:
+        pipeline.stop()
+    assert sorted(done) == [(i + 1) * 10 for i in range(20)]
+    assert pipeline.get_stats()["c"]["processed"] == 20
+
+def test_handler_returning_none_ends_the_item():
+    seen = []
+    pipeline = Pipeline([Stage("a", lambda x: x if x % 2 else None), Stage("b", seen.append)])
+    pipeline.start()
+    try:
+        for i in range(10):
+            pipeline.submit(i)
+        assert wait_until(lambda: pipeline.pending() == 0)
+    finally:
+        pipeline.stop()
+    assert sorted(seen) == [1, 3, 5, 7, 9]
+
+def test_errors_are_reported_and_leave_the_pipeline():
+    errors = []
+    def boom(x):
+        raise ValueError(x)
+    pipeline = Pipeline([Stage("a", boom)], on_error=lambda item, e: errors.append(item))
+    pipeline.start()
+    try:
+        pipeline.submit("x")
+        assert wait_until(lambda: pipeline.pending() == 0)
+    finally:
+        pipeline.stop()
+    assert errors == ["x"]
+
+def test_bounded_queue_applies_backpressure_to_submit():
+    release = threading.Event()
+    pipeline = Pipeline([Stage("slow", lambda x: release.wait(), workers=1, maxsize=1)])
+    pipeline.start()
+    try:
+        pipeline.submit(1)  # em execução
+        pipeline.submit(2)  # ocupa a fila
+        blocked = threading.Thread(target=pipeline.submit, args=(3,), daemon=True)
+        blocked.start()
+        time.sleep(0.3)
+        assert blocked.is_alive()
+    finally:
+        release.set()
+        pipeline.stop()
+
+def test_stop_joins_workers_and_drains_queues():
+    pipeline = Pipeline([Stage("a", lambda x: time.sleep(0.05) or x, workers=1, maxsize=0),
+                         Stage("b", lambda x: None)])
+    pipeline.start()
+    for i in range(10):
+        pipeline.submit(i)
+    time.sleep(0.02)
+    drained = pipeline.stop()
+    assert drained > 0
+    assert not any(t.is_alive() for t in pipeline.threads)
+    assert pipeline.pending() == 0
+    assert all(s.queue.qsize() == 0 for s in pipeline.stages)
+    assert not pipeline.submit(99)
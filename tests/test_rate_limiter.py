@@ -0,0 +1,52 @@
+# contextflow/tests/test_rate_limiter.py
+from core.rate_limiter import TokenBucket, HostRateLimiter, ConcurrencyLimiter, AIMDController
+
+def test_token_bucket_allows_burst_then_refuses():
+    bucket = TokenBucket(rate=0.001, burst=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+def test_token_bucket_drain_empties_it():
+    bucket = TokenBucket(rate=0.001, burst=5)
+    bucket.drain()
+    assert not bucket.try_acquire()
+
+def test_host_rate_limiter_only_waits_for_known_hosts():
+    limiter = HostRateLimiter({"a": (100.0, 1)})
+    assert limiter.acquire("unknown") == 0.0
+    limiter.acquire("a")
+    assert limiter.get_stats()["a"]["total_requests"] == 1
+
+def test_concurrency_limit_is_clamped():
+    limiter = ConcurrencyLimiter(limit=10, max_limit=4)
+    assert limiter.limit == 4
+    limiter.set_limit(0)
+    assert limiter.limit == 1
+
+def make_controller(**kwargs):
+    limiter = HostRateLimiter({"yt": (1.0, 1)})
+    concurrency = ConcurrencyLimiter(4, 8)
+    controller = AIMDController(limiter, concurrency, min_rates={"yt": 0.1}, max_rates={"yt": 1.5},
+                                rate_step=0.25, successes_per_slot=2, **kwargs)
+    return limiter, concurrency, controller
+
+def test_aimd_additive_increase_up_to_the_cap():
+    limiter, concurrency, controller = make_controller()
+    for _ in range(4):
+        controller.observe("yt", "ok")
+    assert limiter.buckets["yt"].rate == 1.5
+    assert concurrency.limit == 6  # +1 slot a cada 2 sucessos
+
+def test_aimd_multiplicative_decrease_once_per_cooldown():
+    limiter, concurrency, controller = make_controller(cooldown=60.0)
+    controller.observe("yt", "throttled")
+    controller.observe("yt", "blocked")
+    assert limiter.buckets["yt"].rate == 0.5
+    assert concurrency.limit == 2
+
+def test_aimd_ignores_non_congestion_outcomes():
+    limiter, concurrency, controller = make_controller()
+    controller.observe("yt", "unavailable")
+    controller.observe("yt", "error")
+    assert limiter.buckets["yt"].rate == 1.0
+    assert concurrency.limit == 4
+    assert controller.get_state()["outcomes"] == {"unavailable": 1, "error": 1}
@@ -0,0 +1,55 @@
+# contextflow/tests/test_response_cache.py
+import os
+
+import pytest
+
+from storage.response_cache import ResponseCache
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+
+def test_roundtrip_and_stats(cache):
+    assert cache.get("info", "v1") is None
+    cache.put("info", "v1", {"title": "Vídeo", "tracks": [1, 2]})
+    assert cache.get("info", "v1") == {"title": "Vídeo", "tracks": [1, 2]}
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, {"info": 1})
+
+def test_expired_entries_are_misses_and_purged(cache):
+    cache.put("info", "old", {"a": 1}, ttl=-1)
+    cache.put("info", "new", {"a": 2}, ttl=3600)
+    assert cache.get("info", "old") is None
+    cache.purge_expired()
+    assert cache.get_stats()["entries"] == {"info": 1}
+
+def test_identical_values_share_one_blob(cache):
+    cache.put("subs", "a", {"x": "mesmo conteúdo"})
+    cache.put("subs", "b", {"x": "mesmo conteúdo"})
+    blobs = [f for _, _, files in os.walk(cache.blob_dir) for f in files]
+    assert len(blobs) == 1
+    cache.invalidate("subs", "a")
+    assert cache.get("subs", "b") == {"x": "mesmo conteúdo"}
+    cache.invalidate("subs", "b")
+    assert [f for _, _, files in os.walk(cache.blob_dir) for f in files] == []
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    payload = os.urandom(3000).hex()  # incompressível o bastante
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=7000)
+    cache.put("subs", "a", payload + "a")
+    cache.put("subs", "b", payload + "b")
+    assert cache.get("subs", "a") is not None  # "a" passa a ser o mais recente
+    cache.put("subs", "c", payload + "c")
+    assert cache.get("subs", "b") is None
+    assert cache.get("subs", "a") is not None
+    assert cache.get("subs", "c") is not None
+    assert cache.get_stats()["bytes"] <= 7000
+
+def test_corrupt_blob_is_a_miss(cache):
+    cache.put("info", "v1", {"a": 1})
+    for root, _, files in os.walk(cache.blob_dir):
+        for name in files:
+            with open(os.path.join(root, name), "wb") as f:
+                f.write(b"lixo")
+    assert cache.get("info", "v1") is None
+    assert cache.get_stats()["entries"] == {}
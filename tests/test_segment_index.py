@@ -0,0 +1,36 @@
+# contextflow/tests/test_segment_index.py
+from core.segment_index import SegmentIndex
+
+SEGMENTS = [(0, "primeiro trecho"), (5000, "segundo"), (None, "sem tempo"), (12000, "último trecho")]
+
+def test_full_text_and_offsets():
+    text, index = SegmentIndex.from_segments(SEGMENTS)
+    assert text == "primeiro trecho segundo sem tempo último trecho"
+    assert list(index.starts) == [0, 5000, 5000, 12000]
+    assert [text[index.offsets[i]:index.offsets[i + 1]].strip() for i in range(len(index))] == \
+        [t for _, t in SEGMENTS]
+
+def test_untimed_segments_have_no_index():
+    text, index = SegmentIndex.from_segments([(None, "a"), (None, "b")])
+    assert (text, index) == ("a b", None)
+
+def test_char_range_and_tokens_between():
+    text, index = SegmentIndex.from_segments(SEGMENTS)
+    first, last = index.char_range(5000, 12000)
+    assert text[first:last] == "segundo sem tempo"
+    assert index.tokens_between(5000, 12000) is None
+    index.set_token_prefix([0, 3, 4, 6, 9])
+    assert index.tokens_between(5000, 12000) == 3
+    assert index.tokens_between(0, 60000) == 9
+
+def test_token_boundaries_put_the_separator_in_the_next_segment():
+    text, index = SegmentIndex.from_segments(SEGMENTS[:2])
+    assert index.token_boundaries() == [0, len("primeiro trecho"), len(text)]
+
+def test_blob_roundtrip():
+    _, index = SegmentIndex.from_segments(SEGMENTS)
+    index.set_token_prefix([0, 3, 4, 6, 9])
+    restored = SegmentIndex.from_blobs(index.to_blobs())
+    assert list(restored.starts) == list(index.starts)
+    assert list(restored.offsets) == list(index.offsets)
+    assert list(restored.token_prefix) == [0, 3, 4, 6, 9]
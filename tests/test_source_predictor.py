@@ -0,0 +1,37 @@
+# contextflow/tests/test_source_predictor.py
+from core.source_predictor import SourcePredictor
+
+ORDER = ["api_manual_pt", "api_auto_pt", "ytdlp_pt"]
+
+class FakeDB:
+    def __init__(self, counts):
+        self.counts = counts
+
+    def get_channel_source_counts(self):
+        return self.counts
+
+def test_default_order_until_enough_samples():
+    predictor = SourcePredictor(FakeDB({"canal": {"ytdlp_pt": 2}}), ORDER)
+    assert predictor.order_for("canal") == ORDER
+    assert predictor.order_for(None) == ORDER
+
+def test_most_frequent_source_goes_first():
+    predictor = SourcePredictor(FakeDB({"canal": {"ytdlp_pt": 3, "api_auto_pt": 1}}), ORDER)
+    assert predictor.order_for("canal") == ["ytdlp_pt", "api_auto_pt", "api_manual_pt"]
+
+def test_record_updates_counts_and_hit_rate():
+    predictor = SourcePredictor(FakeDB({}), ORDER, min_samples=2)
+    for _ in range(2):
+        predictor.record("canal", predictor.order_for("canal"), "api_auto_pt", probes=2)
+    order = predictor.order_for("canal")
+    assert order[0] == "api_auto_pt"
+    predictor.record("canal", order, "api_auto_pt", probes=1)
+    stats = predictor.get_stats()
+    assert (stats["predictions"], stats["hits"], stats["avg_probes"]) == (1, 1, round(5 / 3, 2))
+
+def test_legacy_labels_are_mapped_and_unknown_ones_counted(capsys):
+    db = FakeDB({"canal": {"ytdlp_fallback_ytdlp": 3, "manual": 2}})
+    predictor = SourcePredictor(db, ORDER, aliases={"ytdlp_fallback_ytdlp": "ytdlp_pt"})
+    assert predictor.order_for("canal")[0] == "ytdlp_pt"
+    assert predictor.get_stats()["ignored_samples"] == 2
+    assert "manual" in capsys.readouterr().out
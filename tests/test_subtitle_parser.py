@@ -0,0 +1,72 @@
+# contextflow/tests/test_subtitle_parser.py
+import json
+
+import pytest
+
+from services import subtitle_parser
+from services.subtitle_parser import (detect_format, iter_json3, iter_segments, iter_vtt, iter_xml,
+                                      join_segments)
+
+JSON3 = json.dumps({"wireMagic": "pb3", "events": [
+    {"tStartMs": 0, "dDurationMs": 1000},
+    {"tStartMs": 1000, "segs": [{"utf8": "olá"}, {"utf8": " mundo", "tOffsetMs": 400}]},
+    {"tStartMs": 2500, "segs": [{"utf8": "\n"}]},
+    {"tStartMs": 3000, "segs": [{"utf8": "segunda\n  linha"}]},
+]})
+
+VTT = """WEBVTT
+Kind: captions
+
+00:00:01.000 --> 00:00:02.000
+<c>olá</c> mundo
+
+1
+00:01:02.500 --> 00:01:03.000
+segunda
+linha
+"""
+
+XML = """<?xml version="1.0" encoding="utf-8"?><timedtext format="3"><body>
+<p t="1500" d="2000"><s>olá</s><s> &amp; mundo</s></p>
+<p t="4000" d="1000"></p>
+<p t="5000" d="1000">fim</p>
+</body></timedtext>"""
+
+def chunked(text, size):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+def test_json3_segments():
+    assert list(iter_json3(JSON3)) == [(1000, "olá"), (1400, "mundo"), (3000, "segunda linha")]
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_json3_chunked_matches_whole(size):
+    assert list(iter_json3(chunked(JSON3, size))) == list(iter_json3(JSON3))
+
+def test_json3_truncated_input_raises():
+    with pytest.raises(ValueError):
+        list(iter_json3(JSON3[:-40]))
+
+def test_json3_unterminated_event_stops_at_the_cap(monkeypatch):
+    monkeypatch.setattr(subtitle_parser, "_MAX_EVENT_CHARS", 100)
+    read = []
+    def source():
+        yield '{"events": [{"segs": [{"utf8": "'
+        for _ in range(1000):
+            read.append(1)
+            yield "x" * 10
+    with pytest.raises(ValueError):
+        list(iter_json3(source()))
+    assert len(read) < 20
+
+def test_vtt_segments():
+    assert list(iter_vtt(chunked(VTT, 5))) == [(1000, "olá mundo"), (62500, "segunda"), (62500, "linha")]
+
+def test_xml_segments():
+    assert list(iter_xml(chunked(XML, 9))) == [(1500, "olá & mundo"), (5000, "fim")]
+
+def test_detect_format_and_dispatch():
+    assert detect_format("﻿" + JSON3) == "json3"
+    assert detect_format(VTT) == "vtt"
+    assert detect_format(XML) == "xml"
+    assert detect_format("texto solto") == "text"
+    assert join_segments(iter_segments(chunked(JSON3, 4))) == "olá mundo segunda linha"
@@ -0,0 +1,58 @@
+# contextflow/tests/test_task_queue.py
+import time
+
+def test_claim_leases_each_task_once(db):
+    for i in range(3):
+        db.enqueue_task(f"t{i}", f"u{i}", video_id=f"v{i}")
+    first = db.claim_tasks("w1", 2, 60)
+    second = db.claim_tasks("w2", 5, 60)
+    assert [r["id"] for r in first] == ["t0", "t1"]
+    assert [r["id"] for r in second] == ["t2"]
+    assert db.claim_tasks("w3", 5, 60) == []
+
+def test_expired_lease_is_claimable_again(db):
+    db.enqueue_task("t", "u")
+    db.claim_tasks("w1", 1, -1)
+    assert [r["id"] for r in db.claim_tasks("w2", 1, 60)] == ["t"]
+
+def test_fail_retries_until_max_attempts(db):
+    db.enqueue_task("t", "u")
+    db.claim_tasks("w", 1, 60)
+    db.fail_task("t", "w", "boom", max_attempts=2, retry_delay=0)
+    assert db.get_task_counts() == {"pending": 1}
+    db.claim_tasks("w", 1, 60)
+    db.fail_task("t", "w", "boom", max_attempts=2, retry_delay=0)
+    assert db.get_task_counts() == {"failed": 1}
+
+def test_release_returns_tasks_without_counting_the_attempt(db):
+    db.enqueue_task("t", "u", video_id="v")
+    db.claim_tasks("w", 1, 60)
+    db.release_tasks("w")
+    assert db.get_open_task_video_ids() == {"v"}
+    assert db.claim_tasks("w", 1, 60)[0]["attempts"] == 1
+
+def test_complete_closes_the_task(db):
+    db.enqueue_task("t", "u", video_id="v")
+    db.claim_tasks("w", 1, 60)
+    db.complete_task("t")
+    assert db.get_open_task_video_ids() == set()
+
+def test_delete_video_drops_its_tasks_and_misses(db):
+    db.add_video_entry({"id": "v", "url": "u", "title": "t", "status": "processing"})
+    db.enqueue_task("t", "u", video_id="v")
+    db.record_transcript_misses("v", ["pt", "en"], 3600)
+    db.delete_video("v")
+    assert db.get_open_task_video_ids() == set()
+    assert db.get_transcript_misses("v") == set()
+
+def test_transcript_misses_expire(db):
+    db.record_transcript_misses("v", ["pt"], 3600)
+    db.record_transcript_misses("v", ["en"], -1)
+    assert db.get_transcript_misses("v") == {"pt"}
+
+def test_source_sync_marks_unseen_entries_removed(db):
+    db.upsert_source("s", "url", "title", "playlist")
+    db.upsert_source_entries("s", [{"id": "a"}, {"id": "b"}], seen_at=time.time() - 10)
+    started = time.time()
+    db.upsert_source_entries("s", [{"id": "a"}], seen_at=started)
+    assert db.finish_source_sync("s", started) == ["b"]
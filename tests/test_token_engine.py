@@ -0,0 +1,92 @@
+# contextflow/tests/test_token_engine.py
+import pytest
+
+from constants import DEFAULT_ENCODING, TOKEN_CACHE_MIN_CHARS
+from core import token_engine
+
+class CountingEncoder:
+    """Repassa para o encoder real contando as tokenizações."""
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.encodes = 0
+
+    def encode(self, text):
+        self.encodes += 1
+        return self.encoder.encode(text)
+
+    def __getattr__(self, name):
+        return getattr(self.encoder, name)
+
+@pytest.fixture
+def counting(byte_encoder, monkeypatch):
+    encoder = CountingEncoder(byte_encoder)
+    monkeypatch.setattr(token_engine, "_encoders", {DEFAULT_ENCODING: encoder})
+    return encoder
+
+def long_text(seed):
+    return " ".join(f"frase {seed} número {i} para o cache de tokens." for i in range(TOKEN_CACHE_MIN_CHARS // 20))
+
+def test_batch_matches_single_counts(byte_encoder):
+    texts = ["", "olá mundo", long_text(1), "de novo os dados", long_text(2)]
+    expected = [len(byte_encoder.encode(t)) for t in texts]
+    assert token_engine.count_tokens_batch(texts) == expected
+    assert [token_engine.count_tokens(t)[0] for t in texts] == expected
+
+def test_large_texts_are_cached_and_small_ones_are_not(counting):
+    text = long_text(3)
+    first = token_engine.count_tokens(text)[0]
+    assert token_engine.count_tokens(text)[0] == first
+    assert counting.encodes == 1
+    token_engine.count_tokens("curto")
+    token_engine.count_tokens("curto")
+    assert counting.encodes == 3
+    assert token_engine.count_tokens_batch([text, long_text(4)])[0] == first
+    assert counting.encodes == 4
+
+def test_offsets_prefix_is_cached_and_fills_the_count_cache(counting, byte_encoder):
+    text = long_text(5)
+    offsets = [0, 100, 2000, len(text)]
+    total, prefix = token_engine.count_tokens_at_offsets(text, offsets)
+    _, starts = byte_encoder.decode_with_offsets(byte_encoder.encode(text))
+    assert total == len(starts)
+    assert prefix == [sum(1 for s in starts if s < off) for off in offsets]
+    assert token_engine.count_tokens_at_offsets(text, offsets) == (total, prefix)
+    assert token_engine.count_tokens(text)[0] == total
+    assert counting.encodes == 1
+
+def test_offsets_fallback_without_encoder(monkeypatch):
+    monkeypatch.setattr(token_engine, "_encoders", {DEFAULT_ENCODING: None})
+    total, prefix = token_engine.count_tokens_at_offsets("abcdefgh" * 2, [0, 8, 16])
+    assert (total, prefix) == (4, [0, 2, 4])
+
+def test_paged_details_cover_the_whole_text(byte_encoder):
+    text = "Olá, mundo! Os dados de entrada são processados " * 10
+    details = token_engine.get_tokenization_details(text, page=1, page_size=16)
+    ids, offsets = details["token_ids"], details["byte_offsets"]
+    assert details["tokens"] == len(ids) == len(byte_encoder.encode(text))
+    assert details["pages"] == -(-len(ids) // 16)
+    assert len(offsets) == len(ids) + 1 and offsets[-1] == details["byte_size"]
+    raw = text.encode("utf-8")
+    assert [raw[offsets[i]:offsets[i + 1]] for i in range(3)] == \
+        [byte_encoder.decode_single_token_bytes(t) for t in ids[:3]]
+    assert details["token_list"] == token_engine.decode_token_window(ids, 16, 16)
+
+def test_chunks_cut_at_sentences_within_budget(byte_encoder):
+    text = " ".join(f"Frase número {i} com algumas palavras." for i in range(30))
+    chunks = token_engine.chunk_text(text, 40)
+    assert all(tokens <= 40 for _, _, tokens in chunks)
+    assert "".join(text[s:e] for s, e, _ in chunks) == text
+    assert all(text[e - 1] == "." for _, e, _ in chunks)
+    assert sum(tokens for _, _, tokens in chunks) == len(byte_encoder.encode(text))
+
+def test_chunks_without_boundaries_cut_at_the_budget(byte_encoder):
+    text = "x" * 100
+    assert [tokens for _, _, tokens in token_engine.chunk_text(text, 30)] == [30, 30, 30, 10]
+
+def test_chunk_overlap_starts_inside_previous_chunk(byte_encoder):
+    text = " ".join(f"Frase {i} curta." for i in range(40))
+    chunks = token_engine.chunk_text(text, 30, overlap=8)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(text)
+    for (_, prev_end, _), (start, _, tokens) in zip(chunks, chunks[1:]):
+        assert start < prev_end
+        assert tokens <= 30
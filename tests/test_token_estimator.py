@@ -0,0 +1,41 @@
+# contextflow/tests/test_token_estimator.py
+from constants import DEFAULT_ENCODING, TOKEN_ESTIMATE_MIN_SAMPLES
+from core.token_estimator import TokenEstimator, duration_seconds
+
+def test_duration_seconds():
+    assert duration_seconds("01:02:03") == 3723
+    assert duration_seconds("2:05") == 125
+    assert duration_seconds(90) == 90
+    assert duration_seconds("ao vivo") is None
+    assert duration_seconds("") is None
+
+def test_uncalibrated_estimates_use_the_defaults():
+    estimator = TokenEstimator()
+    assert not estimator.is_calibrated("ext")
+    assert estimator.estimate_bytes(4000, "ext", ".py") == 1000
+    assert estimator.estimate_duration(None) is None
+
+def test_key_calibrates_after_min_samples():
+    estimator = TokenEstimator()
+    for _ in range(TOKEN_ESTIMATE_MIN_SAMPLES - 1):
+        estimator.observe("ext", ".md", DEFAULT_ENCODING, 2000, 1000)
+    assert estimator.bytes_per_token("ext", ".md") == 4.0
+    estimator.observe("ext", ".md", DEFAULT_ENCODING, 2000, 1000)
+    assert estimator.is_calibrated("ext")
+    assert estimator.bytes_per_token("ext", ".md") == 2.0
+    # Extensões sem amostras próprias caem no agregado do tipo
+    assert estimator.estimate_bytes(2000, "ext", ".txt") == 1000
+
+def test_duration_estimate_uses_only_timed_samples():
+    estimator = TokenEstimator()
+    for _ in range(TOKEN_ESTIMATE_MIN_SAMPLES):
+        estimator.observe("lang", "pt", DEFAULT_ENCODING, 4000, 1000, seconds=200)
+        estimator.observe("lang", "pt", DEFAULT_ENCODING, 4000, 5000)
+    assert estimator.estimate_duration(100, "pt") == 500
+
+def test_samples_are_persisted_in_the_store(tmp_path):
+    from storage.token_cache import TokenCountCache
+    store = TokenCountCache(str(tmp_path / "tokens.db"))
+    for _ in range(TOKEN_ESTIMATE_MIN_SAMPLES):
+        TokenEstimator(store).observe("ext", ".py", DEFAULT_ENCODING, 3000, 1000)
+    assert TokenEstimator(store).bytes_per_token("ext", ".py") == 3.0
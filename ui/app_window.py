@@ -3,7 +3,7 @@
 import wx
 import threading
 import os
-from constants import APP_NAME, APP_VERSION
+from constants import APP_NAME, APP_VERSION, TOKEN_ESTIMATE_MIN_SAMPLES
 from core.token_engine import get_encoder_info
 
 # Real implementations
@@ -50,7 +50,10 @@ class AppWindow(wx.Frame):
                                     log_callback=self.log_to_console)
         
         # Aba 2: Tabela: Vídeos (Nova Aba)
-        self.panel_table = PanelTable(self.notebook, on_selection_callback=self.on_table_selection)
+        self.panel_table = PanelTable(self.notebook, self.panel_grid.processor,
+                                      on_selection_callback=self.on_table_selection)
+        # Contagens exatas vindas do backfill atualizam as duas abas
+        self.panel_grid.processor.on_tokens_updated = self.on_tokens_updated
         
         # Aba 3: Detalhes / Conteúdo
         self.panel_detail = DetailPanel(self.notebook)
@@ -93,9 +96,13 @@ class AppWindow(wx.Frame):
         # Tools Menu
         tools_menu = wx.Menu()
         tools_menu.Append(3001, "Reprocessar Erros", "Tenta baixar novamente vídeos com status de erro")
+        tools_menu.Append(3002, "Estatísticas do Processador", "Exibe throughput e taxa de requisições por host no console")
+        tools_menu.Append(3003, "Sincronizar Fontes Agora", "Busca vídeos novos em todas as playlists/canais rastreados")
         menubar.Append(tools_menu, "&Ferramentas")
         
         self.Bind(wx.EVT_MENU, self.on_reprocess_errors, id=3001)
+        self.Bind(wx.EVT_MENU, self.on_show_processor_stats, id=3002)
+        self.Bind(wx.EVT_MENU, self.on_sync_sources, id=3003)
 
     # --- Callbacks e Lógica ---
 
@@ -165,6 +172,81 @@ class AppWindow(wx.Frame):
             self.panel_grid.processor.stop_processing()
         event.Skip()
 
+    def on_tokens_updated(self, video_ids, encoding):
+        self.panel_grid.on_tokens_updated(video_ids, encoding)
+        self.panel_table.on_tokens_updated(video_ids, encoding)
+
+    def on_show_processor_stats(self, event):
+        """Loga no console as métricas do Processor (para tuning de workers/rate limits)."""
+        stats = self.panel_grid.processor.get_stats()
+        self.log_to_console(
+            f"Fila: {stats['queued']} | Concluídos: {stats['completed']} | "
+            f"Erros: {stats['errors']} | Vídeos/min: {stats['videos_per_minute']}", "STATS")
+        sources = stats['metadata_sources']
+        if sources:
+            self.log_to_console(
+                f"  Metadados: {sources.get('flat', 0)} via entrada flat, {sources.get('extract', 0)} via extração completa", "STATS")
+        if stats['transcript_misses_skipped']:
+            self.log_to_console(
+                f"  Sem legenda (cache negativo): {stats['transcript_misses_skipped']} tarefas encerradas sem requisições", "STATS")
+        pred = stats['source_predictor']
+        if pred['predictions'] or pred['avg_probes']:
+            self.log_to_console(
+                f"  Previsão de fonte de legenda: {pred['hits']}/{pred['predictions']} acertos ({pred['hit_rate']:.0%}) | "
+                f"{pred['avg_probes']} sondagens/transcrição | {pred['channels']} canais", "STATS")
+        comp = stats['compaction']
+        if comp['videos']:
+            self.log_to_console(
+                f"  Compactação de legendas automáticas: {comp['videos']} vídeos, "
+                f"{comp['tokens_saved']} tokens economizados, {comp['ms_per_video']} ms/vídeo", "STATS")
+        if stats['time_to_first_task'] is not None:
+            self.log_to_console(f"  Tempo até a 1ª tarefa (último lote): {stats['time_to_first_task']:.2f}s", "STATS")
+        self.log_to_console("  " + self.panel_grid.processor.controller.describe(), "STATS")
+        durable = stats['durable_queue']
+        self.log_to_console(
+            "  Fila durável: " + (", ".join(f"{k}={v}" for k, v in sorted(durable.items())) or "vazia"), "STATS")
+        cache = stats['response_cache']
+        self.log_to_console(
+            f"  Cache de respostas: {cache['bytes'] / 1048576:.1f}/{cache['max_bytes'] / 1048576:.0f} MB | "
+            f"acertos {cache['hits']}, falhas {cache['misses']} ({cache['hit_rate']:.0%}) | "
+            + (", ".join(f"{k}={v}" for k, v in sorted(cache['entries'].items())) or "vazio"), "STATS")
+        tc = stats['token_cache']
+        if tc:
+            self.log_to_console(
+                f"  Cache de tokens: {tc['entries']} contagens ({tc['lru_entries']} em memória) | "
+                f"acertos {tc['memory_hits']} memória + {tc['disk_hits']} disco, falhas {tc['misses']} "
+                f"({tc['hit_rate']:.0%})", "STATS")
+        est = {k: v for k, v in stats['token_estimator'].items() if v['samples'] >= TOKEN_ESTIMATE_MIN_SAMPLES}
+        if est:
+            self.log_to_console(
+                "  Estimador calibrado: " + ", ".join(
+                    f"{k} {v['bytes_per_token']} B/token" + (f", {v['tokens_per_second']} tokens/s" if v['tokens_per_second'] else "")
+                    for k, v in est.items()), "STATS")
+        bf = stats['backfill']
+        self.log_to_console(
+            f"  Backfill ({bf['mode']}, {bf['budget_share']:.0%} da taxa com a fila ocupada): {bf['pending']} pendentes | "
+            + (", ".join(f"{k} {j.get('done', 0)}/{j.get('queued', 0)}" + (f" ({j['failed']} falhas)" if j.get('failed') else "")
+                         for k, j in sorted(bf['jobs'].items())) or "nenhum job"), "STATS")
+        if stats['encodings']:
+            self.log_to_console(
+                "  Contagens por encoding: " + ", ".join(f"{k}={v}" for k, v in sorted(stats['encodings'].items())), "STATS")
+        for name, st in stats['stages'].items():
+            self.log_to_console(
+                f"  [{name}] workers {st['busy']}/{st['workers']} | fila {st['queued']}/{st['capacity']} | processados {st['processed']}", "STATS")
+        for host, h in stats['hosts'].items():
+            self.log_to_console(
+                f"  {host}: {h['observed_rpm']} req/min (limite {h['configured_rps']} req/s, total {h['total_requests']})", "STATS")
+
+    def on_sync_sources(self, event):
+        """Re-sync manual de todas as fontes rastreadas (em background)."""
+        processor = self.panel_grid.processor
+        sources = self.db_handler.get_sources()
+        if not sources:
+            wx.MessageBox("Nenhuma playlist/canal rastreado ainda.", "Info")
+            return
+        threading.Thread(target=processor.sync_all_sources, daemon=True).start()
+        self.log_to_console(f"Sincronizando {len(sources)} fonte(s)...", "SYNC")
+
     def on_reprocess_errors(self, event):
         """Busca vídeos com erro no DB e re-enfileira."""
         # Obter IDs com erro
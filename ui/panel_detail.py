@@ -1,13 +1,17 @@
 
 # contextflow/ui/panel_detail.py
 import wx
-import wx.html2
 import os
-from constants import THUMBNAILS_DIR
+import threading
+from constants import THUMBNAILS_DIR, THUMB_SIZE_DETAIL, THUMB_VARIANTS
+from storage.db_handler import DatabaseHandler
+from core.thumbnails import make_variants, bitmap_from_rgb
 
 class DetailPanel(wx.Panel):
     def __init__(self, parent):
         super().__init__(parent)
+        self.db_handler = DatabaseHandler()
+        self._video_id = None
         self._init_ui()
 
     def _init_ui(self):
@@ -38,16 +42,12 @@ class DetailPanel(wx.Panel):
         main_sizer.Add(header_sizer, 0, wx.EXPAND | wx.BOTTOM, 10)
         
         # 2. Content (WebView for Rich Text)
-        if wx.html2.WebView.IsBackendAvailable(wx.html2.WebViewBackendDefault):
-            self.browser = wx.html2.WebView.New(self)
-            main_sizer.Add(self.browser, 1, wx.EXPAND | wx.ALL, 0)
-        else:
-            self.txt_content = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY)
-            # Fix Low Contrast (Dark Theme Friendly)
-            self.txt_content.SetBackgroundColour(wx.Colour(30, 30, 30)) # Dark Gray BG
-            self.txt_content.SetForegroundColour(wx.Colour(240, 240, 240)) # Light Gray Text
-            main_sizer.Add(self.txt_content, 1, wx.EXPAND | wx.ALL, 0)
-            self.browser = None
+        # wx.html2 (e o backend do WebView) só é carregado no primeiro vídeo aberto
+        self.browser = None
+        self.txt_content = None
+        self.content_sizer = main_sizer
+        self.content_placeholder = wx.StaticText(self, label="")
+        main_sizer.Add(self.content_placeholder, 1, wx.EXPAND | wx.ALL, 0)
             
         # 3. Footer (Stats/Actions)
         footer_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -58,12 +58,47 @@ class DetailPanel(wx.Panel):
         
         self.SetSizer(main_sizer)
 
+    def _ensure_content_view(self):
+        if self.browser or self.txt_content:
+            return
+        import wx.html2
+        if wx.html2.WebView.IsBackendAvailable(wx.html2.WebViewBackendDefault):
+            self.browser = wx.html2.WebView.New(self)
+            view = self.browser
+        else:
+            self.txt_content = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY)
+            # Fix Low Contrast (Dark Theme Friendly)
+            self.txt_content.SetBackgroundColour(wx.Colour(30, 30, 30)) # Dark Gray BG
+            self.txt_content.SetForegroundColour(wx.Colour(240, 240, 240)) # Light Gray Text
+            view = self.txt_content
+        self.content_sizer.Replace(self.content_placeholder, view)
+        self.content_placeholder.Destroy()
+        self.content_placeholder = None
+        self.Layout()
+
     def set_default_image(self):
         # Placeholder cinza ou similar
         img = wx.Image(160, 90)
         img.Replace(0,0,0, 200,200,200) # Preenche cinza
         self.img_thumb.SetBitmap(wx.Bitmap(img))
 
+    def _generate_variants(self, video_id: str, path: str):
+        """Decodifica o JPEG fora da thread da UI, guarda as variantes e mostra se o vídeo ainda estiver aberto."""
+        def worker():
+            variants = make_variants(path, THUMB_VARIANTS)
+            if variants:
+                self.db_handler.save_thumb_variants(video_id, variants)
+                wx.CallAfter(self._show_variant, video_id, variants.get(THUMB_SIZE_DETAIL))
+
+        threading.Thread(target=worker, name="cf-thumb-detail", daemon=True).start()
+
+    def _show_variant(self, video_id: str, data):
+        if video_id != self._video_id:
+            return  # usuário já selecionou outro vídeo
+        bmp = bitmap_from_rgb(data, THUMB_SIZE_DETAIL)
+        if bmp.IsOk():
+            self.img_thumb.SetBitmap(bmp)
+
     def load_video(self, video_data: dict, transcript_text: str):
         # Update Meta
         self.lbl_title.SetLabel(video_data.get('title', 'Unknown'))
@@ -73,31 +108,20 @@ class DetailPanel(wx.Panel):
         meta_text += f"Upload: {video_data.get('upload_date')} | Duração: {video_data.get('duration')}s"
         self.lbl_meta.SetLabel(meta_text)
         
-        # Update Image
-        thumb_path = video_data.get('thumbnail_path')
-        if thumb_path and os.path.exists(thumb_path):
-            try:
-                # Tenta carregar ignorando erros de log do wx que poluem o console
-                log_level = wx.Log.GetLogLevel()
-                wx.Log.SetLogLevel(0) # Silencia temporariamente
-                
-                img = wx.Image(thumb_path, wx.BITMAP_TYPE_ANY)
-                
-                wx.Log.SetLogLevel(log_level) # Restaura log
-                
-                if img.IsOk():
-                    img = img.Scale(160, 90, wx.IMAGE_QUALITY_HIGH)
-                    self.img_thumb.SetBitmap(wx.Bitmap(img))
-                else:
-                    print(f"Erro: Imagem inválida ou corrompida: {thumb_path}")
-                    self.set_default_image()
-            except Exception as e:
-                print(f"Erro ao carregar thumbnail {thumb_path}: {e}")
-                self.set_default_image()
+        # Update Image (variante 160x90 gerada na ingestão; sem decodificar o JPEG)
+        self._video_id = video_data.get('id')
+        data = self.db_handler.get_thumb_variant(self._video_id, *THUMB_SIZE_DETAIL)
+        bmp = bitmap_from_rgb(data, THUMB_SIZE_DETAIL)
+        if bmp.IsOk():
+            self.img_thumb.SetBitmap(bmp)
         else:
+            # Vídeo antigo sem variantes: placeholder enquanto gera em background
             self.set_default_image()
+            if video_data.get('thumbnail_path'):
+                self._generate_variants(self._video_id, video_data['thumbnail_path'])
 
         # Update Content
+        self._ensure_content_view()
         # Formatando texto para HTML simples para leitura agradável
         if self.browser:
             html_content = f"""
@@ -2,8 +2,8 @@
 import wx
 import wx.grid
 import webbrowser
-from core.processor import Processor
 from storage.db_handler import DatabaseHandler
+from constants import TOKEN_ENCODINGS, DEFAULT_ENCODING
 
 class GridPanel(wx.Panel):
     def __init__(self, parent, on_data_changed=None, log_callback=None):
@@ -12,7 +12,8 @@ class GridPanel(wx.Panel):
         self.log_callback = log_callback
         self.db_handler = DatabaseHandler()
         
-        # Processor
+        # Processor (import sob demanda: pipeline, rede e tokenização ficam fora do import de main)
+        from core.processor import Processor
         self.processor = Processor()
         self.processor.on_task_update = self.on_task_update
         self.processor.on_task_complete = self.on_task_complete
@@ -22,11 +23,15 @@ class GridPanel(wx.Panel):
         self.processor.on_task_queued = self.on_task_queued
         self.processor.on_task_started = self.on_task_started
         self.processor.on_metadata_fetched = self.on_metadata_fetched
+        self.processor.on_log = self.on_processor_log
+        self.processor.on_tokens_updated = self.on_tokens_updated
         
         self.processor.start_processing() 
         
         # Mapping row -> video_id (or uuid) for easy access
         self.row_map = {} 
+        # Encoding exibido na coluna Tokens e usado na exportação
+        self.encoding = DEFAULT_ENCODING
         
         self._init_ui()
         self.load_data()
@@ -54,8 +59,16 @@ class GridPanel(wx.Panel):
         self.btn_clear_input = wx.Button(self, label="Limpar")
         self.btn_clear_input.Bind(wx.EVT_BUTTON, lambda e: self.txt_input.Clear())
 
+        self.chk_force = wx.CheckBox(self, label="Forçar atualização")
+        self.chk_force.SetToolTip("Reprocessa vídeos que já estão concluídos no banco")
+
         btn_sizer.Add(self.btn_process, 0, wx.RIGHT, 5) 
-        btn_sizer.Add(self.btn_clear_input, 0, wx.ALIGN_CENTER_VERTICAL)
+        btn_sizer.Add(self.btn_clear_input, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        self.chk_sync = wx.CheckBox(self, label="Só novos (sync)")
+        self.chk_sync.SetToolTip("Playlists/canais: enfileira apenas entradas que não existiam na última sincronização")
+
+        btn_sizer.Add(self.chk_force, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
+        btn_sizer.Add(self.chk_sync, 0, wx.ALIGN_CENTER_VERTICAL)
         
         input_sizer.Add(btn_sizer, 0, wx.EXPAND | wx.ALL, 5)
         main_sizer.Add(input_sizer, 0, wx.EXPAND | wx.ALL, 5)
@@ -102,12 +115,28 @@ class GridPanel(wx.Panel):
         
         self.btn_export = wx.Button(self, label="Exportar Selecionados (ZIP)")
         self.btn_export.Bind(wx.EVT_BUTTON, self.on_export)
+
+        self.btn_export_chunks = wx.Button(self, label="Exportar Chunks (JSONL)")
+        self.btn_export_chunks.SetToolTip("Transcrições divididas em blocos com orçamento de tokens, para LLMs")
+        self.btn_export_chunks.Bind(wx.EVT_BUTTON, self.on_export_chunks)
         
+        self.chk_compact = wx.CheckBox(self, label="Texto compacto")
+        self.chk_compact.SetToolTip("ZIP: exporta a versão compacta das legendas automáticas (menos tokens) no lugar do texto bruto")
+
         self.lbl_status = wx.StaticText(self, label="Pronto.")
+
+        self.choice_encoding = wx.Choice(self, choices=list(TOKEN_ENCODINGS))
+        self.choice_encoding.SetStringSelection(self.encoding)
+        self.choice_encoding.SetToolTip("\n".join(f"{k}: {v}" for k, v in TOKEN_ENCODINGS.items()))
+        self.choice_encoding.Bind(wx.EVT_CHOICE, self.on_encoding_changed)
         
         action_sizer.Add(self.lbl_status, 1, wx.ALIGN_CENTER_VERTICAL)
+        action_sizer.Add(wx.StaticText(self, label="Encoding:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        action_sizer.Add(self.choice_encoding, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 10)
         action_sizer.Add(self.btn_delete, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
-        action_sizer.Add(self.btn_export, 0, wx.ALIGN_CENTER_VERTICAL)
+        action_sizer.Add(self.chk_compact, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        action_sizer.Add(self.btn_export, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        action_sizer.Add(self.btn_export_chunks, 0, wx.ALIGN_CENTER_VERTICAL)
         
         main_sizer.Add(action_sizer, 0, wx.EXPAND | wx.ALL, 5)
         
@@ -146,6 +175,7 @@ class GridPanel(wx.Panel):
             
         # 3. Carregar do Banco
         videos = self.db_handler.get_all_videos()
+        counts = self.processor.encoding_token_counts(self.encoding)
         videos.sort(key=lambda x: x['created_at'], reverse=True)
         
         # 4. Combinar: Ativas primeiro (Topo) ou Último?
@@ -215,8 +245,7 @@ class GridPanel(wx.Panel):
             
             self.grid.SetCellValue(current_row, 8, str(d) if d else "00:00:00")
             
-            t = v.get('token_count') or 0
-            self.grid.SetCellValue(current_row, 9, str(t))
+            self.grid.SetCellValue(current_row, 9, self.processor.token_text(v, counts, self.encoding))
             
             # Col 10 Status
             status = v.get('status', 'pending')
@@ -231,6 +260,36 @@ class GridPanel(wx.Panel):
             
             current_row += 1
 
+    def on_encoding_changed(self, event):
+        self.encoding = self.choice_encoding.GetStringSelection()
+        label = "Tokens" if self.encoding == DEFAULT_ENCODING else f"Tokens ({self.encoding})"
+        self.grid.SetColLabelValue(9, label)
+        # Vídeos sem contagem neste encoding entram na faixa de backfill
+        queued = self.processor.recompute_encoding(self.encoding)
+        if queued:
+            self.lbl_status.SetLabel(f"Recalculando {self.encoding} para {queued} vídeo(s) em background...")
+        counts = self.processor.encoding_token_counts(self.encoding)
+        records = {str(v['id']): v for v in self.db_handler.get_all_videos()}
+        for row, vid in self.row_map.items():
+            record = records.get(str(vid))
+            if record:
+                self.grid.SetCellValue(row, 9, self.processor.token_text(record, counts, self.encoding))
+        self.grid.ForceRefresh()
+
+    def on_tokens_updated(self, video_ids, encoding):
+        """Contagens exatas gravadas em background: substituem as estimativas na coluna Tokens."""
+        if encoding != self.encoding:
+            return
+        ids = {str(v) for v in video_ids}
+        rows = [(row, vid) for row, vid in self.row_map.items() if str(vid) in ids]
+        if not rows:
+            return
+        counts = self.processor.encoding_token_counts(self.encoding)
+        for row, vid in rows:
+            record = self.db_handler.get_video(vid)
+            if record:
+                self.grid.SetCellValue(row, 9, self.processor.token_text(record, counts, self.encoding))
+
     def _rebuild_row_map(self):
         """Reconstrói o mapa de linhas baseado no estado atual da grid.
            Nota: Isso assume que o ID não está na grid visível, o que é um problema.
@@ -371,12 +430,16 @@ class GridPanel(wx.Panel):
             return
             
         self.lbl_status.SetLabel("Enfileirando...")
-        self.processor.add_urls(raw_text)
+        self.processor.add_urls(raw_text, force_refresh=self.chk_force.GetValue(),
+                                sync_only_new=self.chk_sync.GetValue())
         self.txt_input.Clear()
         if self.log_callback: self.log_callback("Iniciando processamento de URLs.", "INFO")
 
     # --- Novos Eventos do Processor ---
 
+    def on_processor_log(self, msg, level="INFO"):
+        if self.log_callback: self.log_callback(msg, level)
+
     def on_task_queued(self, task_uuid, url):
         """Nova tarefa adicionada: cria linha instantânea na grid."""
         self.grid.AppendRows(1)
@@ -409,6 +472,14 @@ class GridPanel(wx.Panel):
 
     def on_metadata_fetched(self, task_uuid, video_id, title):
         row = self._find_row_by_id(task_uuid)
+
+        if row is None:
+             # Nova tentativa de tarefa da fila durável: reaproveita a linha do vídeo
+             row = self._find_row_by_id(video_id)
+             if row is not None:
+                 self.row_map[row] = task_uuid
+                 self.grid.SetCellValue(row, 10, "Baixando...")
+                 self.grid.SetCellTextColour(row, 10, wx.BLACK)
         
         if row is None:
              # Self-Healing: Create row if missing
@@ -435,6 +506,11 @@ class GridPanel(wx.Panel):
             # Atualiza mapa para usar ID real
             self.row_map[row] = video_id
 
+            # Já registrado com a duração: estimativa até a contagem exata
+            record = self.db_handler.get_video(video_id)
+            if record:
+                self.grid.SetCellValue(row, 9, self.processor.token_text(record, self.processor.encoding_token_counts(self.encoding), self.encoding))
+
     def on_task_update(self, video_id, status):
         row = self._find_row_by_id(video_id)
         if row is not None:
@@ -476,7 +552,7 @@ class GridPanel(wx.Panel):
             d = video_record.get('duration')
             self.grid.SetCellValue(row, 8, str(d) if d else "00:00:00")
             
-            self.grid.SetCellValue(row, 9, str(t))
+            self.grid.SetCellValue(row, 9, self.processor.token_text(video_record, self.processor.encoding_token_counts(self.encoding), self.encoding))
             # Cost removed (Col 10 is Status)
             
             # Reseta cor se estava em erro antes
@@ -536,15 +612,22 @@ class GridPanel(wx.Panel):
             self.on_data_changed()
 
     def on_export(self, event):
+        self._export("markdown")
+
+    def on_export_chunks(self, event):
+        self._export("chunks")
+
+    def _export(self, format_type):
         ids = self.get_selected_ids()
         if not ids:
             wx.MessageBox("Selecione itens usando as caixas de seleção [ ] na primeira coluna.", "Aviso")
             return
         
-        zip_path = self.processor.export_data(ids, "markdown")
-        if zip_path:
-            msg = f"Exportação salva em: {zip_path}"
+        export_path = self.processor.export_data(ids, format_type, encoding=self.encoding,
+                                                 compact=self.chk_compact.GetValue())
+        if export_path:
+            msg = f"Exportação salva em: {export_path}"
             wx.MessageBox(msg, "Sucesso")
             if self.log_callback: self.log_callback(msg, "INFO")
             import subprocess
-            subprocess.Popen(f'explorer /select,"{zip_path}"')
+            subprocess.Popen(f'explorer /select,"{export_path}"')
@@ -3,20 +3,27 @@ import wx
 import wx.dataview
 import os
 import datetime
+import threading
 import webbrowser
 from storage.db_handler import DatabaseHandler
-from core.processor import Processor
+from core.thumbnails import make_variants, bitmap_from_rgb
+from constants import THUMB_SIZE_TABLE, THUMB_VARIANTS, TOKEN_ENCODINGS, DEFAULT_ENCODING
 
 class PanelTable(wx.Panel):
-    def __init__(self, parent, on_selection_callback=None):
+    def __init__(self, parent, processor, on_selection_callback=None):
         super().__init__(parent)
         self.db_handler = DatabaseHandler()
         self.on_selection = on_selection_callback
         
-        # Processor para resumos (sob demanda)
-        self.processor = Processor()
+        # Processor compartilhado (o da ingestão): resumos e recálculo de encodings usam a mesma
+        # faixa de backfill, que respeita BACKFILL_BUDGET_SHARE enquanto o grid ingere
+        self.processor = processor
         
         self.video_map = {} # Map index or object to video data
+        # IDs com geração de miniaturas já disparada (evita repetir a cada refresh)
+        self._variant_jobs = set()
+        # Encoding exibido na coluna Tokens e usado na exportação
+        self.encoding = DEFAULT_ENCODING
         
         self._init_ui()
         self.load_data()
@@ -49,7 +56,15 @@ class PanelTable(wx.Panel):
         # Checkbox Hide Thumbs
         self.chk_thumbs = wx.CheckBox(toolbar_panel, label="Ocultar Thumbnails")
         self.chk_thumbs.Bind(wx.EVT_CHECKBOX, self.on_toggle_thumbs)
-        toolbar_sizer.Add(self.chk_thumbs, 0, wx.ALIGN_CENTER_VERTICAL)
+        toolbar_sizer.Add(self.chk_thumbs, 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 15)
+
+        # Encoding da contagem de tokens
+        toolbar_sizer.Add(wx.StaticText(toolbar_panel, label="Encoding:"), 0, wx.ALIGN_CENTER_VERTICAL | wx.RIGHT, 5)
+        self.choice_encoding = wx.Choice(toolbar_panel, choices=list(TOKEN_ENCODINGS))
+        self.choice_encoding.SetStringSelection(self.encoding)
+        self.choice_encoding.SetToolTip("\n".join(f"{k}: {v}" for k, v in TOKEN_ENCODINGS.items()))
+        self.choice_encoding.Bind(wx.EVT_CHOICE, self.on_encoding_changed)
+        toolbar_sizer.Add(self.choice_encoding, 0, wx.ALIGN_CENTER_VERTICAL)
 
         # Set Sizer for Toolbar Panel
         tp_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -86,6 +101,9 @@ class PanelTable(wx.Panel):
         
         # 7: Link (URL) 
         self.dv_ctrl.AppendTextColumn("Link", width=150, mode=wx.dataview.DATAVIEW_CELL_INERT)
+
+        # 8: Tokens (no encoding escolhido)
+        self.col_tokens = self.dv_ctrl.AppendTextColumn("Tokens", width=90, mode=wx.dataview.DATAVIEW_CELL_INERT)
         
         self.dv_ctrl.Bind(wx.dataview.EVT_DATAVIEW_ITEM_ACTIVATED, self.on_item_activated)
         
@@ -139,27 +157,29 @@ class PanelTable(wx.Panel):
     def populate_list(self):
         self.dv_ctrl.DeleteAllItems()
         self.video_map = {}
+
+        # Miniaturas 80x45 pré-escaladas na ingestão: nenhum JPEG é decodificado aqui
+        variants = self.db_handler.get_thumb_variants(*THUMB_SIZE_TABLE)
+        counts = self.processor.encoding_token_counts(self.encoding)
+        default_bmp = None
+        missing = []
         
         # Prepared default entries
         for i, v in enumerate(self.filtered_videos):
             # 0: Check (False)
             # 1: IconText (for Thumbnail)
-            thumb_path = v.get('thumbnail_path')
-            bmp = wx.NullBitmap
-            if thumb_path and os.path.exists(thumb_path):
-                try:
-                    img = wx.Image(thumb_path, wx.BITMAP_TYPE_ANY)
-                    if img.IsOk():
-                        img = img.Scale(80, 45, wx.IMAGE_QUALITY_HIGH)
-                        bmp = wx.Bitmap(img)
-                except:
-                    pass
+            bmp = bitmap_from_rgb(variants.get(v['id']), THUMB_SIZE_TABLE)
             
             if not bmp.IsOk():
-                # Default gray
-                default_img = wx.Image(80, 45)
-                default_img.Replace(0,0,0, 200,200,200)
-                bmp = wx.Bitmap(default_img)
+                thumb_path = v.get('thumbnail_path')
+                if thumb_path and os.path.exists(thumb_path):
+                    missing.append((v['id'], thumb_path))
+                if default_bmp is None:
+                    # Default gray
+                    default_img = wx.Image(*THUMB_SIZE_TABLE)
+                    default_img.Replace(0,0,0, 200,200,200)
+                    default_bmp = wx.Bitmap(default_img)
+                bmp = default_bmp
             
             # Convert Bitmap to Icon for IconText
             icon = wx.Icon()
@@ -172,14 +192,55 @@ class PanelTable(wx.Panel):
             transcript = v.get('transcript_snippet') or "..."
             summary = v.get('summary_text') or "Clique em Resumir"
             link = v.get('url') or ""
+            tokens = self.processor.token_text(v, counts, self.encoding)
             
-            # Append data: [Check, IconText, Title, Channel, Duration, Transcript, Summary, Link]
-            data = [False, icon_text, title, channel, duration, transcript, summary, link]
+            # Append data: [Check, IconText, Title, Channel, Duration, Transcript, Summary, Link, Tokens]
+            data = [False, icon_text, title, channel, duration, transcript, summary, link, tokens]
             self.dv_ctrl.AppendItem(data)
             
             # Map Row to Video ID (Using index)
             self.video_map[i] = v
 
+        if missing:
+            self._generate_missing_variants(missing)
+
+    def _generate_missing_variants(self, items):
+        """Vídeos antigos (sem variantes): gera em background uma vez e repopula a tabela."""
+        pending = [(vid, path) for vid, path in items if vid not in self._variant_jobs]
+        if not pending:
+            return
+        self._variant_jobs.update(vid for vid, _ in pending)
+
+        def worker():
+            generated = 0
+            for vid, path in pending:
+                variants = make_variants(path, THUMB_VARIANTS)
+                if variants:
+                    self.db_handler.save_thumb_variants(vid, variants)
+                    generated += 1
+            if generated:
+                wx.CallAfter(self.populate_list)
+
+        threading.Thread(target=worker, name="cf-thumb-variants", daemon=True).start()
+
+    def on_encoding_changed(self, event):
+        self.encoding = self.choice_encoding.GetStringSelection()
+        self.col_tokens.SetTitle("Tokens" if self.encoding == DEFAULT_ENCODING else f"Tokens ({self.encoding})")
+        # Vídeos sem contagem neste encoding entram na faixa de backfill
+        self.processor.recompute_encoding(self.encoding)
+        self.populate_list()
+
+    def on_tokens_updated(self, video_ids, encoding):
+        """Contagens exatas do recálculo em background: substituem as estimativas da coluna Tokens."""
+        if encoding != self.encoding:
+            return
+        ids = set(video_ids)
+        counts = self.processor.encoding_token_counts(self.encoding)
+        for row, v in self.video_map.items():
+            if v['id'] in ids:
+                v = dict(v, **(self.db_handler.get_video(v['id']) or {}))
+                self.dv_ctrl.SetValue(self.processor.token_text(v, counts, self.encoding), row, 8)
+
     def on_filter_text(self, event):
         self.apply_filter()
 
@@ -247,6 +308,7 @@ class PanelTable(wx.Panel):
         # db_handler.get_transcript(vid) returns full dict
         
         md_content = f"# Exportação ContextFlow\nData: {datetime.datetime.now()}\n\n"
+        counts = self.processor.encoding_token_counts(self.encoding)
         
         for v in videos:
             v_id = v['id']
@@ -261,7 +323,8 @@ class PanelTable(wx.Panel):
             md_content += f"## {v['title']}\n"
             md_content += f"- **Canal**: {v.get('channel_name') or '-'}\n"
             md_content += f"- **URL**: {v.get('url')}\n"
-            md_content += f"- **Duração**: {self.format_duration(v.get('duration'))}\n\n"
+            md_content += f"- **Duração**: {self.format_duration(v.get('duration'))}\n"
+            md_content += f"- **Tokens ({self.encoding})**: {self.processor.token_text(v, counts, self.encoding, estimate=False)}\n\n"
             md_content += "### Resumo\n"
             md_content += f"{v.get('summary_text') or 'N/A'}\n\n"
             md_content += "### Transcrição Completa\n"